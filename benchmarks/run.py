@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the client, payload parsing, command verification and CLI start-up.
+
+Everything runs offline against eddi_scheduler.fakeserver. Results are
+written as JSON so runs of different versions can be compared:
+
+    python benchmarks/run.py --output before.json
+    # ... change something ...
+    python benchmarks/run.py --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Add parent directory to path to import eddi_scheduler
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from eddi_scheduler import __version__
+from eddi_scheduler.client import EddiClient
+from eddi_scheduler.control import FixedPoll, execute_command_with_retry
+from eddi_scheduler.fakeserver import FakeEddi, FakeHub, FakeMyenergiServer
+from eddi_scheduler.models import parse_eddi_statuses
+
+SERIAL = "12345678"
+API_KEY = "secret"
+
+# Eddi devices per simulated hub for the parsing benchmarks
+HUB_SIZES = (1, 10, 100)
+
+# Seconds for a stop to reach sta=6, and response latency, per verification case
+VERIFY_CASES = {
+    "fast": (0.2, 0.0),
+    "typical": (0.5, 0.02),
+    "slow": (1.0, 0.1),
+}
+
+# Slowdown of a median, as a fraction, reported as a regression
+REGRESSION_THRESHOLD = 0.10
+
+
+def measure(fn: Callable[[], Any], rounds: int, warmup: int = 1) -> Dict[str, Any]:
+    """Time repeated calls of fn.
+
+    Returns:
+        Summary statistics in seconds, plus the number of rounds
+    """
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return {
+        "rounds": rounds,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "stdev": statistics.stdev(times) if rounds > 1 else 0.0,
+        "max": max(times),
+    }
+
+
+def status_payload(devices: int) -> bytes:
+    """A cgi-jstatus-* response of a hub with the given number of eddis."""
+    hub = FakeHub(SERIAL, API_KEY, [FakeEddi(10000000 + i) for i in range(devices)])
+    eddis = [eddi.status(0.0) for eddi in hub.eddis]
+    return json.dumps([{"eddi": eddis}, {"zappi": []}, {"harvi": []}, {"asn": "s18.myenergi.net"}]).encode()
+
+
+def bench_get_status(rounds: int) -> Dict[str, Dict[str, Any]]:
+    """Authenticated get_status round-trips, with and without a fresh session."""
+    results = {}
+    with FakeMyenergiServer([FakeHub(SERIAL, API_KEY)]) as server:
+        client = EddiClient(SERIAL, API_KEY, base_url=server.url, persist_digest=False)
+        results["client.get_status"] = measure(client.get_status, rounds)
+        results["client.get_status.new_client"] = measure(
+            lambda: EddiClient(SERIAL, API_KEY, base_url=server.url, persist_digest=False).get_status(),
+            max(1, rounds // 4),
+        )
+    return results
+
+
+def bench_parsing(rounds: int) -> Dict[str, Dict[str, Any]]:
+    """Parsing of jstatus payloads for hubs of several sizes."""
+    results = {}
+    for size in HUB_SIZES:
+        payload = status_payload(size)
+        results[f"parse.statuses.{size}"] = measure(lambda: parse_eddi_statuses(payload), rounds * 10)
+    return results
+
+
+def bench_verification(rounds: int) -> Dict[str, Dict[str, Any]]:
+    """End-to-end stop and start, sent and verified against simulated devices."""
+    results = {}
+    for name, (settle, latency) in VERIFY_CASES.items():
+        hub = FakeHub(SERIAL, API_KEY, [FakeEddi(10088888)])
+        with FakeMyenergiServer(
+            [hub], latency=latency, stop_delays=(settle / 10, settle), start_delays=(settle / 3, settle)
+        ) as server:
+            client = EddiClient(SERIAL, API_KEY, base_url=server.url, persist_digest=False)
+            poll = lambda command: FixedPoll(0, 0.05, int(settle / 0.05) + 40)
+
+            def cycle():
+                for command in ("stop", "start"):
+                    if not execute_command_with_retry(command, client, "10088888", 1, log=lambda m: None, poll=poll):
+                        raise RuntimeError(f"{command} was not verified")
+
+            results[f"verify.stop_start.{name}"] = measure(cycle, max(1, rounds // 10), warmup=0)
+    return results
+
+
+def bench_cli(rounds: int) -> Dict[str, Dict[str, Any]]:
+    """Cold start of the CLI in a new interpreter."""
+    results = {}
+    src = str(Path(__file__).parent.parent / "src")
+    with tempfile.TemporaryDirectory() as workdir, FakeMyenergiServer([FakeHub(SERIAL, API_KEY)]) as server:
+        env = dict(
+            os.environ,
+            PYTHONPATH=src + os.pathsep + os.environ.get("PYTHONPATH", ""),
+            EDDI_CACHE_DIR=workdir,
+            EDDI_DATA_DIR=workdir,
+            EDDI_SERIAL_NUMBER=SERIAL,
+            EDDI_API_KEY=API_KEY,
+            EDDI_BASE_URL=server.url,
+        )
+
+        def run(*args: str):
+            command = [sys.executable, "-c", "from eddi_scheduler.cli import main; main()", *args]
+            subprocess.run(command, cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL)
+
+        cold_rounds = max(3, rounds // 10)
+        results["cli.python_startup"] = measure(
+            lambda: subprocess.run([sys.executable, "-c", "pass"], check=True), cold_rounds
+        )
+        results["cli.help"] = measure(lambda: run("--help"), cold_rounds)
+        results["cli.status"] = measure(lambda: run("status"), cold_rounds)
+    return results
+
+
+SUITES = {
+    "client": bench_get_status,
+    "parse": bench_parsing,
+    "verify": bench_verification,
+    "cli": bench_cli,
+}
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """Compare median times with a baseline run.
+
+    Medians more than ``threshold`` slower than the baseline are flagged.
+
+    Returns:
+        One line per benchmark present in both runs
+    """
+    lines = []
+    for name, stats in results["benchmarks"].items():
+        before = baseline.get("benchmarks", {}).get(name)
+        if before is None:
+            continue
+        change = stats["median"] / before["median"] - 1 if before["median"] else 0.0
+        flag = "  REGRESSION" if change > threshold else ""
+        lines.append(f"{name:<40}{before['median'] * 1000:>10.3f}ms{stats['median'] * 1000:>10.3f}ms{change:>+9.1%}{flag}")
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the eddi-scheduler benchmarks")
+    parser.add_argument(
+        "--suite",
+        action="append",
+        choices=sorted(SUITES),
+        help="Suite to run (repeatable, default: all)"
+    )
+    parser.add_argument(
+        "--rounds",
+        type=int,
+        default=50,
+        help="Base number of rounds per benchmark (default: 50)"
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="Write results as JSON to this file"
+    )
+    parser.add_argument(
+        "--compare",
+        type=Path,
+        help="Baseline JSON to compare median times against"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=REGRESSION_THRESHOLD,
+        help="Slowdown flagged as a regression, as a fraction (default: 0.10)"
+    )
+    args = parser.parse_args(argv)
+
+    benchmarks: Dict[str, Any] = {}
+    for suite in args.suite or list(SUITES):
+        print(f"Running {suite} benchmarks...", file=sys.stderr)
+        benchmarks.update(SUITES[suite](args.rounds))
+
+    results = {
+        "version": __version__,
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "benchmarks": benchmarks,
+    }
+
+    for name, stats in benchmarks.items():
+        print(f"{name:<40}median {stats['median'] * 1000:>10.3f}ms  min {stats['min'] * 1000:>10.3f}ms  ({stats['rounds']} rounds)")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        lines = compare(results, json.loads(args.compare.read_text()), args.threshold)
+        print(f"\n{'benchmark':<40}{'before':>12}{'after':>12}{'change':>9}")
+        print("\n".join(lines))
+        if any(line.endswith("REGRESSION") for line in lines):
+            return 1
+    return 0
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent, capture_output=True, text=True, check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
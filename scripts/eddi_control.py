@@ -4,7 +4,6 @@ GitHub Actions helper script to control eddi device with retry and verification.
 """
 
 import sys
-import time
 import argparse
 from pathlib import Path
 
@@ -12,217 +11,9 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
 from eddi_scheduler.client import EddiClient
-from eddi_scheduler.cli import STATUS_CODES
-
-# Constants for timing and verification
-STOP_MAX_ATTEMPTS = 10
-STOP_WAIT_BETWEEN = 15  # seconds
-STOP_INITIAL_WAIT = 30  # seconds
-
-START_MAX_ATTEMPTS = 5
-START_WAIT_BETWEEN = 10  # seconds
-START_INITIAL_WAIT = 50  # seconds
-
-MAX_RETRIES = 3
-RETRY_DELAY = 30  # seconds
-
-
-def _sanitize_api_response(response):
-    """
-    Sanitize API response for logging by redacting sensitive fields.
-    
-    Args:
-        response: API response (dict, str, or other type)
-    
-    Returns:
-        Sanitized response safe for logging
-    """
-    if isinstance(response, dict):
-        sanitized = response.copy()
-        # Redact common sensitive fields
-        sensitive_fields = ['api_key', 'apiKey', 'password', 'token', 'secret', 'auth']
-        for field in sensitive_fields:
-            if field in sanitized:
-                sanitized[field] = '***REDACTED***'
-        return sanitized
-    return response
-
-
-def wait_and_verify_stop(client, device_serial, max_attempts=STOP_MAX_ATTEMPTS, wait_between=STOP_WAIT_BETWEEN):
-    """
-    Verify that device has stopped (sta=6) - ONLY sta=6 is acceptable.
-    Device transitions: sta=3 (diverting) -> sta=1 (paused) -> sta=6 (stopped)
-    This can take up to 2-3 minutes.
-    
-    Args:
-        client: EddiClient instance
-        device_serial: Device serial number
-        max_attempts: Maximum number of verification attempts
-        wait_between: Seconds to wait between attempts
-    
-    Returns:
-        bool: True if stopped (sta=6), False otherwise
-    """
-    print(f"Verifying device stopped (expecting sta=6 ONLY)...")
-    print(f"Note: Device may go through sta=1 (paused) before reaching sta=6 (stopped)")
-    
-    device_not_found_count = 0
-    
-    for attempt in range(1, max_attempts + 1):
-        if attempt > 1:
-            time.sleep(wait_between)
-        
-        try:
-            devices = client.get_eddi_devices()
-            device = next((d for d in devices if str(d.get("sno")) == device_serial), None)
-            
-            if not device:
-                device_not_found_count += 1
-                print(f"  Attempt {attempt}/{max_attempts}: Device not found")
-                if device_not_found_count >= 3:
-                    print(f"✗ Device not found in 3+ consecutive attempts - check network/credentials")
-                    return False
-                continue
-            
-            # Reset counter if device is found
-            device_not_found_count = 0
-            
-            sta = device.get("sta")
-            div = device.get("div", 0)
-            
-            print(f"  Attempt {attempt}/{max_attempts}: sta={sta}, div={div}W")
-            
-            if sta == 6:
-                print(f"✓ Device stopped successfully (sta=6)")
-                return True
-            elif sta == 1:
-                print(f"  → Device in paused state (sta=1), continuing to wait for sta=6...")
-            
-        except Exception as e:
-            print(f"  Attempt {attempt}/{max_attempts}: Error checking status: {e}")
-    
-    print(f"✗ Device did not reach stopped state (sta=6) after {max_attempts} attempts")
-    return False
-
-
-def wait_and_verify_start(client, device_serial, max_attempts=START_MAX_ATTEMPTS, wait_between=START_WAIT_BETWEEN):
-    """
-    Verify that device has started (any status except sta=6 stopped).
-    Success means sta != 6 (can be 1, 3, or other codes, but NOT 6).
-    
-    Args:
-        client: EddiClient instance
-        device_serial: Device serial number
-        max_attempts: Maximum number of verification attempts
-        wait_between: Seconds to wait between attempts
-    
-    Returns:
-        bool: True if started (sta != 6), False otherwise
-    """
-    print(f"Verifying device started (expecting any status EXCEPT sta=6 stopped)...")
-    
-    device_not_found_count = 0
-    
-    for attempt in range(1, max_attempts + 1):
-        if attempt > 1:
-            time.sleep(wait_between)
-        
-        try:
-            devices = client.get_eddi_devices()
-            device = next((d for d in devices if str(d.get("sno")) == device_serial), None)
-            
-            if not device:
-                device_not_found_count += 1
-                print(f"  Attempt {attempt}/{max_attempts}: Device not found")
-                if device_not_found_count >= 3:
-                    print(f"✗ Device not found in 3+ consecutive attempts - check network/credentials")
-                    return False
-                continue
-            
-            # Reset counter if device is found
-            device_not_found_count = 0
-            
-            sta = device.get("sta")
-            div = device.get("div", 0)
-            
-            print(f"  Attempt {attempt}/{max_attempts}: sta={sta}, div={div}W")
-            
-            if sta is None:
-                print(f"  → Device status unavailable, retrying...")
-                continue
-            elif sta == 6:
-                print(f"  → Device still stopped (sta=6), waiting for start...")
-                continue
-            else:
-                # Any status except 6 (and not None) means the device has started successfully
-                status_text = STATUS_CODES.get(sta, f"Unknown ({sta})")
-                print(f"✓ Device started successfully (sta={sta}, {status_text}, {div}W)")
-                return True
-                
-        except Exception as e:
-            print(f"  Attempt {attempt}/{max_attempts}: Error checking status: {e}")
-    
-    print(f"✗ Device did not reach started state after {max_attempts} attempts")
-    return False
-
-
-def execute_command_with_retry(command, client, device_serial, max_retries=MAX_RETRIES):
-    """
-    Execute stop/start command with retry logic.
-    
-    Args:
-        command: "stop" or "start"
-        client: EddiClient instance
-        device_serial: Device serial number
-        max_retries: Maximum number of retry attempts
-    
-    Returns:
-        bool: True if command succeeded and verified, False otherwise
-    """
-    for retry in range(1, max_retries + 1):
-        print(f"\n{'='*60}")
-        print(f"Attempt {retry}/{max_retries}: Executing {command.upper()} command")
-        print(f"{'='*60}")
-        
-        try:
-            # Execute command
-            if command == "stop":
-                result = client.stop(device_serial)
-            elif command == "start":
-                result = client.start(device_serial)
-            else:
-                print(f"✗ Unknown command: {command}")
-                return False
-            
-            # Sanitize response for logging (redact sensitive fields)
-            sanitized_result = _sanitize_api_response(result)
-            print(f"Command sent: {sanitized_result}")
-            
-            # Wait initial period for command to take effect
-            if command == "stop":
-                print(f"Waiting {STOP_INITIAL_WAIT} seconds for stop command to take effect...")
-                time.sleep(STOP_INITIAL_WAIT)
-                # Stop can take 2-3 minutes: sta=3 -> sta=1 -> sta=6
-                if wait_and_verify_stop(client, device_serial):
-                    return True
-            else:  # start
-                print(f"Waiting {START_INITIAL_WAIT} seconds for start command to take effect...")
-                time.sleep(START_INITIAL_WAIT)
-                if wait_and_verify_start(client, device_serial):
-                    return True
-            
-            if retry < max_retries:
-                print(f"\nRetrying in {RETRY_DELAY} seconds...")
-                time.sleep(RETRY_DELAY)
-                
-        except Exception as e:
-            print(f"✗ Error executing command: {e}")
-            if retry < max_retries:
-                print(f"\nRetrying in {RETRY_DELAY} seconds...")
-                time.sleep(RETRY_DELAY)
-    
-    print(f"\n✗ Command failed after {max_retries} attempts")
-    return False
+from eddi_scheduler.latency import LatencyModel
+from eddi_scheduler.metrics import REGISTRY
+from eddi_scheduler.control import adaptive_poll, execute_batch_with_retry, fixed_poll, reconcile
 
 
 def main():
@@ -246,8 +37,8 @@ def main():
     )
     parser.add_argument(
         "--base-url",
-        default="https://s18.myenergi.net",
-        help="API base URL"
+        default=None,
+        help="API base URL (default: discovered via director.myenergi.net)"
     )
     parser.add_argument(
         "--max-retries",
@@ -255,6 +46,32 @@ def main():
         default=3,
         help="Maximum retry attempts"
     )
+    parser.add_argument(
+        "--poll",
+        choices=["learned", "adaptive", "fixed"],
+        default="learned",
+        help="Verification polling: sized from this device's past latencies (learned), "
+             "probe early and back off (adaptive) or use fixed waits"
+    )
+    parser.add_argument(
+        "--device",
+        action="append",
+        help="Eddi serial to control (repeatable; default: the --serial value)"
+    )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Control every eddi on the hub, verified together"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Send the command even if the device is already in the target state"
+    )
+    parser.add_argument(
+        "--metrics-file",
+        help="Write request and command metrics to this file in OpenMetrics format"
+    )
     
     args = parser.parse_args()
     
@@ -262,21 +79,55 @@ def main():
     print(f"Eddi Control Script")
     print(f"{'='*60}")
     print(f"Command: {args.command.upper()}")
-    print(f"Device: {args.serial}")
-    print(f"Base URL: {args.base_url}")
+    print(f"Device: {'all' if args.all else ', '.join(args.device or [args.serial])}")
+    print(f"Base URL: {args.base_url or 'auto-discover'}")
     print(f"Max Retries: {args.max_retries}")
+    print(f"Polling: {args.poll}")
+    print(f"Skip if already in state: {'no' if args.force else 'yes'}")
     print(f"{'='*60}\n")
     
     # Create client
-    client = EddiClient(args.serial, args.api_key, args.base_url)
-    
-    # Execute command with retry
-    success = execute_command_with_retry(
-        args.command,
-        client,
-        args.serial,
-        args.max_retries
-    )
+    client = EddiClient(args.serial, args.api_key, args.base_url or None)
+    
+    poll = {"learned": None, "adaptive": adaptive_poll, "fixed": fixed_poll}[args.poll]
+    latency = LatencyModel()
+    
+    # None means every eddi on the hub
+    devices = None if args.all else (args.device or [args.serial])
+    
+    try:
+        if args.force:
+            # Execute command with retry, verifying all devices together
+            if devices is None:
+                devices = [str(d.get("sno")) for d in client.get_eddi_devices()]
+            results = execute_batch_with_retry(
+                args.command,
+                client,
+                devices,
+                args.max_retries,
+                poll=poll,
+                latency=latency
+            )
+            success = bool(results) and all(results.values())
+        else:
+            # Read the state once; only send and verify devices that differ
+            results = reconcile(
+                args.command,
+                client,
+                devices,
+                args.max_retries,
+                poll=poll,
+                latency=latency
+            )
+            success = bool(results) and all(r.ok for r in results)
+    except Exception as e:
+        # Reading the hub or sending failed before any result was recorded
+        print(f"✗ Error: {e}")
+        success = False
+    
+    if args.metrics_file:
+        REGISTRY.write(args.metrics_file)
+        print(f"Metrics written to {args.metrics_file}")
     
     # Exit with appropriate code
     if success:
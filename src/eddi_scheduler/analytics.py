@@ -0,0 +1,260 @@
+"""Energy and state summaries of recorded telemetry and downloaded history.
+
+All computations work on whole NumPy arrays: samples are assigned to
+periods with one binary search against the period boundaries, and totals
+are accumulated with ``np.bincount``. Requires NumPy
+(``pip install eddi-scheduler[analysis]``).
+"""
+
+from datetime import datetime, timedelta, timezone
+from itertools import repeat
+from typing import Any, Dict, List, Optional, Sequence
+
+from .models import EddiState
+from .recorder import MISSING_INT, MISSING_STA, require_numpy
+from .schedule import DEFAULT_TIMEZONE, Schedule, ZoneInfo
+
+PERIODS = ("day", "week", "month")
+
+JOULES_PER_KWH = 3.6e6
+
+# Longest gap between telemetry samples that is still integrated; a longer
+# gap means the recorder was not running
+MAX_SAMPLE_GAP = 300.0
+
+# Columns of history records summed by summarize_history, in joules
+HISTORY_ENERGY = {
+    "heater1_kwh": "h1d",
+    "heater2_kwh": "h2d",
+    "boost_kwh": ("h1b", "h2b"),
+    "imported_kwh": "imp",
+    "exported_kwh": "exp",
+    "generated_kwh": "gep",
+}
+
+
+def _period_start(moment: datetime, period: str) -> datetime:
+    start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "week":
+        start -= timedelta(days=start.weekday())
+    elif period == "month":
+        start = start.replace(day=1)
+    return start
+
+
+def _next_period(start: datetime, period: str) -> datetime:
+    if period == "day":
+        return start + timedelta(days=1)
+    if period == "week":
+        return start + timedelta(weeks=1)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def period_boundaries(first_ts: float, last_ts: float, period: str, tz: str = DEFAULT_TIMEZONE):
+    """Local period starts covering [first_ts, last_ts].
+
+    Boundaries are local midnights (Monday for weeks, the 1st for months)
+    resolved to UTC instants, so a day across a DST change is 23 or 25
+    hours long.
+
+    Args:
+        first_ts: Epoch seconds of the first sample
+        last_ts: Epoch seconds of the last sample
+        period: "day", "week" or "month"
+        tz: IANA time zone the periods are in
+
+    Returns:
+        (labels, starts): period labels and epoch-second starts as an
+        array, plus one extra start closing the last period
+
+    Raises:
+        ValueError: If period is unknown
+    """
+    np = require_numpy()
+    if period not in PERIODS:
+        raise ValueError(f"Invalid period: {period}. Must be one of {', '.join(PERIODS)}")
+    zone = ZoneInfo(tz)
+    local = _period_start(datetime.fromtimestamp(first_ts, zone).replace(tzinfo=None), period)
+    end = datetime.fromtimestamp(last_ts, zone).replace(tzinfo=None)
+    labels, starts = [], []
+    while True:
+        labels.append(local.strftime("%Y-%m" if period == "month" else "%Y-%m-%d"))
+        starts.append(local.replace(tzinfo=zone).timestamp())
+        local = _next_period(local, period)
+        if local > end:
+            starts.append(local.replace(tzinfo=zone).timestamp())
+            return labels, np.asarray(starts)
+
+
+def _bincount(groups, weights, size: int):
+    np = require_numpy()
+    return np.bincount(groups, weights=weights, minlength=size)[:size]
+
+
+def _scheduled_normal(schedule: Schedule, ts):
+    """Boolean array: whether the schedule wanted normal mode at each instant."""
+    np = require_numpy()
+    start = datetime.fromtimestamp(float(ts.min()), timezone.utc)
+    end = datetime.fromtimestamp(float(ts.max()), timezone.utc)
+    weeks = (end - start) / timedelta(weeks=1) + 1
+    index = schedule.compile(start, weeks=weeks)
+    actions = [t.action for t in index.transitions]
+    initial = index.initial.action if index.initial else "stop"
+    is_start = np.array([initial == "start"] + [a == "start" for a in actions])
+    position = np.searchsorted(np.asarray(index.timestamps, dtype=float), ts, side="right")
+    return is_start[position]
+
+
+def _rows(labels: Sequence[str], columns: Dict[str, Any], used) -> List[Dict[str, Any]]:
+    np = require_numpy()
+    rows = []
+    for i in np.flatnonzero(used):
+        row: Dict[str, Any] = {"period": labels[i]}
+        for name, values in columns.items():
+            value = values[i]
+            if np.issubdtype(values.dtype, np.integer):
+                row[name] = int(value)
+            else:
+                row[name] = None if np.isnan(value) else round(float(value), 3)
+        rows.append(row)
+    return rows
+
+
+def _schedule_columns(columns, groups, size, surplus, normal) -> None:
+    np = require_numpy()
+    captured = _bincount(groups, surplus * normal, size)
+    total = _bincount(groups, surplus, size)
+    columns["surplus_kwh"] = total / JOULES_PER_KWH
+    columns["surplus_while_stopped_kwh"] = (total - captured) / JOULES_PER_KWH
+    with np.errstate(invalid="ignore", divide="ignore"):
+        columns["schedule_match"] = np.where(total > 0, captured / total, np.nan)
+
+
+def summarize_telemetry(
+    rows,
+    period: str = "day",
+    tz: str = DEFAULT_TIMEZONE,
+    schedule: Optional[Schedule] = None,
+    max_gap: float = MAX_SAMPLE_GAP
+) -> List[Dict[str, Any]]:
+    """Summarize recorded samples (see TelemetryStore.load) per period.
+
+    Each sample stands for the time until the next one, capped at
+    ``max_gap``. Power readings are integrated over that time.
+
+    Args:
+        rows: Structured array of telemetry records of one device
+        period: "day", "week" or "month"
+        tz: Time zone of the periods
+        schedule: If given, adds how much surplus (export plus diversion)
+            fell while the schedule wanted the eddi running
+        max_gap: Longest interval, in seconds, a single sample stands for
+
+    Returns:
+        One dict per period with samples, diverted/exported/imported kWh,
+        hours in each state and, with a schedule, surplus_kwh,
+        surplus_while_stopped_kwh and schedule_match (0-1)
+    """
+    np = require_numpy()
+    if len(rows) == 0:
+        return []
+    ts = rows["ts"].astype(np.float64)
+    labels, starts = period_boundaries(ts[0], ts[-1], period, tz)
+    size = len(labels)
+    groups = np.searchsorted(starts, ts, side="right") - 1
+
+    gaps = np.diff(ts)
+    typical = float(np.median(gaps)) if len(gaps) else 0.0
+    seconds = np.minimum(np.append(gaps, typical), max_gap)
+
+    diversion = np.where(rows["diversion"] == MISSING_INT, 0, rows["diversion"]).astype(np.float64)
+    grid = np.where(rows["grid"] == MISSING_INT, 0, rows["grid"]).astype(np.float64)
+    diverted = diversion * seconds
+    exported = np.clip(-grid, 0, None) * seconds
+    imported = np.clip(grid, 0, None) * seconds
+
+    columns: Dict[str, Any] = {
+        "samples": np.bincount(groups, minlength=size)[:size],
+        "diverted_kwh": _bincount(groups, diverted, size) / JOULES_PER_KWH,
+        "exported_kwh": _bincount(groups, exported, size) / JOULES_PER_KWH,
+        "imported_kwh": _bincount(groups, imported, size) / JOULES_PER_KWH,
+    }
+    sta = rows["sta"]
+    for state in EddiState:
+        columns[f"hours_{state.name.lower()}"] = _bincount(groups, seconds * (sta == state), size) / 3600
+    columns["hours_unknown"] = _bincount(groups, seconds * (sta == MISSING_STA), size) / 3600
+
+    if schedule is not None:
+        _schedule_columns(columns, groups, size, diverted + exported, _scheduled_normal(schedule, ts))
+
+    return _rows(labels, columns, columns["samples"] > 0)
+
+
+def history_arrays(records: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Convert history records (see history_records) into column arrays.
+
+    Missing counters are zero, as in the API. This is the only step that
+    touches individual records; counters absent from every record are
+    filled with zeros without visiting the records again.
+    """
+    np = require_numpy()
+    wanted = {"ts"} | {key for spec in HISTORY_ENERGY.values() for key in ((spec,) if isinstance(spec, str) else spec)}
+    present = set()
+    for record in records:
+        present.update(record)
+    count = len(records)
+    return {
+        key: (
+            np.fromiter(map(dict.get, records, repeat(key), repeat(0)), dtype=np.float64, count=count)
+            if key in present else np.zeros(count)
+        )
+        for key in sorted(wanted)
+    }
+
+
+def summarize_history(
+    records,
+    period: str = "day",
+    tz: str = DEFAULT_TIMEZONE,
+    schedule: Optional[Schedule] = None
+) -> List[Dict[str, Any]]:
+    """Summarize downloaded history (see EddiClient.get_history) per period.
+
+    Args:
+        records: History records, or the arrays returned by history_arrays
+        period: "day", "week" or "month"
+        tz: Time zone of the periods
+        schedule: If given, adds how much surplus (export plus diversion)
+            fell while the schedule wanted the eddi running
+
+    Returns:
+        One dict per period with kWh per heater, boost, import, export and
+        generation, export_avoided_kwh (energy diverted instead of exported)
+        and, with a schedule, surplus_kwh, surplus_while_stopped_kwh and
+        schedule_match (0-1)
+    """
+    np = require_numpy()
+    data = records if isinstance(records, dict) else history_arrays(records)
+    ts = data["ts"]
+    if len(ts) == 0:
+        return []
+    order = np.argsort(ts, kind="stable")
+    data = {key: values[order] for key, values in data.items()}
+    ts = data["ts"]
+
+    labels, starts = period_boundaries(ts[0], ts[-1], period, tz)
+    size = len(labels)
+    groups = np.searchsorted(starts, ts, side="right") - 1
+
+    columns: Dict[str, Any] = {"samples": np.bincount(groups, minlength=size)[:size]}
+    for name, spec in HISTORY_ENERGY.items():
+        keys = (spec,) if isinstance(spec, str) else spec
+        joules = sum(data[key] for key in keys)
+        columns[name] = _bincount(groups, joules, size) / JOULES_PER_KWH
+    columns["export_avoided_kwh"] = columns["heater1_kwh"] + columns["heater2_kwh"]
+
+    if schedule is not None:
+        surplus = data["h1d"] + data["h2d"] + data["exp"]
+        _schedule_columns(columns, groups, size, surplus, _scheduled_normal(schedule, ts))
+
+    return _rows(labels, columns, columns["samples"] > 0)
@@ -0,0 +1,407 @@
+"""Asyncio client for interacting with myenergi eddi devices.
+
+Requires the optional ``httpx`` dependency (``pip install eddi-scheduler[async]``).
+"""
+
+import asyncio
+import time
+from datetime import date
+from typing import Optional, Dict, Any, Callable, Generator, List, Iterable, Sequence
+
+import httpx
+
+from .auth import DigestCache, PreemptiveDigestAuth
+from .client import eddi_status_path, mode_path, select_device
+from .core import SEND, ClientCore, Reply
+from .discovery import ServerCache
+from .history import (
+    DEFAULT_HISTORY_WORKERS, HistoryCache, day_range, day_records, history_path, split_cached,
+)
+from .metrics import RequestEvent
+from .models import EddiStatus, find_eddi_devices, json_loads, parse_eddi_statuses
+from .resilience import Resilience
+
+# Default number of requests a client keeps in flight at once
+DEFAULT_MAX_CONCURRENCY = 10
+
+# Seconds to wait for a response before giving up
+DEFAULT_TIMEOUT = 30.0
+
+
+class _DigestFlow(httpx.Auth):
+    """httpx auth flow answering digest challenges through a PreemptiveDigestAuth.
+
+    The async client thereby shares the on-disk digest cache with
+    EddiClient and answers preemptively from its first request.
+    """
+
+    def __init__(self, digest: PreemptiveDigestAuth):
+        self.digest = digest
+
+    def auth_flow(self, request: httpx.Request) -> Generator[httpx.Request, httpx.Response, None]:
+        header = self.digest.header_for(request.method, str(request.url))
+        if header:
+            request.headers["Authorization"] = header
+        response = yield request
+        if response.status_code != 401 or not self.digest.take_challenge(response.headers.get("www-authenticate", "")):
+            return
+        request.headers["Authorization"] = self.digest.header_for(request.method, str(request.url))
+        yield request
+
+
+class AsyncEddiClient(ClientCore):
+    """Asyncio client to interact with myenergi eddi device API.
+
+    Offers the methods of :class:`eddi_scheduler.client.EddiClient` as
+    coroutines. Server discovery, circuit breakers, retry budget and
+    backoff, request hooks and the status cache come from the same
+    :class:`~eddi_scheduler.core.ClientCore`, and digest challenges and
+    completed history days use the same on-disk caches. Pass the same
+    ``semaphore`` to several clients to cap the number of requests in
+    flight across a whole fleet of hubs.
+
+    The command, fleet and verification code (``control``, ``fleet``, the
+    CLI and ``scripts/eddi_control.py``) drive the sync EddiClient.
+    """
+
+    def __init__(
+        self,
+        serial_number: str,
+        api_key: str,
+        base_url: Optional[str] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        semaphore: Optional[asyncio.Semaphore] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        server_cache: Optional[ServerCache] = None,
+        digest_cache: Optional[DigestCache] = None,
+        persist_digest: bool = True,
+        status_ttl: float = 0.0,
+        history_cache: Optional[HistoryCache] = None,
+        hooks: Optional[Sequence[Callable[[RequestEvent], None]]] = None,
+        resilience: Optional[Resilience] = None,
+    ):
+        """Initialize the async eddi client.
+
+        Args:
+            serial_number: The hub serial number (used as username)
+            api_key: The API key/password from myenergi app
+            base_url: Optional base URL. If not provided, the server is
+                discovered through the myenergi director and cached on disk
+            max_concurrency: Maximum requests in flight for this client
+            semaphore: Optional semaphore shared with other clients; overrides
+                max_concurrency when given
+            timeout: Request timeout in seconds
+            transport: Optional httpx transport (mainly for testing)
+            server_cache: Cache of discovered servers (default: on-disk cache)
+            digest_cache: Cache of digest challenges (default: on-disk cache)
+            persist_digest: Reuse digest challenges across client instances and
+                runs, so a new session skips the initial 401 round-trip
+            status_ttl: Seconds a status response is reused by later calls
+                (0 disables caching; concurrent calls are always coalesced)
+            history_cache: Cache of completed history days (default: on-disk cache)
+            hooks: Callables receiving a RequestEvent after every HTTP
+                exchange (default: record to the metrics REGISTRY)
+            resilience: Circuit breakers, retry budget and request retry
+                policy (default: DEFAULT_RESILIENCE, shared with EddiClient)
+        """
+        super().__init__(serial_number, base_url, server_cache, status_ttl, hooks, resilience)
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.history_cache = history_cache or HistoryCache()
+        # Created lazily so it binds to the running event loop
+        self._semaphore = semaphore
+
+        if persist_digest and digest_cache is None:
+            digest_cache = DigestCache()
+        self.auth = PreemptiveDigestAuth(serial_number, api_key, digest_cache if persist_digest else None)
+        self.client = httpx.AsyncClient(
+            auth=_DigestFlow(self.auth),
+            headers={
+                "accept": "application/json",
+                "content-type": "application/json"
+            },
+            limits=httpx.Limits(max_connections=max_concurrency),
+            timeout=timeout,
+            transport=transport,
+        )
+
+        # In-flight status requests, keyed by API path
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def __aenter__(self) -> "AsyncEddiClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the underlying HTTP connections."""
+        await self.client.aclose()
+
+    def _limiter(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _request(self, path: str) -> httpx.Response:
+        """GET an API path, following the steps of ClientCore.exchange."""
+        steps = self.exchange(path)
+        try:
+            step = next(steps)
+            while True:
+                if step is SEND:
+                    reply = await self._send(path)
+                else:
+                    await self.resilience.clock.sleep_async(step)
+                    reply = None
+                try:
+                    step = steps.send(reply)
+                except StopIteration as done:
+                    return done.value
+        finally:
+            steps.close()
+
+    async def _send(self, path: str) -> Reply:
+        async with self._limiter():
+            started = time.perf_counter()
+            try:
+                response = await self.client.get(f"{self.base_url}/{path}")
+            except httpx.TransportError as e:
+                # Connection problems and timeouts are the server's failures
+                return Reply(time.perf_counter() - started, error=e, server_failure=True)
+            return Reply(time.perf_counter() - started, response)
+
+    async def _get(self, path: str) -> Any:
+        """Send a GET request for an API path and decode the JSON response.
+
+        When discovering, a server that rejects the hub is dropped from the
+        cache and the request is retried once through the director.
+        """
+        try:
+            response = await self._request(path)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            status = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+            if not self._forget_server(isinstance(e, httpx.TransportError), status):
+                raise
+            response = await self._request(path)
+            response.raise_for_status()
+
+        self._follow_asn(response.headers)
+        self.auth.persist()
+        return json_loads(response.content)
+
+    async def _get_status_path(self, path: str) -> Any:
+        """Fetch a status path through the TTL cache and single-flight gate.
+
+        Callers asking for the same path while a request is in flight await
+        that request instead of issuing their own. Results are shared, so
+        callers must not modify them.
+        """
+        cached = self._cached_status(path)
+        if cached is not None:
+            return cached
+        flight = self._inflight.get(path)
+        if flight is not None:
+            return await asyncio.shield(flight)
+
+        flight = asyncio.get_running_loop().create_future()
+        self._inflight[path] = flight
+        generation = self._status_generation
+        started = time.monotonic()
+        try:
+            result = await self._get(path)
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            # Mark retrieved so an unawaited flight does not log a warning
+            flight.exception()
+            raise
+        finally:
+            del self._inflight[path]
+
+        flight.set_result(result)
+        self._store_status(path, started, result, generation)
+        return result
+
+    async def get_status(self) -> List[Dict[str, Any]]:
+        """Get the status of all devices.
+
+        Returns:
+            List of device status information
+
+        Raises:
+            httpx.HTTPError: If the API request fails
+        """
+        return await self._get_status_path("cgi-jstatus-*")
+
+    async def get_eddi_devices(self, eddi_serial: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get list of eddi devices.
+
+        Queries only the eddi block of the hub (or a single eddi when a
+        serial is given) instead of the full status of every device.
+
+        Args:
+            eddi_serial: Optional serial number to fetch a single eddi
+
+        Returns:
+            List of eddi device information
+
+        Raises:
+            httpx.HTTPError: If the API request fails
+        """
+        status = await self._get_status_path(eddi_status_path(eddi_serial))
+        return select_device(find_eddi_devices(status), eddi_serial)
+
+    async def get_eddi_statuses(
+        self,
+        eddi_serial: Optional[str] = None
+    ) -> List[EddiStatus]:
+        """Get typed status snapshots of eddi devices.
+
+        Args:
+            eddi_serial: Optional serial number to fetch a single eddi
+
+        Returns:
+            List of eddi statuses
+
+        Raises:
+            httpx.HTTPError: If the API request fails
+        """
+        status = await self._get_status_path(eddi_status_path(eddi_serial))
+        statuses = parse_eddi_statuses(status)
+        if eddi_serial is not None:
+            statuses = [s for s in statuses if str(s.serial) == str(eddi_serial)]
+        return statuses
+
+    async def get_history(
+        self,
+        eddi_serial: str,
+        start: date,
+        end: date,
+        hourly: bool = False,
+        max_workers: int = DEFAULT_HISTORY_WORKERS
+    ) -> List[Dict[str, Any]]:
+        """Get minute (or hourly) history of an eddi device over a range of days.
+
+        Days are fetched concurrently. Completed past days are cached on
+        disk, shared with EddiClient, and never fetched again; today is
+        always refetched.
+
+        Args:
+            eddi_serial: Serial number of the eddi device
+            start: First UTC day
+            end: Last UTC day (included)
+            hourly: Fetch hourly totals instead of minute data
+            max_workers: Maximum days fetched at the same time
+
+        Returns:
+            Records in time order, each with a ``ts`` epoch timestamp added
+
+        Raises:
+            ValueError: If end is before start
+            httpx.HTTPError: If an API request fails
+        """
+        if end < start:
+            raise ValueError(f"End date {end} is before start date {start}")
+        days = day_range(start, end)
+        results, missing = split_cached(eddi_serial, days, hourly, self.history_cache)
+        limit = asyncio.Semaphore(max_workers)
+
+        async def fetch(day: date) -> List[Dict[str, Any]]:
+            async with limit:
+                payload = await self._get(history_path(eddi_serial, day, hourly))
+            return day_records(payload, eddi_serial, day, hourly, self.history_cache)
+
+        for day, records in zip(missing, await asyncio.gather(*(fetch(day) for day in missing))):
+            results[day] = records
+        return [record for day in days for record in results[day]]
+
+    async def set_mode(self, eddi_serial: str, mode: str) -> Dict[str, Any]:
+        """Set the mode for an eddi device.
+
+        Args:
+            eddi_serial: Serial number of the eddi device
+            mode: Mode to set ('stop' or 'normal')
+
+        Returns:
+            API response as dictionary
+
+        Raises:
+            ValueError: If mode is invalid
+            httpx.HTTPError: If the API request fails
+
+        Cached status is invalidated, as the device state is about to change.
+        """
+        path = mode_path(eddi_serial, mode)
+        try:
+            return await self._get(path)
+        finally:
+            self.invalidate_status()
+
+    async def ensure_mode(self, eddi_serial: str, mode: str) -> Optional[Dict[str, Any]]:
+        """Set the mode of an eddi device only if it is not already in it.
+
+        The current state is read once; no command is sent when it already
+        matches. The change is not verified (see control.reconcile, which
+        drives EddiClient).
+
+        Args:
+            eddi_serial: Serial number of the eddi device
+            mode: Mode wanted ('stop' or 'normal')
+
+        Returns:
+            API response of the mode change, or None if nothing was sent
+
+        Raises:
+            ValueError: If mode is invalid
+            httpx.HTTPError: If an API request fails
+        """
+        mode_path(eddi_serial, mode)
+        statuses = await self.get_eddi_statuses(eddi_serial)
+        if statuses and statuses[0].in_mode(mode):
+            return None
+        return await self.set_mode(eddi_serial, mode)
+
+    async def stop(self, eddi_serial: str) -> Dict[str, Any]:
+        """Put eddi device into stop mode.
+
+        Args:
+            eddi_serial: Serial number of the eddi device
+
+        Returns:
+            API response as dictionary
+        """
+        return await self.set_mode(eddi_serial, "stop")
+
+    async def start(self, eddi_serial: str) -> Dict[str, Any]:
+        """Put eddi device into normal mode (exit stop mode).
+
+        Args:
+            eddi_serial: Serial number of the eddi device
+
+        Returns:
+            API response as dictionary
+        """
+        return await self.set_mode(eddi_serial, "normal")
+
+
+async def gather_status(
+    clients: Iterable[AsyncEddiClient],
+) -> List[Any]:
+    """Fetch the status of many hubs concurrently.
+
+    Args:
+        clients: Clients to poll, one per hub
+
+    Returns:
+        One entry per client, in order: the status list, or the exception
+        raised while fetching it
+    """
+    return await asyncio.gather(
+        *(client.get_status() for client in clients),
+        return_exceptions=True
+    )
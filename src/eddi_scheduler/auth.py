@@ -0,0 +1,137 @@
+"""Digest authentication that reuses challenges across requests and runs."""
+
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from requests.auth import HTTPDigestAuth
+from requests.utils import parse_dict_header
+
+from .cache import JsonCache, cache_dir
+
+# Seconds a saved challenge is offered to the server before asking for a new one
+DEFAULT_DIGEST_MAX_AGE = 3600
+
+# Challenge fields that identify a nonce; the cache is written only when one changes
+CHALLENGE_FIELDS = ("realm", "nonce", "opaque")
+
+
+class DigestCache:
+    """Digest challenge state (realm, nonce, nonce count) persisted per user.
+
+    Only the server's challenge is stored, never the password, so the file
+    holds nothing that grants access on its own.
+    """
+
+    def __init__(self, path: Optional[Path] = None, max_age: float = DEFAULT_DIGEST_MAX_AGE):
+        """Initialize the digest cache.
+
+        Args:
+            path: Cache file location (default: digest.json in the cache directory)
+            max_age: Seconds a saved challenge stays usable
+        """
+        self.store = JsonCache(path or cache_dir() / "digest.json")
+        self.max_age = max_age
+
+    def load(self, username: str) -> Optional[Dict[str, Any]]:
+        """Return the saved state for a user, if present and fresh."""
+        entry = self.store.load().get(username)
+        if not isinstance(entry, dict) or not isinstance(entry.get("chal"), dict):
+            return None
+        if time.time() - entry.get("updated", 0) > self.max_age:
+            return None
+        return entry
+
+    def save(self, username: str, state: Dict[str, Any]) -> None:
+        """Save the state for a user."""
+        entry = {**state, "updated": time.time()}
+        self.store.update(lambda data: data.update({username: entry}))
+
+    def clear(self, username: str) -> None:
+        """Forget the state for a user."""
+        self.store.update(lambda data: data.pop(username, None) is not None)
+
+
+class PreemptiveDigestAuth(HTTPDigestAuth):
+    """HTTPDigestAuth that can start from a previously seen challenge.
+
+    ``HTTPDigestAuth`` already answers later requests in a session
+    preemptively once it has a nonce. This subclass seeds that state from a
+    :class:`DigestCache`, so the first request of a new session or process
+    skips the 401 round-trip too. If the saved nonce is stale the server
+    replies 401 with a fresh challenge, which the base class handles by
+    retrying once, exactly as it would without a cache.
+
+    The cache is written only when the server issues a new challenge, not
+    on every request, so the saved nonce count can lag behind. A server
+    that rejects the repeated count answers like it does for a stale
+    nonce, at the cost of the same single extra round trip.
+    """
+
+    def __init__(self, username: str, password: str, cache: Optional[DigestCache] = None):
+        super().__init__(username, password)
+        self.cache = cache
+        self._seed = cache.load(username) if cache is not None else None
+        self._saved_challenge = _challenge_key(self._seed)
+
+    def init_per_thread_state(self) -> None:
+        first_call = not hasattr(self._thread_local, "init")
+        super().init_per_thread_state()
+        if first_call and self._seed:
+            self._thread_local.chal = dict(self._seed["chal"])
+            self._thread_local.last_nonce = self._seed.get("last_nonce", "")
+            self._thread_local.nonce_count = self._seed.get("nonce_count", 0)
+
+    def header_for(self, method: str, url: str) -> Optional[str]:
+        """Authorization header for a request, if a challenge is known.
+
+        Lets other HTTP libraries (see AsyncEddiClient) answer challenges
+        with the same state and cache as requests does.
+        """
+        self.init_per_thread_state()
+        if not self._thread_local.chal:
+            return None
+        return self.build_digest_header(method, url)
+
+    def take_challenge(self, www_authenticate: str) -> bool:
+        """Use the Digest challenge of a 401 response for later requests.
+
+        Returns:
+            False if the header holds no Digest challenge
+        """
+        if "digest" not in www_authenticate.lower():
+            return False
+        self.init_per_thread_state()
+        self._thread_local.chal = parse_dict_header(re.sub(r"digest ", "", www_authenticate, count=1, flags=re.IGNORECASE))
+        return True
+
+    def state(self) -> Optional[Dict[str, Any]]:
+        """Return the current thread's challenge state, if any."""
+        if not getattr(self._thread_local, "last_nonce", ""):
+            return None
+        return {
+            "chal": dict(self._thread_local.chal),
+            "last_nonce": self._thread_local.last_nonce,
+            "nonce_count": self._thread_local.nonce_count,
+        }
+
+    def persist(self) -> None:
+        """Save the current challenge state if the server issued a new challenge."""
+        if self.cache is None:
+            return
+        state = self.state()
+        challenge = _challenge_key(state)
+        if state is None or challenge == self._saved_challenge:
+            return
+        self.cache.save(self.username, state)
+        self._saved_challenge = challenge
+        # Other threads starting later continue from the newest state
+        self._seed = state
+
+
+def _challenge_key(state: Optional[Dict[str, Any]]) -> Optional[tuple]:
+    """The fields of a saved state that identify its challenge."""
+    if not state:
+        return None
+    return tuple(state["chal"].get(name) for name in CHALLENGE_FIELDS)
@@ -0,0 +1,200 @@
+"""Closed-loop control that follows solar surplus instead of the clock."""
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Optional, Tuple
+
+
+@dataclass
+class AutopilotConfig:
+    """Thresholds and limits of the autopilot.
+
+    Surplus is diversion plus export (``div - grd``): what the heater could
+    use right now. The eddi is started when the rolling mean surplus rises
+    to ``start_above`` watts and stopped when it falls to ``stop_below``;
+    the gap between the two keeps it from flapping around one threshold.
+    For ``settle`` seconds after a command, readings that do not yet show
+    the new mode are treated as the device still moving through it.
+    """
+
+    interval: float = 10.0
+    window: int = 3
+    start_above: float = 500.0
+    stop_below: float = 100.0
+    min_on: float = 600.0
+    min_off: float = 300.0
+    max_calls_per_hour: int = 600
+    settle: float = 300.0
+
+    def __post_init__(self):
+        if self.stop_below >= self.start_above:
+            raise ValueError("stop_below must be lower than start_above")
+        if self.window < 1 or self.interval <= 0:
+            raise ValueError("window and interval must be positive")
+        if self.max_calls_per_hour < 2:
+            raise ValueError("max_calls_per_hour must be at least 2 (a poll and a command)")
+
+
+class TokenBucket:
+    """Allows bursts up to ``capacity`` calls and ``rate`` calls per second on average."""
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens if available; returns False (taking nothing) otherwise."""
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """Seconds until the given number of tokens is available."""
+        self._refill()
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+
+class Autopilot:
+    """Start and stop an eddi from its own surplus readings.
+
+    Each poll adds the surplus to a rolling window. Commands are only sent
+    when the window mean crosses a threshold, the current mode has been
+    held for its minimum dwell time, and the API budget has a call to
+    spare. Polls themselves also draw from the budget, and are skipped
+    when it runs dry, so a long run never exceeds ``max_calls_per_hour``.
+    """
+
+    def __init__(
+        self,
+        client,
+        device_serial: str,
+        config: Optional[AutopilotConfig] = None,
+        log: Callable[[str], None] = print,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Initialize the autopilot.
+
+        Args:
+            client: EddiClient instance
+            device_serial: Serial number of the eddi to control
+            config: Thresholds and limits (default: AutopilotConfig())
+            log: Callable used to report decisions
+            clock: Monotonic clock in seconds
+        """
+        self.client = client
+        self.device_serial = str(device_serial)
+        self.config = config or AutopilotConfig()
+        self.log = log
+        self.clock = clock
+        hourly = self.config.max_calls_per_hour
+        # Hold back a few calls so a command is possible even when polling
+        # has used the steady rate. The burst is taken out of the refill, so
+        # no hour (the first included) sees more than max_calls_per_hour
+        burst = min(max(2.0, hourly / 60), hourly / 2)
+        self.budget = TokenBucket((hourly - burst) / 3600, burst, clock)
+        self.window: Deque[Tuple[float, float]] = deque(maxlen=self.config.window)
+        self.mode: Optional[str] = None
+        self.pending: Optional[str] = None
+        self.changed_at = -float("inf")
+        self.commands = 0
+        self.stop_event = threading.Event()
+
+    def mean_surplus(self) -> Optional[float]:
+        """Mean surplus over the window, or None until the window is full."""
+        if len(self.window) < self.config.window:
+            return None
+        return sum(surplus for _, surplus in self.window) / len(self.window)
+
+    def observe(self, status) -> None:
+        """Add a status reading to the rolling window and track the device mode.
+
+        The mode follows every reading, so a switch made outside the
+        autopilot (the app, a schedule) is picked up. Readings taken while
+        a command is still settling are ignored unless they show its mode.
+        """
+        if status.sta is not None:
+            self._track_mode("stop" if status.in_mode("stop") else "normal")
+        surplus = (status.diversion or 0) - (status.grid or 0)
+        self.window.append((self.clock(), surplus))
+
+    def _track_mode(self, observed: str) -> None:
+        settling = self.clock() - self.changed_at < self.config.settle
+        if self.pending is not None and observed != self.pending and settling:
+            return
+        self.pending = None
+        if self.mode is not None and observed != self.mode:
+            self.log(f"Device is in {observed} mode, changed outside the autopilot")
+            self.changed_at = self.clock()
+        self.mode = observed
+
+    def decide(self) -> Optional[str]:
+        """Return the mode to switch to now ("normal" or "stop"), if any."""
+        surplus = self.mean_surplus()
+        if surplus is None or self.mode is None:
+            return None
+        held = self.clock() - self.changed_at
+        if self.mode == "stop" and surplus >= self.config.start_above and held >= self.config.min_off:
+            return "normal"
+        if self.mode == "normal" and surplus <= self.config.stop_below and held >= self.config.min_on:
+            return "stop"
+        return None
+
+    def step(self) -> Optional[str]:
+        """Poll once and act on the result.
+
+        Returns:
+            The mode that was set, or None
+        """
+        if not self.budget.try_acquire():
+            self.log("API budget exhausted, skipping poll")
+            return None
+        try:
+            statuses = self.client.get_eddi_statuses(self.device_serial)
+        except Exception as e:
+            self.log(f"Error polling status: {e}")
+            return None
+        if not statuses:
+            self.log(f"Device {self.device_serial} not found")
+            return None
+        self.observe(statuses[0])
+
+        mode = self.decide()
+        if mode is None:
+            return None
+        if not self.budget.try_acquire():
+            self.log(f"Would switch to {mode} mode, but the API budget is exhausted")
+            return None
+        self.log(f"Mean surplus {self.mean_surplus():.0f}W, switching to {mode} mode")
+        try:
+            self.client.set_mode(self.device_serial, mode)
+        except Exception as e:
+            self.log(f"Error setting {mode} mode: {e}")
+            return None
+        self.mode = self.pending = mode
+        self.changed_at = self.clock()
+        self.commands += 1
+        # Readings from before the switch say nothing about the new mode
+        self.window.clear()
+        return mode
+
+    def run(self) -> None:
+        """Poll every interval until stop() is called."""
+        while not self.stop_event.is_set():
+            self.step()
+            self.stop_event.wait(max(self.config.interval, self.budget.wait_time()))
+
+    def stop(self) -> None:
+        """Ask the autopilot to exit after the current poll."""
+        self.stop_event.set()
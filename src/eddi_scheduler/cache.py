@@ -0,0 +1,95 @@
+"""Small on-disk JSON caches shared by the client and CLI, and data locations."""
+
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+# One lock per cache file, shared by every JsonCache of that file in the
+# process, so that updates from parallel threads (such as a fleet run's
+# clients) do not overwrite each other's entries
+_FILE_LOCKS: Dict[Path, threading.RLock] = {}
+_FILE_LOCKS_GUARD = threading.Lock()
+
+
+def _file_lock(path: Path) -> threading.RLock:
+    with _FILE_LOCKS_GUARD:
+        return _FILE_LOCKS.setdefault(path.absolute(), threading.RLock())
+
+
+def cache_dir() -> Path:
+    """Return the directory used for eddi-scheduler cache files.
+
+    Uses ``EDDI_CACHE_DIR`` if set, otherwise ``$XDG_CACHE_HOME/eddi-scheduler``
+    (falling back to ``~/.cache/eddi-scheduler``).
+    """
+    override = os.environ.get("EDDI_CACHE_DIR")
+    if override:
+        return Path(override)
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "eddi-scheduler"
+
+
+def data_dir() -> Path:
+    """Return the directory used for recorded data that cannot be rebuilt.
+
+    Uses ``EDDI_DATA_DIR`` if set, otherwise ``$XDG_DATA_HOME/eddi-scheduler``
+    (falling back to ``~/.local/share/eddi-scheduler``).
+    """
+    override = os.environ.get("EDDI_DATA_DIR")
+    if override:
+        return Path(override)
+    base = os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share"
+    return Path(base) / "eddi-scheduler"
+
+
+class JsonCache:
+    """A JSON document stored in a single file.
+
+    Reads never raise: a missing or corrupt file is treated as empty, since
+    everything stored here can be rebuilt from the API. Writes are atomic and
+    the file is only readable by the current user. Use :meth:`update` to
+    change part of the document, so concurrent changes are not lost.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = _file_lock(self.path)
+
+    def load(self) -> Dict[str, Any]:
+        """Read the cached document, or an empty dict if unavailable."""
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def save(self, data: Dict[str, Any]) -> None:
+        """Write the document, ignoring failures (the cache is best effort)."""
+        tmp_path: Optional[str] = None
+        with self._lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.chmod(tmp_path, 0o600)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                if tmp_path is not None and os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+
+    def update(self, change: Callable[[Dict[str, Any]], Optional[bool]]) -> None:
+        """Load, change and save the document under the file's lock.
+
+        Args:
+            change: Callable modifying the loaded document in place; the
+                document is written unless it returns False (nothing changed)
+        """
+        with self._lock:
+            data = self.load()
+            if change(data) is not False:
+                self.save(data)
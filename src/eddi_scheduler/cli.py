@@ -1,21 +1,42 @@
 """Command-line interface for eddi-scheduler."""
 
 import sys
+import csv
 import json
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, List, Optional
 import click
 from dotenv import load_dotenv
 from .client import EddiClient
+from .models import COMMAND_MODES, STATUS_CODES, EddiStatus
+from .resilience import RUN_BUDGET
+# Only option defaults are imported up front; each command imports what it
+# runs, so that `eddi --help` and light commands start quickly
+from .analytics import PERIODS
+from .autopilot import AutopilotConfig
+from .control import BATCH_MAX_WORKERS, MAX_RETRIES
+from .daemon import DEFAULT_CATCH_UP
+from .fleet import DEFAULT_MAX_WORKERS, FLEET_COMMANDS
+from .history import DEFAULT_HISTORY_WORKERS
+from .recorder import DEFAULT_INTERVAL
+from .watch import DEFAULT_WATCH_INTERVAL
 
-# Status code meanings
-STATUS_CODES = {
-    1: "Paused",
-    3: "Diverting",
-    4: "Boosting",
-    5: "Max Temp Reached",
-    6: "Stopped"
-}
+if TYPE_CHECKING:
+    from .schedule import Schedule
+
+# STATUS_CODES was defined here before moving to models; kept importable
+__all__ = ["STATUS_CODES", "cli", "main"]
+
+# Default address of `eddi serve`: local connections only, as status reads
+# need no token
+GATEWAY_HOST = "127.0.0.1"
+GATEWAY_PORT = 8765
+
+# Subcommands that do not act on the hub given by --serial/--api-key
+STANDALONE_COMMANDS = {"fleet", "latency", "schedule", "record", "report", "simulate", "serve"}
 
 # Load .env file if it exists in current working directory
 # Note: The .env file must be in the directory where you run the command
@@ -38,11 +59,23 @@ if env_path.exists():
 @click.option(
     "--base-url",
     envvar="EDDI_BASE_URL",
-    default="https://s18.myenergi.net",
-    help="Base URL for API (default: https://s18.myenergi.net, or set via .env file)"
+    help="Base URL for API (default: discovered via director.myenergi.net and cached, or set via .env file)"
+)
+@click.option(
+    "--metrics-file",
+    envvar="EDDI_METRICS_FILE",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write request and command metrics to this file in OpenMetrics format (every 30s and on exit)"
+)
+@click.option(
+    "--metrics-port",
+    envvar="EDDI_METRICS_PORT",
+    type=int,
+    help="Serve metrics on http://127.0.0.1:PORT/metrics while the command runs"
 )
 @click.pass_context
-def cli(ctx, serial: str, api_key: str, base_url: str):
+def cli(ctx, serial: str, api_key: str, base_url: Optional[str], metrics_file: Optional[Path],
+        metrics_port: Optional[int]):
     """Control myenergi eddi device modes.
     
     Credentials can be provided via:
@@ -53,6 +86,21 @@ def cli(ctx, serial: str, api_key: str, base_url: str):
     Set EDDI_SERIAL_NUMBER and EDDI_API_KEY environment variables
     to avoid passing credentials on command line.
     """
+    ctx.ensure_object(dict)
+    # Each command is one run of the retry budget
+    RUN_BUDGET.reset()
+    if metrics_file is not None:
+        from .metrics import FileExporter
+        ctx.call_on_close(FileExporter(metrics_file).start().stop)
+    if metrics_port is not None:
+        from .metrics import serve as serve_metrics
+        server = serve_metrics(metrics_port)
+        ctx.call_on_close(server.shutdown)
+    # Standalone commands that can optionally reach the hub build their own client
+    ctx.obj["credentials"] = (serial, api_key, base_url or None)
+    if ctx.invoked_subcommand in STANDALONE_COMMANDS:
+        return
+
     # Validate that required credentials are provided
     if not serial:
         click.echo("Error: Missing --serial option or EDDI_SERIAL_NUMBER environment variable", err=True)
@@ -64,8 +112,21 @@ def cli(ctx, serial: str, api_key: str, base_url: str):
         click.echo("Tip: Create a .env file in the current directory with EDDI_API_KEY=your_key", err=True)
         sys.exit(1)
     
-    ctx.ensure_object(dict)
-    ctx.obj["client"] = EddiClient(serial, api_key, base_url)
+    ctx.obj["client"] = EddiClient(serial, api_key, base_url or None)
+
+
+def _field_list(ctx, param, value: Optional[str]) -> Optional[List[str]]:
+    """Split and check the --fields option."""
+    from .watch import resolve_fields
+
+    if value is None:
+        return None
+    names = [item.strip() for item in value.split(",") if item.strip()]
+    try:
+        resolve_fields(names)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    return names
 
 
 @cli.command()
@@ -74,130 +135,1134 @@ def cli(ctx, serial: str, api_key: str, base_url: str):
     "--device",
     help="Specific eddi serial number (if multiple devices)"
 )
-def status(ctx, device: Optional[str]):
-    """Show status of eddi device(s)."""
+@click.option(
+    "--format", "output_format",
+    type=click.Choice(["text", "table", "json", "ndjson"]),
+    default="text",
+    show_default=True,
+    help="Output format (json and ndjson print one compact document per line when watching)"
+)
+@click.option(
+    "--fields",
+    callback=_field_list,
+    help="Comma-separated fields to show, e.g. sta,div,grd or sta,diversion,grid (serial is always included)"
+)
+@click.option(
+    "--watch", "watch_interval",
+    is_flag=False,
+    flag_value=DEFAULT_WATCH_INTERVAL,
+    default=None,
+    type=click.FloatRange(min=1),
+    metavar="[INTERVAL]",
+    help=f"Keep polling every INTERVAL seconds (default {DEFAULT_WATCH_INTERVAL:g}) and print only changed fields"
+)
+@click.option("--count", type=click.IntRange(min=1), help="Stop watching after COUNT samples")
+def status(ctx, device: Optional[str], output_format: str, fields: Optional[List[str]],
+           watch_interval: Optional[float], count: Optional[int]):
+    """Show status of eddi device(s).
+
+    With --watch the same connection is reused for every sample; the first
+    sample shows every field and later ones only what changed, with the
+    device serial and a timestamp. Stop with Ctrl+C or SIGTERM.
+    """
+    from .watch import project, resolve_fields
+
     client: EddiClient = ctx.obj["client"]
-    
+    keys = resolve_fields(fields)
+
+    if watch_interval is not None:
+        _watch_status(client, device, fields, watch_interval, count, output_format)
+        return
+
     try:
-        devices = client.get_eddi_devices()
-        
-        if not devices:
-            click.echo("No eddi devices found.")
-            sys.exit(1)
-        
+        devices = client.get_eddi_devices(device)
+    except Exception as e:
+        click.echo(f"Error getting status: {e}", err=True)
+        sys.exit(1)
+
+    if not devices:
         if device:
-            devices = [d for d in devices if str(d.get("sno")) == device]
-            if not devices:
-                click.echo(f"No eddi device found with serial: {device}")
-                sys.exit(1)
-        
+            click.echo(f"No eddi device found with serial: {device}")
+        else:
+            click.echo("No eddi devices found.")
+        sys.exit(1)
+
+    if output_format == "json":
+        click.echo(json.dumps([project(eddi, keys) for eddi in devices], separators=(",", ":")))
+        return
+    if output_format == "ndjson":
         for eddi in devices:
-            serial = eddi.get("sno")
-            sta = eddi.get("sta", 0)
-            status_text = STATUS_CODES.get(sta, f"Unknown ({sta})")
-            div = eddi.get("div", 0)
-            grd = eddi.get("grd", 0)
-            temp1 = eddi.get("tp1", -1)
-            temp2 = eddi.get("tp2", -1)
-            heater1 = eddi.get("ht1", "Heater 1")
-            heater2 = eddi.get("ht2", "Heater 2")
-            
-            click.echo(f"\n=== Eddi Device {serial} ===")
-            click.echo(f"Status: {status_text} (sta={sta})")
-            click.echo(f"Diverting: {div}W")
-            click.echo(f"Grid: {grd}W (negative = exporting)")
-            click.echo(f"{heater1}: {temp1}°C")
-            click.echo(f"{heater2}: {temp2}°C")
-            click.echo(f"\nFull device data:")
-            click.echo(json.dumps(eddi, indent=2))
-            
+            click.echo(json.dumps(project(eddi, keys), separators=(",", ":")))
+        return
+    if output_format == "table":
+        click.echo(_format_table([project(eddi, keys) for eddi in devices]))
+        return
+
+    for eddi in devices:
+        snapshot = EddiStatus.from_dict(eddi)
+        temp1 = snapshot.temp1 if snapshot.temp1 is not None else -1
+        temp2 = snapshot.temp2 if snapshot.temp2 is not None else -1
+
+        click.echo(f"\n=== Eddi Device {snapshot.serial} ===")
+        click.echo(f"Status: {snapshot.status_text} (sta={snapshot.sta})")
+        click.echo(f"Diverting: {snapshot.diversion or 0}W")
+        click.echo(f"Grid: {snapshot.grid or 0}W (negative = exporting)")
+        click.echo(f"{snapshot.heater1 or 'Heater 1'}: {temp1}°C")
+        click.echo(f"{snapshot.heater2 or 'Heater 2'}: {temp2}°C")
+        click.echo(f"\nFull device data:")
+        click.echo(json.dumps(project(eddi, keys), indent=2))
+
+
+def _watch_status(client: EddiClient, device: Optional[str], fields, interval: float,
+                  count: Optional[int], output_format: str):
+    """Print status changes until interrupted or COUNT samples were taken."""
+    from .watch import StatusWatcher
+
+    watcher = StatusWatcher(client, device, fields, interval)
+
+    def handle(signum, frame):
+        watcher.stop()
+
+    def report(error: Exception):
+        click.echo(f"Error getting status: {error}", err=True)
+
+    signal.signal(signal.SIGINT, handle)
+    signal.signal(signal.SIGTERM, handle)
+    for events in watcher.run(count, on_error=report):
+        for event in events:
+            if output_format in ("json", "ndjson"):
+                click.echo(json.dumps(event, separators=(",", ":")))
+                continue
+            when = datetime.fromtimestamp(event.pop("ts")).strftime("%H:%M:%S")
+            serial = event.pop("sno")
+            changes = " ".join(f"{key}={json.dumps(value)}" for key, value in event.items())
+            click.echo(f"{when} {serial} {changes}")
+
+
+# Messages shown after sending a command without waiting for it
+COMMAND_HINTS = {
+    "stop": ("Device will stop diverting within 5-10 seconds", "Use 'status' command to verify"),
+    "start": (
+        "Device will resume normal operation within 40-50 seconds",
+        "Use 'status' command to verify when it starts diverting",
+    ),
+}
+
+
+def _target_devices(client: EddiClient, devices, all_devices: bool):
+    """Return the serials to act on: those given, every eddi, or the first one."""
+    if devices and not all_devices:
+        return list(devices)
+    found = client.get_eddi_devices()
+    if not found:
+        click.echo("No eddi devices found.")
+        sys.exit(1)
+    if all_devices:
+        serials = [str(eddi.get("sno")) for eddi in found]
+        click.echo(f"Using eddi devices: {', '.join(serials)}")
+        return serials
+    serial = str(found[0].get("sno"))
+    click.echo(f"Using eddi device: {serial}")
+    return [serial]
+
+
+def _send_mode(ctx, command: str, devices, all_devices: bool, wait: bool, max_retries: int) -> None:
+    """Send a stop/start to one or more devices, optionally verifying them."""
+    from .control import execute_batch_with_retry
+    from .latency import LatencyModel
+
+    client: EddiClient = ctx.obj["client"]
+    action = "stop" if command == "stop" else "normal"
+
+    try:
+        serials = _target_devices(client, devices, all_devices)
+
+        if wait:
+            results = execute_batch_with_retry(
+                command, client, serials, max_retries, log=click.echo, latency=LatencyModel()
+            )
+            failed = [serial for serial, ok in results.items() if not ok]
+            click.echo(f"\n{len(results) - len(failed)}/{len(results)} device(s) verified")
+            if failed:
+                sys.exit(1)
+            return
+
+        with ThreadPoolExecutor(max_workers=min(BATCH_MAX_WORKERS, len(serials))) as executor:
+            responses = list(executor.map(getattr(client, command), serials))
+
+        for serial, result in zip(serials, responses):
+            if result.get("status") == 0:
+                click.echo(f"✓ {command.capitalize()} command sent to eddi device {serial}")
+            else:
+                click.echo(
+                    f"Warning: Unexpected response for {serial}: {result.get('statustext', 'unknown')}",
+                    err=True
+                )
+        for hint in COMMAND_HINTS[command]:
+            click.echo(f"  {hint}")
+
     except Exception as e:
-        click.echo(f"Error getting status: {e}", err=True)
+        click.echo(f"Error setting {action} mode: {e}", err=True)
         sys.exit(1)
 
 
+def _mode_options(function):
+    """Options shared by the stop and start commands."""
+    function = click.option(
+        "--max-retries",
+        default=MAX_RETRIES,
+        show_default=True,
+        type=click.IntRange(min=1),
+        help="Maximum command attempts per device (with --wait)"
+    )(function)
+    function = click.option(
+        "--wait", "-w",
+        is_flag=True,
+        help="Verify the devices reach the new state, retrying those that do not"
+    )(function)
+    function = click.option(
+        "--all", "all_devices",
+        is_flag=True,
+        help="Act on every eddi device on the hub"
+    )(function)
+    return click.argument("devices", nargs=-1)(function)
+
+
 @cli.command()
 @click.pass_context
-@click.argument("device", required=False)
-def stop(ctx, device: Optional[str]):
-    """Put eddi device into stop mode (pause diverting).
+@_mode_options
+def stop(ctx, devices, all_devices: bool, wait: bool, max_retries: int):
+    """Put eddi device(s) into stop mode (pause diverting).
 
     This will stop the eddi from diverting power to the heater.
     The device will transition from Diverting (sta=3) to Paused (sta=1).
     This typically takes 5-10 seconds to take effect.
 
-    If DEVICE serial number is not provided, will use the first eddi device found.
+    If no DEVICES serial numbers are provided, will use the first eddi device
+    found, or every eddi with --all. Several devices are commanded at once;
+    with --wait they are verified together from shared status polls.
+    """
+    _send_mode(ctx, "stop", devices, all_devices, wait, max_retries)
+
+
+@cli.command()
+@click.pass_context
+@_mode_options
+def start(ctx, devices, all_devices: bool, wait: bool, max_retries: int):
+    """Put eddi device(s) into normal mode (resume diverting).
+
+    This will allow the eddi to resume diverting excess power to the heater.
+    The device will transition through: Stopped (sta=6) → Paused (sta=1) → Diverting (sta=3)
+    This typically takes 40-50 seconds to fully resume diverting (if power is available).
+
+    If no DEVICES serial numbers are provided, will use the first eddi device
+    found, or every eddi with --all. Several devices are commanded at once;
+    with --wait they are verified together from shared status polls.
+    """
+    _send_mode(ctx, "start", devices, all_devices, wait, max_retries)
+
+
+@cli.command()
+@click.argument("command", type=click.Choice(FLEET_COMMANDS))
+@click.option(
+    "--inventory", "-i",
+    envvar="EDDI_FLEET_INVENTORY",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Inventory file (.toml/.yaml) listing hubs (or set EDDI_FLEET_INVENTORY)"
+)
+@click.option(
+    "--workers",
+    default=DEFAULT_MAX_WORKERS,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Maximum number of hubs handled in parallel"
+)
+@click.option(
+    "--max-retries",
+    default=3,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Maximum command attempts per hub"
+)
+@click.option(
+    "--verbose", "-v",
+    is_flag=True,
+    help="Show per-hub verification progress"
+)
+def fleet(command: str, inventory: str, workers: int, max_retries: int, verbose: bool):
+    """Run COMMAND (status, stop or start) on every hub in an inventory.
+
+    Hubs are handled in parallel. Stop and start are verified on each hub,
+    and one result table is printed at the end.
     """
+    from .fleet import format_results, load_inventory, run_fleet
+    from .latency import LatencyModel
+
+    try:
+        hubs = load_inventory(inventory)
+    except (OSError, ValueError) as e:
+        click.echo(f"Error loading inventory: {e}", err=True)
+        sys.exit(1)
+
+    if not hubs:
+        click.echo("No hubs found in inventory.")
+        sys.exit(1)
+
+    click.echo(f"Running {command} on {len(hubs)} hub(s) with up to {workers} worker(s)...")
+    log = (lambda line: click.echo(line, err=True)) if verbose else None
+    results = run_fleet(
+        command, hubs, max_workers=workers, max_retries=max_retries, log=log, latency=LatencyModel()
+    )
+
+    click.echo(format_results(results))
+    failed = sum(1 for r in results if not r.ok)
+    click.echo(f"\n{len(results) - failed}/{len(results)} succeeded")
+    if failed:
+        sys.exit(1)
+
+
+def _load_schedule(path: Optional[str], device: Optional[str] = None) -> "Schedule":
+    """Load a schedule file, or the bundled schedule if none is given."""
+    from .schedule import default_schedule, load_schedule
+
+    try:
+        return load_schedule(path, device) if path else default_schedule(device)
+    except (OSError, ValueError) as e:
+        click.echo(f"Error loading schedule: {e}", err=True)
+        sys.exit(1)
+
+
+def _resolve_device(client: EddiClient, device: Optional[str]) -> str:
+    """Return the given serial, or the first eddi device on the hub."""
+    if device:
+        return device
+    devices = client.get_eddi_devices()
+    if not devices:
+        click.echo("No eddi devices found.")
+        sys.exit(1)
+    device = str(devices[0].get("sno"))
+    click.echo(f"Using eddi device: {device}")
+    return device
+
+
+@cli.command()
+@click.pass_context
+@click.option(
+    "--device",
+    help="Specific eddi serial number (default: first eddi device found)"
+)
+@click.option(
+    "--catch-up",
+    default=int(DEFAULT_CATCH_UP.total_seconds() // 60),
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Minutes after a transition during which a missed one is still executed"
+)
+@click.option(
+    "--max-retries",
+    default=3,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Maximum command attempts per transition"
+)
+@click.option(
+    "--schedule-file",
+    envvar="EDDI_SCHEDULE_FILE",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Schedule file (.toml/.yaml) (default: built-in schedule, or set EDDI_SCHEDULE_FILE)"
+)
+@click.option(
+    "--lead",
+    multiple=True,
+    metavar="ACTION=SECONDS",
+    help="Issue ACTION (stop/start) this many seconds early (repeatable; default: learned latency)"
+)
+@click.option(
+    "--no-lead",
+    is_flag=True,
+    help="Issue commands at the scheduled instant instead of ahead of it"
+)
+def daemon(ctx, device: Optional[str], catch_up: int, max_retries: int, schedule_file: Optional[str],
+           lead, no_lead: bool):
+    """Run the schedule continuously, executing each transition on time.
+
+    Loads the schedule once, keeps one client warm and sleeps until the next
+    transition (DST-aware), then sends and verifies the command in-process.
+    Each command is sent early by its expected latency (learned per device,
+    see 'eddi latency') so the eddi reaches the new state on time; the
+    landing error is reported after every transition.
+    Stop with Ctrl+C or SIGTERM; progress is saved so a restart neither
+    repeats nor skips a recent transition.
+    """
+    from .daemon import SchedulerDaemon
+    from .latency import LatencyModel
+
     client: EddiClient = ctx.obj["client"]
-    
+
     try:
-        # Get device serial if not provided
-        if not device:
-            devices = client.get_eddi_devices()
-            if not devices:
-                click.echo("No eddi devices found.")
-                sys.exit(1)
-            device = str(devices[0].get("sno"))
-            click.echo(f"Using eddi device: {device}")
-        
-        # Set to stop mode
-        result = client.stop(device)
-        
-        if result.get("status") == 0:
-            click.echo(f"✓ Stop command sent to eddi device {device}")
-            click.echo("  Device will stop diverting within 5-10 seconds")
-            click.echo("  Use 'status' command to verify")
-        else:
-            click.echo(
-                f"Warning: Unexpected response: {result.get('statustext', 'unknown')}",
-                err=True
-            )
-            
+        device = _resolve_device(client, device)
     except Exception as e:
-        click.echo(f"Error setting stop mode: {e}", err=True)
+        click.echo(f"Error finding eddi device: {e}", err=True)
         sys.exit(1)
 
+    lead_times = {}
+    for item in lead:
+        action, _, seconds = item.partition("=")
+        try:
+            if action not in ("stop", "start"):
+                raise ValueError(action)
+            lead_times[action] = float(seconds)
+        except ValueError:
+            click.echo(f"Error: Invalid --lead {item!r}. Use stop=SECONDS or start=SECONDS", err=True)
+            sys.exit(1)
+    if no_lead:
+        lead_times = {"stop": 0.0, "start": 0.0}
+
+    plan = _load_schedule(schedule_file, device)
+    scheduler = SchedulerDaemon(
+        client,
+        device,
+        plan,
+        catch_up=timedelta(minutes=catch_up),
+        max_retries=max_retries,
+        latency=LatencyModel(),
+        log=click.echo,
+        lead_times=lead_times,
+    )
+    scheduler.install_signal_handlers()
+    click.echo(f"Scheduler running for eddi {device} ({plan.timezone})")
+    scheduler.run()
+
+
+# Date parts of history records, replaced by the ts column in output
+HISTORY_DATE_KEYS = {"yr", "mon", "dom", "dow", "hr", "min"}
+
 
 @cli.command()
 @click.pass_context
 @click.argument("device", required=False)
-def start(ctx, device: Optional[str]):
-    """Put eddi device into normal mode (resume diverting).
-
-    This will allow the eddi to resume diverting excess power to the heater.
-    The device will transition through: Stopped (sta=6) → Paused (sta=1) → Diverting (sta=3)
-    This typically takes 40-50 seconds to fully resume diverting (if power is available).
+@click.option(
+    "--from", "start",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="First UTC day (default: 7 days before --to)"
+)
+@click.option(
+    "--to", "end",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="Last UTC day, included (default: today)"
+)
+@click.option(
+    "--hourly",
+    is_flag=True,
+    help="Hourly totals instead of minute data"
+)
+@click.option(
+    "--format", "output_format",
+    type=click.Choice(["csv", "json"]),
+    default="csv",
+    show_default=True,
+    help="Output format"
+)
+@click.option(
+    "--workers",
+    default=DEFAULT_HISTORY_WORKERS,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Maximum days fetched in parallel"
+)
+def history(ctx, device: Optional[str], start: Optional[datetime], end: Optional[datetime],
+            hourly: bool, output_format: str, workers: int):
+    """Download minute (or hourly) history of an eddi device.
 
-    If DEVICE serial number is not provided, will use the first eddi device found.
+    Energy values are joules per minute (or per hour), as returned by the
+    API. Completed days are cached, so rerunning over the same range only
+    fetches today.
     """
     client: EddiClient = ctx.obj["client"]
-    
+    last = end.date() if end else datetime.now(timezone.utc).date()
+    first = start.date() if start else last - timedelta(days=7)
+
     try:
-        # Get device serial if not provided
         if not device:
             devices = client.get_eddi_devices()
             if not devices:
-                click.echo("No eddi devices found.")
+                click.echo("No eddi devices found.", err=True)
                 sys.exit(1)
             device = str(devices[0].get("sno"))
-            click.echo(f"Using eddi device: {device}")
-        
-        # Set to normal mode
-        result = client.start(device)
-        
-        if result.get("status") == 0:
-            click.echo(f"✓ Start command sent to eddi device {device}")
-            click.echo("  Device will resume normal operation within 40-50 seconds")
-            click.echo("  Use 'status' command to verify when it starts diverting")
-        else:
-            click.echo(
-                f"Warning: Unexpected response: {result.get('statustext', 'unknown')}",
-                err=True
-            )
-            
+        records = client.get_history(device, first, last, hourly=hourly, max_workers=workers)
     except Exception as e:
-        click.echo(f"Error setting normal mode: {e}", err=True)
+        click.echo(f"Error getting history: {e}", err=True)
+        sys.exit(1)
+
+    if output_format == "json":
+        click.echo(json.dumps(records))
+        return
+
+    columns = sorted({key for record in records for key in record} - HISTORY_DATE_KEYS - {"ts"})
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["time", *columns])
+    for record in records:
+        when = datetime.fromtimestamp(record["ts"], timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        writer.writerow([when, *(record.get(column, 0) for column in columns)])
+
+
+@cli.command()
+@click.pass_context
+@click.option(
+    "--interval",
+    default=DEFAULT_INTERVAL,
+    show_default=True,
+    type=click.FloatRange(min=1),
+    help="Seconds between samples"
+)
+@click.option(
+    "--store",
+    envvar="EDDI_TELEMETRY_DIR",
+    type=click.Path(file_okay=False),
+    help="Telemetry directory (default: telemetry/ in the data directory, or set EDDI_TELEMETRY_DIR)"
+)
+@click.option(
+    "--count",
+    type=click.IntRange(min=1),
+    help="Stop after this many samples (default: run until interrupted)"
+)
+@click.option(
+    "--inventory", "-i",
+    envvar="EDDI_FLEET_INVENTORY",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Inventory file (.toml/.yaml) of hubs to record (default: the hub of --serial/--api-key)"
+)
+@click.option(
+    "--workers",
+    default=DEFAULT_MAX_WORKERS,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Maximum number of hubs polled in parallel"
+)
+def record(ctx, interval: float, store: Optional[str], count: Optional[int], inventory: Optional[str],
+           workers: int):
+    """Record sta, diversion, grid and tank temperatures of every eddi.
+
+    Polls the hub (or every hub of an inventory, in parallel) every
+    INTERVAL seconds and appends one fixed-width binary record per device
+    to daily segment files, which can be memory-mapped for analysis. Stop
+    with Ctrl+C or SIGTERM.
+    """
+    from .fleet import Hub, load_inventory
+    from .recorder import Recorder, TelemetryStore
+
+    if inventory:
+        try:
+            hubs = load_inventory(inventory)
+        except (OSError, ValueError) as e:
+            click.echo(f"Error loading inventory: {e}", err=True)
+            sys.exit(1)
+    else:
+        serial, api_key, base_url = ctx.obj["credentials"]
+        if not serial or not api_key:
+            click.echo("Error: record needs --inventory, or --serial and --api-key (or EDDI_* variables)", err=True)
+            sys.exit(1)
+        hubs = [Hub(serial, serial, api_key, base_url)]
+    if not hubs:
+        click.echo("No hubs found in inventory.")
+        sys.exit(1)
+
+    def log(message: str) -> None:
+        click.echo(message, err=True)
+
+    telemetry = TelemetryStore(store, log=log)
+    clients = [EddiClient(hub.serial, hub.api_key, hub.base_url) for hub in hubs]
+    recorder = Recorder(clients, telemetry, interval, log=log, max_workers=workers)
+
+    def handle(signum, frame):
+        recorder.stop()
+
+    signal.signal(signal.SIGINT, handle)
+    signal.signal(signal.SIGTERM, handle)
+    click.echo(f"Recording {len(hubs)} hub(s) every {interval:g}s to {telemetry.root}")
+    recorder.run(count)
+    click.echo("Recorder stopped")
+
+
+@cli.command()
+@click.pass_context
+@click.option(
+    "--device",
+    help="Specific eddi serial number (default: first eddi device found)"
+)
+@click.option("--interval", default=AutopilotConfig.interval, show_default=True,
+              type=click.FloatRange(min=1), help="Seconds between status polls")
+@click.option("--window", default=AutopilotConfig.window, show_default=True,
+              type=click.IntRange(min=1), help="Polls averaged before deciding")
+@click.option("--start-above", default=AutopilotConfig.start_above, show_default=True,
+              type=float, help="Start when mean surplus (diversion + export) reaches this many watts")
+@click.option("--stop-below", default=AutopilotConfig.stop_below, show_default=True,
+              type=float, help="Stop when mean surplus falls to this many watts")
+@click.option("--min-on", default=int(AutopilotConfig.min_on // 60), show_default=True,
+              type=click.IntRange(min=0), help="Minutes to stay running before stopping again")
+@click.option("--min-off", default=int(AutopilotConfig.min_off // 60), show_default=True,
+              type=click.IntRange(min=0), help="Minutes to stay stopped before starting again")
+@click.option("--max-calls-per-hour", default=AutopilotConfig.max_calls_per_hour, show_default=True,
+              type=click.IntRange(min=2), help="API budget covering polls and commands")
+def autopilot(ctx, device: Optional[str], interval: float, window: int, start_above: float,
+              stop_below: float, min_on: int, min_off: int, max_calls_per_hour: int):
+    """Start and stop the eddi from live surplus instead of a schedule.
+
+    Polls every INTERVAL seconds and averages diversion plus export over
+    the last WINDOW polls. The eddi starts when that reaches --start-above
+    and stops when it falls to --stop-below, holding each mode for at least
+    --min-on/--min-off minutes. Stop with Ctrl+C or SIGTERM.
+    """
+    from .autopilot import Autopilot
+
+    client: EddiClient = ctx.obj["client"]
+    try:
+        config = AutopilotConfig(
+            interval, window, start_above, stop_below, min_on * 60, min_off * 60, max_calls_per_hour
+        )
+        device = _resolve_device(client, device)
+    except ValueError as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+    except Exception as e:
+        click.echo(f"Error finding eddi device: {e}", err=True)
+        sys.exit(1)
+
+    pilot = Autopilot(client, device, config, log=click.echo)
+
+    def handle(signum, frame):
+        pilot.stop()
+
+    signal.signal(signal.SIGINT, handle)
+    signal.signal(signal.SIGTERM, handle)
+    click.echo(
+        f"Autopilot running for eddi {device}: start at {start_above:g}W, stop at {stop_below:g}W surplus"
+    )
+    pilot.run()
+    click.echo(f"Autopilot stopped after {pilot.commands} command(s)")
+
+
+@cli.command()
+@click.pass_context
+@click.argument("command", type=click.Choice(["stop", "start"]), required=False)
+@click.option(
+    "--device", "devices",
+    multiple=True,
+    help="Eddi serial to reconcile (repeatable; default: every eddi on the hub)"
+)
+@click.option(
+    "--schedule-file",
+    envvar="EDDI_SCHEDULE_FILE",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Schedule giving the desired state when COMMAND is omitted (default: built-in schedule)"
+)
+@click.option(
+    "--max-retries",
+    default=MAX_RETRIES,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Maximum command attempts per device that needs changing"
+)
+def reconcile(ctx, command: Optional[str], devices, schedule_file: Optional[str], max_retries: int):
+    """Bring eddi devices into a state, sending commands only where needed.
+
+    Reads the current state once and compares it with COMMAND (stop or
+    start), or with the state the schedule wants right now if COMMAND is
+    omitted. Only devices that differ are sent the command and verified.
+    """
+    from .control import reconcile as reconcile_devices
+    from .daemon import utc_now
+    from .latency import LatencyModel
+
+    client: EddiClient = ctx.obj["client"]
+
+    if command is None:
+        plan = _load_schedule(schedule_file, devices[0] if len(devices) == 1 else None)
+        transition = plan.previous_transition(utc_now())
+        if transition is None:
+            click.echo("The schedule has no transition yet; nothing to reconcile.")
+            return
+        command = transition.action
+        click.echo(f"Schedule wants {command.upper()} (since {_format_transition(plan, transition)})")
+
+    try:
+        results = reconcile_devices(
+            command, client, devices or None, max_retries, log=click.echo, latency=LatencyModel()
+        )
+    except Exception as e:
+        click.echo(f"Error reading device state: {e}", err=True)
+        sys.exit(1)
+
+    if not results:
+        click.echo("No eddi devices found.")
+        sys.exit(1)
+
+    changed = sum(1 for r in results if r.changed)
+    failed = [r.serial for r in results if not r.ok]
+    click.echo(
+        f"\n{len(results) - changed} already in {COMMAND_MODES[command]} mode, "
+        f"{changed} changed, {len(failed)} failed"
+    )
+    if failed:
+        click.echo(f"Failed: {', '.join(failed)}", err=True)
+        sys.exit(1)
+
+
+def _format_transition(plan: "Schedule", transition) -> str:
+    local = transition.when.astimezone(plan.tz)
+    return f"{local:%a %Y-%m-%d %H:%M %Z}  {transition.action.upper()}"
+
+
+@cli.group()
+@click.pass_context
+@click.option(
+    "--file", "-f", "schedule_file",
+    envvar="EDDI_SCHEDULE_FILE",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Schedule file (.toml/.yaml) (default: built-in schedule, or set EDDI_SCHEDULE_FILE)"
+)
+@click.option(
+    "--device",
+    help="Eddi serial whose per-device overrides to apply"
+)
+def schedule(ctx, schedule_file: Optional[str], device: Optional[str]):
+    """Inspect the start/stop schedule."""
+    ctx.obj["schedule"] = _load_schedule(schedule_file, device)
+
+
+@schedule.command("next")
+@click.pass_context
+@click.option(
+    "--count", "-n",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of upcoming transitions to show"
+)
+def schedule_next(ctx, count: int):
+    """Show the next scheduled transition(s)."""
+    from .daemon import utc_now
+
+    plan: "Schedule" = ctx.obj["schedule"]
+    when = utc_now()
+    for shown in range(count):
+        transition = plan.next_transition(when)
+        if transition is None:
+            if not shown:
+                click.echo("No upcoming transitions.")
+            return
+        click.echo(_format_transition(plan, transition))
+        when = transition.when
+
+
+@schedule.command("list")
+@click.pass_context
+@click.option(
+    "--days",
+    default=7,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of days ahead to list"
+)
+def schedule_list(ctx, days: int):
+    """List the transitions of the coming days."""
+    from .daemon import utc_now
+
+    plan: "Schedule" = ctx.obj["schedule"]
+    now = utc_now()
+    transitions = plan.compile(now, weeks=days / 7).between(now, now + timedelta(days=days))
+    if not transitions:
+        click.echo("No transitions scheduled.")
+    for transition in transitions:
+        click.echo(_format_transition(plan, transition))
+
+
+@schedule.command("state")
+@click.pass_context
+@click.option(
+    "--at",
+    help="ISO 8601 instant to evaluate (default: now; naive times are in the schedule's time zone)"
+)
+def schedule_state(ctx, at: Optional[str]):
+    """Show the mode the schedule wants the eddi to be in."""
+    from .daemon import utc_now
+
+    plan: "Schedule" = ctx.obj["schedule"]
+    if at:
+        try:
+            when = datetime.fromisoformat(at)
+        except ValueError:
+            click.echo(f"Error: Invalid time: {at}", err=True)
+            sys.exit(1)
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=plan.tz)
+    else:
+        when = utc_now()
+    click.echo(plan.desired_mode_at(when) or "unknown")
+
+
+@schedule.command("due")
+@click.pass_context
+@click.option(
+    "--within",
+    default=60,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Minutes to look back for a transition"
+)
+def schedule_due(ctx, within: int):
+    """Print the action scheduled in the last WITHIN minutes, if any.
+
+    Meant for periodic runners such as the hourly GitHub Actions job: each
+    transition is reported by exactly one run when the period matches
+    WITHIN. Prints nothing if no action is due.
+    """
+    from .daemon import utc_now
+
+    plan: "Schedule" = ctx.obj["schedule"]
+    now = utc_now()
+    transition = plan.previous_transition(now)
+    if transition is not None and now - transition.when < timedelta(minutes=within):
+        click.echo(transition.action)
+
+
+def _format_table(rows) -> str:
+    """Render a list of dicts as a plain-text table."""
+    headers = list(dict.fromkeys(key for row in rows for key in row))
+    cells = [[("-" if row.get(h) is None else str(row[h])) for h in headers] for row in rows]
+    widths = [max(len(h), *(len(line[i]) for line in cells)) for i, h in enumerate(headers)]
+    lines = ["  ".join(h.upper().ljust(w) for h, w in zip(headers, widths))]
+    lines += ["  ".join(c.ljust(w) for c, w in zip(line, widths)) for line in cells]
+    return "\n".join(lines)
+
+
+@cli.command()
+@click.pass_context
+@click.argument("devices", nargs=-1)
+@click.option(
+    "--source",
+    type=click.Choice(["telemetry", "history"]),
+    default="telemetry",
+    show_default=True,
+    help="Samples recorded by 'eddi record', or minute history downloaded from the API"
+)
+@click.option(
+    "--period",
+    type=click.Choice(PERIODS),
+    default="day",
+    show_default=True,
+    help="Grouping of the report rows"
+)
+@click.option(
+    "--from", "start",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="First day (default: 7 days before --to)"
+)
+@click.option(
+    "--to", "end",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="Last day, included (default: today)"
+)
+@click.option(
+    "--schedule-file",
+    envvar="EDDI_SCHEDULE_FILE",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Schedule compared with actual surplus; its time zone sets day boundaries (default: built-in)"
+)
+@click.option(
+    "--store",
+    envvar="EDDI_TELEMETRY_DIR",
+    type=click.Path(file_okay=False),
+    help="Telemetry directory (default: telemetry/ in the data directory)"
+)
+@click.option(
+    "--format", "output_format",
+    type=click.Choice(["table", "csv", "json"]),
+    default="table",
+    show_default=True,
+    help="Output format"
+)
+def report(ctx, devices, source: str, period: str, start: Optional[datetime], end: Optional[datetime],
+           schedule_file: Optional[str], store: Optional[str], output_format: str):
+    """Summarize energy, time in each state and schedule fit per period.
+
+    Reports diverted, exported and imported kWh, hours in each status and
+    how much surplus fell while the schedule had the eddi running. With
+    --source telemetry (the default) every recorded device is included
+    unless DEVICES are given; --source history needs hub credentials.
+    """
+    from .analytics import summarize_history, summarize_telemetry
+    from .recorder import TelemetryStore
+
+    last = end.date() if end else datetime.now(timezone.utc).date()
+    first = start.date() if start else last - timedelta(days=7)
+
+    client = None
+    if source == "history":
+        serial, api_key, base_url = ctx.obj["credentials"]
+        if not serial or not api_key:
+            click.echo("Error: --source history needs --serial and --api-key (or EDDI_* variables)", err=True)
+            sys.exit(1)
+        client = EddiClient(serial, api_key, base_url)
+
+    telemetry = TelemetryStore(store)
+    try:
+        if not devices:
+            if client is not None:
+                devices = [str(eddi.get("sno")) for eddi in client.get_eddi_devices()]
+            else:
+                devices = telemetry.devices()
+        rows = []
+        for device in devices:
+            plan = _load_schedule(schedule_file, device)
+            if client is not None:
+                records = client.get_history(device, first, last)
+                summary = summarize_history(records, period, plan.timezone, plan)
+            else:
+                window_start = datetime.combine(first, datetime.min.time(), plan.tz)
+                window_end = datetime.combine(last + timedelta(days=1), datetime.min.time(), plan.tz)
+                samples = telemetry.load(device, window_start.timestamp(), window_end.timestamp())
+                summary = summarize_telemetry(samples, period, plan.timezone, plan)
+            rows += [{"device": device, **row} for row in summary]
+    except ImportError as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+    except Exception as e:
+        click.echo(f"Error building report: {e}", err=True)
+        sys.exit(1)
+
+    if not rows:
+        click.echo("No data for the selected devices and dates.")
+        return
+    if output_format == "json":
+        click.echo(json.dumps(rows, indent=2))
+    elif output_format == "csv":
+        writer = csv.DictWriter(sys.stdout, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        click.echo(_format_table(rows))
+
+
+@cli.command()
+def latency():
+    """Show learned command latencies per device.
+
+    Latencies are recorded each time a stop or start is verified, and are
+    used to size verification polling and scheduling lead times.
+    """
+    from .latency import LatencyModel, LatencyStore
+
+    model = LatencyModel(LatencyStore())
+    keys = model.store.keys()
+    if not keys:
+        click.echo("No latencies recorded yet.")
+        return
+
+    click.echo(f"{'DEVICE':<12}{'COMMAND':<9}{'N':>4}{'P10':>8}{'P50':>8}{'P90':>8}{'LEAD':>8}")
+    for serial, command in keys:
+        samples = model.store.samples(serial, command)
+        p10, p50, p90 = (model.percentile(serial, command, q) for q in (10, 50, 90))
+        cells = [f"{value:.0f}s" if value is not None else "-" for value in (p10, p50, p90)]
+        lead = model.lead_time(serial, command)
+        click.echo(
+            f"{serial:<12}{command:<9}{len(samples):>4}{cells[0]:>8}{cells[1]:>8}{cells[2]:>8}{lead:>7.0f}s"
+        )
+
+
+def _number_list(value: Optional[str], convert):
+    if value is None:
+        return None
+    try:
+        return tuple(convert(item) for item in value.split(",") if item.strip())
+    except ValueError:
+        raise click.BadParameter(f"Expected comma-separated numbers, got {value!r}")
+
+
+@cli.command()
+@click.argument("command", type=click.Choice(list(COMMAND_MODES)), default="stop")
+@click.option("--scenarios", "count", type=int, default=1000, show_default=True, help="Synthetic scenarios to generate")
+@click.option("--seed", type=int, default=0, show_default=True, help="Seed for synthetic scenarios")
+@click.option("--lost-rate", type=float, default=0.05, show_default=True, help="Chance a command has no effect")
+@click.option("--error-rate", type=float, default=0.02, show_default=True, help="Chance a status probe fails")
+@click.option(
+    "--traces",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Replay recorded scenarios from a JSON file instead of generating them"
+)
+@click.option("--from-latency", "latency_device", help="Replay verification times recorded for this device")
+@click.option(
+    "--polling",
+    type=click.Choice(["adaptive", "fixed"]),
+    default="adaptive",
+    show_default=True,
+    help="Polling strategy to sweep; the current adaptive policy is always included"
+)
+@click.option("--first-probe", help="Adaptive: first probe delays to try, comma-separated seconds")
+@click.option("--min-interval", help="Adaptive: shortest intervals to try, comma-separated seconds")
+@click.option("--max-interval", help="Adaptive: longest intervals to try, comma-separated seconds")
+@click.option("--timeout", help="Adaptive: verification timeouts to try, comma-separated seconds")
+@click.option("--initial-wait", help="Fixed: initial waits to try, comma-separated seconds")
+@click.option("--interval", help="Fixed: intervals between probes to try, comma-separated seconds")
+@click.option("--max-attempts", help="Fixed: probe counts to try, comma-separated")
+@click.option("--max-retries", help="Command attempts to try, comma-separated")
+@click.option("--retry-delay", help="Delays between command attempts to try, comma-separated seconds")
+@click.option("--processes", type=int, help="Worker processes (default: one per CPU)")
+@click.option("--top", type=int, default=10, show_default=True, help="Number of best policies shown")
+@click.option(
+    "--format", "output_format",
+    type=click.Choice(["table", "json"]),
+    default="table",
+    show_default=True,
+    help="Output format"
+)
+def simulate(command, count, seed, lost_rate, error_rate, traces, latency_device, polling, first_probe,
+             min_interval, max_interval, timeout, initial_wait, interval, max_attempts, max_retries, retry_delay,
+             processes, top, output_format):
+    """Tune verification polling and retries in simulated time.
+
+    Every combination of the given parameters is run against the same
+    scenarios: synthetic ones by default, or recorded ones with --traces
+    or --from-latency. Policies are ranked by success rate, then by time
+    to verify. The adaptive polling currently used (marked *) is always
+    included; --polling fixed sweeps the legacy fixed schedules instead.
+    """
+    from .latency import LatencyStore
+    from .simulation import (
+        DEFAULT_GRIDS,
+        FIXED_GRIDS,
+        Policy,
+        load_scenarios,
+        policy_grid,
+        rank,
+        scenarios_from_latencies,
+        sweep,
+        synthetic_scenarios,
+    )
+
+    if traces is not None:
+        scenarios = [s for s in load_scenarios(traces) if s.command == command]
+    elif latency_device:
+        samples = LatencyStore().samples(latency_device, command)
+        scenarios = scenarios_from_latencies(command, samples, error_rate)
+    else:
+        scenarios = synthetic_scenarios(command, count, seed, lost_rate, error_rate)
+    if not scenarios:
+        click.echo(f"No {command} scenarios to simulate.", err=True)
+        sys.exit(1)
+
+    strategy_options = {
+        "adaptive": (("first_probe", first_probe, float), ("min_interval", min_interval, float),
+                     ("max_interval", max_interval, float), ("timeout", timeout, float)),
+        "fixed": (("initial_wait", initial_wait, float), ("interval", interval, float),
+                  ("max_attempts", max_attempts, int)),
+    }
+    other = "fixed" if polling == "adaptive" else "adaptive"
+    misplaced = [name for name, value, _ in strategy_options[other] if value is not None]
+    if misplaced:
+        option = "--" + misplaced[0].replace("_", "-")
+        raise click.UsageError(f"{option} only applies with --polling {other}")
+
+    grid = dict((DEFAULT_GRIDS if polling == "adaptive" else FIXED_GRIDS)[command])
+    for name, value, convert in strategy_options[polling] + (
+        ("max_retries", max_retries, int),
+        ("retry_delay", retry_delay, float),
+    ):
+        values = _number_list(value, convert)
+        if values:
+            grid[name] = values
+    policies = policy_grid(**grid)
+    current = Policy.default(command)
+    if current not in policies:
+        policies.append(current)
+
+    results = sweep(scenarios, policies, processes)
+    ranked = rank(results)
+    rows = [dict(result.to_dict(), current=result.policy == current) for result in ranked[:top]]
+    if not any(row["current"] for row in rows):
+        rows += [dict(result.to_dict(), current=True) for result in ranked if result.policy == current]
+
+    if output_format == "json":
+        click.echo(json.dumps(rows, indent=2))
+        return
+    click.echo(f"{len(policies)} policies x {len(scenarios)} {command} scenarios\n")
+    for row in rows:
+        row["current"] = "*" if row.pop("current") else ""
+    click.echo(_format_table(rows))
+
+
+@cli.command()
+@click.pass_context
+@click.option(
+    "--inventory", "-i",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Inventory file (.toml/.yaml) of hubs to serve (default: the hub of --serial/--api-key)"
+)
+@click.option("--host", default=GATEWAY_HOST, show_default=True, help="Interface to listen on")
+@click.option("--port", default=GATEWAY_PORT, show_default=True, type=click.IntRange(min=0, max=65535),
+              help="Port to listen on")
+@click.option("--interval", default=DEFAULT_WATCH_INTERVAL, show_default=True, type=click.FloatRange(min=1),
+              help="Seconds between upstream status polls of each hub")
+@click.option("--token", envvar="EDDI_GATEWAY_TOKEN",
+              help="Bearer token required by stop/start requests (default: a random one, printed at start)")
+def serve(ctx, inventory: Optional[str], host: str, port: int, interval: float, token: Optional[str]):
+    """Serve cached status, stop/start and change events over local HTTP.
+
+    One poller per hub reads status from myenergi every INTERVAL seconds;
+    any number of local readers are answered from memory. Endpoints:
+    GET /status, GET /status/SERIAL, GET /events (server-sent events),
+    POST /devices/SERIAL/stop|start and GET /healthz. Commands need
+    "Authorization: Bearer TOKEN"; requests for another Host or from
+    another Origin are refused. Stop with Ctrl+C or SIGTERM.
+    """
+    # Imported here so that other commands do not load asyncio
+    import asyncio
+    import secrets
+    from .fleet import Hub, load_inventory
+    from .gateway import Gateway, HubPoller, serve as serve_gateway
+
+    if inventory:
+        try:
+            hubs = load_inventory(inventory)
+        except (OSError, ValueError) as e:
+            click.echo(f"Error loading inventory: {e}", err=True)
+            sys.exit(1)
+    else:
+        serial, api_key, base_url = ctx.obj["credentials"]
+        if not serial or not api_key:
+            click.echo("Error: serve needs --inventory, or --serial and --api-key (or EDDI_* variables)", err=True)
+            sys.exit(1)
+        hubs = [Hub(serial, serial, api_key, base_url)]
+    if not hubs:
+        click.echo("No hubs found in inventory.")
+        sys.exit(1)
+
+    if not token:
+        token = secrets.token_urlsafe(24)
+        click.echo(f"Command token: {token}", err=True)
+    gateway = Gateway([
+        HubPoller(hub.name, EddiClient(hub.serial, hub.api_key, hub.base_url), hub.device, interval)
+        for hub in hubs
+    ], token)
+
+    async def run():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+
+        def ready(address):
+            click.echo(f"Serving {len(hubs)} hub(s) on http://{address[0]}:{address[1]}")
+
+        await serve_gateway(gateway, host, port, stop, ready)
+
+    try:
+        asyncio.run(run())
+    except OSError as e:
+        click.echo(f"Error starting gateway: {e}", err=True)
         sys.exit(1)
+    click.echo("Gateway stopped")
 
 
 def main():
@@ -1,38 +1,223 @@
 """Client for interacting with myenergi eddi devices."""
 
-from typing import Optional, Dict, Any, List
+import threading
+import time
+from datetime import date
+from typing import Optional, Dict, Any, Callable, List, Sequence
 import requests
-from requests.auth import HTTPDigestAuth
 
+from .auth import DigestCache, PreemptiveDigestAuth
+from .core import SEND, ClientCore, Reply
+from .discovery import ServerCache
+from .history import DEFAULT_HISTORY_WORKERS, HistoryCache, fetch_history
+from .metrics import RequestEvent
+from .resilience import Resilience, is_server_failure
+from .models import EddiStatus, find_eddi_devices, json_loads, parse_eddi_statuses
 
-class EddiClient:
-    """Client to interact with myenergi eddi device API."""
+# Mode names accepted by set_mode and the value the API expects for each
+MODE_VALUES = {
+    "stop": "0",
+    "normal": "1",
+}
+
+
+def mode_path(eddi_serial: str, mode: str) -> str:
+    """Build the API path that sets the mode of an eddi device.
+
+    Args:
+        eddi_serial: Serial number of the eddi device
+        mode: Mode to set ('stop' or 'normal')
+
+    Returns:
+        Path relative to the server base URL
+
+    Raises:
+        ValueError: If mode is invalid
+    """
+    if mode not in MODE_VALUES:
+        raise ValueError(f"Invalid mode: {mode}. Must be 'stop' or 'normal'")
+    return f"cgi-eddi-mode-E{eddi_serial}-{MODE_VALUES[mode]}"
+
+
+def eddi_status_path(eddi_serial: Optional[str] = None) -> str:
+    """Build the API path of a status query scoped to eddi devices.
+
+    Args:
+        eddi_serial: Optional serial number to query a single eddi
+
+    Returns:
+        Path relative to the server base URL
+    """
+    return f"cgi-jstatus-E{eddi_serial or ''}"
+
+
+def select_device(devices: List[Dict[str, Any]], eddi_serial: Optional[str]) -> List[Dict[str, Any]]:
+    """Keep only the device with the given serial, if one is given."""
+    if eddi_serial is None:
+        return devices
+    return [d for d in devices if str(d.get("sno")) == str(eddi_serial)]
+
+
+class _Flight:
+    """A request in progress whose result is shared by concurrent callers."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+    def wait(self) -> Any:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class EddiClient(ClientCore):
+    """Client to interact with myenergi eddi device API.
+
+    Discovery, resilience, hooks and status caching come from
+    :class:`~eddi_scheduler.core.ClientCore`; this class sends requests
+    with ``requests`` and waits on the resilience clock.
+    """
 
     def __init__(
         self,
         serial_number: str,
         api_key: str,
-        base_url: Optional[str] = None
+        base_url: Optional[str] = None,
+        server_cache: Optional[ServerCache] = None,
+        digest_cache: Optional[DigestCache] = None,
+        persist_digest: bool = True,
+        status_ttl: float = 0.0,
+        history_cache: Optional[HistoryCache] = None,
+        hooks: Optional[Sequence[Callable[[RequestEvent], None]]] = None,
+        resilience: Optional[Resilience] = None
     ):
         """Initialize the eddi client.
 
         Args:
             serial_number: The hub serial number (used as username)
             api_key: The API key/password from myenergi app
-            base_url: Optional base URL. If not provided, will use s18.myenergi.net
+            base_url: Optional base URL. If not provided, the server is
+                discovered through the myenergi director and cached on disk
+            server_cache: Cache of discovered servers (default: on-disk cache)
+            digest_cache: Cache of digest challenges (default: on-disk cache)
+            persist_digest: Reuse digest challenges across client instances and
+                runs, so a new session skips the initial 401 round-trip
+            status_ttl: Seconds a status response is reused by later calls
+                (0 disables caching; concurrent calls are always coalesced)
+            history_cache: Cache of completed history days (default: on-disk cache)
+            hooks: Callables receiving a RequestEvent after every HTTP
+                exchange (default: record to the metrics REGISTRY)
+            resilience: Circuit breakers, retry budget and request retry
+                policy (default: DEFAULT_RESILIENCE, shared by all clients)
         """
-        self.serial_number = serial_number
+        super().__init__(serial_number, base_url, server_cache, status_ttl, hooks, resilience)
         self.api_key = api_key
-        self.base_url = base_url or "https://s18.myenergi.net"
-        
-        # Set up session with digest auth
+        self.history_cache = history_cache or HistoryCache()
+
+        # Set up session with digest auth, answering challenges preemptively
+        if persist_digest and digest_cache is None:
+            digest_cache = DigestCache()
+        self.auth = PreemptiveDigestAuth(serial_number, api_key, digest_cache if persist_digest else None)
         self.session = requests.Session()
-        self.session.auth = HTTPDigestAuth(serial_number, api_key)
+        self.session.auth = self.auth
         self.session.headers.update({
             "accept": "application/json",
             "content-type": "application/json"
         })
 
+        # In-flight status requests keyed by API path; the lock also guards
+        # the status cache
+        self._inflight: Dict[str, _Flight] = {}
+        self._status_lock = threading.Lock()
+
+    def _get(self, path: str) -> Any:
+        """Send a GET request for an API path and decode the JSON response.
+
+        When discovering, a server that rejects the hub is dropped from the
+        cache and the request is retried once through the director.
+        """
+        try:
+            response = self._request(path)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            if not self._forget_server(isinstance(e, requests.ConnectionError), getattr(e.response, "status_code", None)):
+                raise
+            response = self._request(path)
+            response.raise_for_status()
+
+        self._follow_asn(response.headers)
+        self.auth.persist()
+        return json_loads(response.content)
+
+    def _request(self, path: str) -> requests.Response:
+        """GET an API path, following the steps of ClientCore.exchange."""
+        steps = self.exchange(path)
+        try:
+            step = next(steps)
+            while True:
+                if step is SEND:
+                    reply = self._send(path)
+                else:
+                    self.resilience.clock.sleep(step)
+                    reply = None
+                try:
+                    step = steps.send(reply)
+                except StopIteration as done:
+                    return done.value
+        finally:
+            steps.close()
+
+    def _send(self, path: str) -> Reply:
+        started = time.perf_counter()
+        try:
+            response = self.session.get(f"{self.base_url}/{path}")
+        except requests.RequestException as e:
+            return Reply(time.perf_counter() - started, error=e, server_failure=is_server_failure(error=e))
+        return Reply(time.perf_counter() - started, response)
+
+    def _get_status_path(self, path: str) -> Any:
+        """Fetch a status path through the TTL cache and single-flight gate.
+
+        Callers asking for the same path while a request is in flight wait
+        for that request instead of issuing their own. Results are shared,
+        so callers must not modify them.
+        """
+        with self._status_lock:
+            cached = self._cached_status(path)
+            if cached is not None:
+                return cached
+            flight = self._inflight.get(path)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[path] = flight
+            generation = self._status_generation
+
+        if not leader:
+            return flight.wait()
+
+        started = time.monotonic()
+        try:
+            flight.result = self._get(path)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._status_lock:
+                del self._inflight[path]
+                if flight.error is None:
+                    self._store_status(path, started, flight.result, generation)
+            flight.done.set()
+        return flight.result
+
+    def invalidate_status(self) -> None:
+        """Drop cached status so the next call fetches fresh data."""
+        with self._status_lock:
+            super().invalidate_status()
+
     def get_status(self) -> List[Dict[str, Any]]:
         """Get the status of all devices.
 
@@ -42,25 +227,77 @@ class EddiClient:
         Raises:
             requests.RequestException: If the API request fails
         """
-        url = f"{self.base_url}/cgi-jstatus-*"
-        response = self.session.get(url)
-        response.raise_for_status()
-        return response.json()
+        return self._get_status_path("cgi-jstatus-*")
 
-    def get_eddi_devices(self) -> List[Dict[str, Any]]:
+    def get_eddi_devices(self, eddi_serial: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get list of eddi devices.
 
+        Queries only the eddi block of the hub (or a single eddi when a
+        serial is given) instead of the full status of every device.
+
+        Args:
+            eddi_serial: Optional serial number to fetch a single eddi
+
         Returns:
             List of eddi device information
 
         Raises:
             requests.RequestException: If the API request fails
         """
-        status = self.get_status()
-        for item in status:
-            if "eddi" in item:
-                return item["eddi"]
-        return []
+        status = self._get_status_path(eddi_status_path(eddi_serial))
+        return select_device(find_eddi_devices(status), eddi_serial)
+
+    def get_eddi_statuses(
+        self,
+        eddi_serial: Optional[str] = None
+    ) -> List[EddiStatus]:
+        """Get typed status snapshots of eddi devices.
+
+        Args:
+            eddi_serial: Optional serial number to fetch a single eddi
+
+        Returns:
+            List of eddi statuses
+
+        Raises:
+            requests.RequestException: If the API request fails
+        """
+        status = self._get_status_path(eddi_status_path(eddi_serial))
+        statuses = parse_eddi_statuses(status)
+        if eddi_serial is not None:
+            statuses = [s for s in statuses if str(s.serial) == str(eddi_serial)]
+        return statuses
+
+    def get_history(
+        self,
+        eddi_serial: str,
+        start: date,
+        end: date,
+        hourly: bool = False,
+        max_workers: int = DEFAULT_HISTORY_WORKERS
+    ) -> List[Dict[str, Any]]:
+        """Get minute (or hourly) history of an eddi device over a range of days.
+
+        Days are fetched in parallel. Completed past days are cached on
+        disk and never fetched again; today is always refetched.
+
+        Args:
+            eddi_serial: Serial number of the eddi device
+            start: First UTC day
+            end: Last UTC day (included)
+            hourly: Fetch hourly totals instead of minute data
+            max_workers: Maximum days fetched at the same time
+
+        Returns:
+            Records in time order, each with a ``ts`` epoch timestamp added
+
+        Raises:
+            ValueError: If end is before start
+            requests.RequestException: If an API request fails
+        """
+        return fetch_history(
+            self._get, eddi_serial, start, end, hourly, max_workers, self.history_cache
+        )
 
     def set_mode(self, eddi_serial: str, mode: str) -> Dict[str, Any]:
         """Set the mode for an eddi device.
@@ -75,16 +312,37 @@ class EddiClient:
         Raises:
             ValueError: If mode is invalid
             requests.RequestException: If the API request fails
+
+        Cached status is invalidated, as the device state is about to change.
+        """
+        path = mode_path(eddi_serial, mode)
+        try:
+            return self._get(path)
+        finally:
+            self.invalidate_status()
+
+    def ensure_mode(self, eddi_serial: str, mode: str) -> Optional[Dict[str, Any]]:
+        """Set the mode of an eddi device only if it is not already in it.
+
+        The current state is read once; no command is sent when it already
+        matches. The change is not verified (see control.reconcile).
+
+        Args:
+            eddi_serial: Serial number of the eddi device
+            mode: Mode wanted ('stop' or 'normal')
+
+        Returns:
+            API response of the mode change, or None if nothing was sent
+
+        Raises:
+            ValueError: If mode is invalid
+            requests.RequestException: If an API request fails
         """
-        if mode not in ["stop", "normal"]:
-            raise ValueError(f"Invalid mode: {mode}. Must be 'stop' or 'normal'")
-        
-        mode_value = "0" if mode == "stop" else "1"
-        url = f"{self.base_url}/cgi-eddi-mode-E{eddi_serial}-{mode_value}"
-        
-        response = self.session.get(url)
-        response.raise_for_status()
-        return response.json()
+        mode_path(eddi_serial, mode)
+        statuses = self.get_eddi_statuses(eddi_serial)
+        if statuses and statuses[0].in_mode(mode):
+            return None
+        return self.set_mode(eddi_serial, mode)
 
     def stop(self, eddi_serial: str) -> Dict[str, Any]:
         """Put eddi device into stop mode.
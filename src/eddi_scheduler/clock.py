@@ -0,0 +1,68 @@
+"""Clocks that control code reads time from and sleeps on.
+
+Verification and retry wait for minutes in real time. Passing a
+:class:`VirtualClock` instead of the default :data:`SYSTEM_CLOCK` makes
+the same code run instantly, with time advancing only when it sleeps.
+Both are also plain ``Callable[[], float]`` clocks, so they can be
+passed wherever a monotonic clock function is expected.
+"""
+
+import time
+from abc import ABC, abstractmethod
+
+
+class Clock(ABC):
+    """Source of monotonic time and a way to wait."""
+
+    @abstractmethod
+    def monotonic(self) -> float:
+        """Current time in seconds, from an arbitrary origin."""
+
+    @abstractmethod
+    def sleep(self, seconds: float) -> None:
+        """Wait for ``seconds``."""
+
+    async def sleep_async(self, seconds: float) -> None:
+        """Wait without blocking the event loop."""
+        # Imported here so that sync callers do not load asyncio
+        import asyncio
+        await asyncio.sleep(seconds)
+
+    def __call__(self) -> float:
+        return self.monotonic()
+
+
+class SystemClock(Clock):
+    """Real time: time.monotonic and time.sleep."""
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+
+class VirtualClock(Clock):
+    """Simulated time that only moves when something sleeps or advances it."""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += max(0.0, seconds)
+
+    async def sleep_async(self, seconds: float) -> None:
+        self.sleep(seconds)
+
+    def advance(self, seconds: float) -> None:
+        """Move time forward without a caller sleeping."""
+        self.sleep(seconds)
+
+    def __repr__(self) -> str:
+        return f"VirtualClock(now={self.now})"
+
+
+SYSTEM_CLOCK = SystemClock()
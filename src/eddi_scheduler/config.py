@@ -0,0 +1,50 @@
+"""Loading of TOML/YAML configuration files."""
+
+import sys
+from pathlib import Path
+from typing import Any, Dict, Union
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+
+def load_document(path: Union[str, Path]) -> Dict[str, Any]:
+    """Load a TOML or YAML document, chosen by file extension.
+
+    Args:
+        path: Path to a .toml, .yaml or .yml file
+
+    Returns:
+        Parsed document as a dictionary
+
+    Raises:
+        ValueError: If the file type is unsupported or its parser is missing
+        OSError: If the file cannot be read
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+
+    if suffix == ".toml":
+        if tomllib is None:
+            raise ValueError("Reading TOML files requires Python 3.11+ or the 'tomli' package")
+        with path.open("rb") as f:
+            document = tomllib.load(f)
+    elif suffix in (".yaml", ".yml"):
+        # Imported here as PyYAML is slow to load and most files are TOML
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("Reading YAML files requires the 'PyYAML' package")
+        with path.open("r", encoding="utf-8") as f:
+            document = yaml.safe_load(f) or {}
+    else:
+        raise ValueError(f"Unsupported file type: {path.name}. Use .toml, .yaml or .yml")
+
+    if not isinstance(document, dict):
+        raise ValueError(f"Expected a mapping at the top level of {path.name}")
+    return document
@@ -0,0 +1,694 @@
+"""Command execution with verification and retry for eddi devices."""
+
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Generator, Iterable, List, Optional
+
+from .clock import SYSTEM_CLOCK
+from .metrics import REGISTRY
+from .resilience import RUN_BUDGET, Backoff, CircuitOpenError
+from .models import COMMAND_MODES
+
+# Constants for timing and verification (fixed polling)
+STOP_MAX_ATTEMPTS = 10
+STOP_WAIT_BETWEEN = 15  # seconds
+STOP_INITIAL_WAIT = 30  # seconds
+
+START_MAX_ATTEMPTS = 5
+START_WAIT_BETWEEN = 10  # seconds
+START_INITIAL_WAIT = 50  # seconds
+
+MAX_RETRIES = 3
+RETRY_DELAY = 30  # seconds
+
+# Polls without seeing the device before giving up
+MAX_DEVICE_NOT_FOUND = 3
+
+# Most mode changes sent at the same time by a batch command
+BATCH_MAX_WORKERS = 8
+
+
+class PollStrategy(ABC):
+    """Decides how long to wait before each verification probe.
+
+    :meth:`delays` returns a generator. The first ``next()`` gives the wait
+    before the first probe; after each probe the caller sends whether the
+    device state changed since the previous probe, and receives the next
+    wait. The generator finishing means verification has run out of time.
+    """
+
+    @abstractmethod
+    def delays(self) -> Generator[float, bool, None]:
+        """Waits before each probe, as described above."""
+
+
+class FixedPoll(PollStrategy):
+    """An initial wait, then a fixed interval for a fixed number of probes."""
+
+    def __init__(self, initial_wait: float, interval: float, max_attempts: int):
+        self.initial_wait = initial_wait
+        self.interval = interval
+        self.max_attempts = max_attempts
+
+    def delays(self) -> Generator[float, bool, None]:
+        if self.max_attempts < 1:
+            return
+        yield self.initial_wait
+        for _ in range(self.max_attempts - 1):
+            yield self.interval
+
+    def __repr__(self) -> str:
+        return f"FixedPoll(initial_wait={self.initial_wait}, interval={self.interval}, max_attempts={self.max_attempts})"
+
+
+class AdaptivePoll(PollStrategy):
+    """An early first probe, then backoff that resets when the state moves.
+
+    Devices move through intermediate states (3 -> 1 -> 6 on stop, 6 -> 1 on
+    start). While nothing changes the interval grows by ``backoff`` up to
+    ``max_interval``; as soon as a probe sees a new state the interval drops
+    back to ``min_interval``, since the next transition usually follows
+    shortly. Waiting stops once ``timeout`` seconds of waits have been spent.
+    """
+
+    def __init__(
+        self,
+        first_probe: float,
+        min_interval: float,
+        max_interval: float,
+        timeout: float,
+        backoff: float = 1.5
+    ):
+        self.first_probe = first_probe
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.timeout = timeout
+        self.backoff = backoff
+
+    def delays(self) -> Generator[float, bool, None]:
+        waited = 0.0
+        delay = self.first_probe
+        while waited < self.timeout:
+            delay = min(delay, self.timeout - waited)
+            changed = yield delay
+            waited += delay
+            if changed:
+                delay = self.min_interval
+            else:
+                delay = min(max(delay, self.min_interval) * self.backoff, self.max_interval)
+
+    def __repr__(self) -> str:
+        return (
+            f"AdaptivePoll(first_probe={self.first_probe}, min_interval={self.min_interval}, "
+            f"max_interval={self.max_interval}, timeout={self.timeout}, backoff={self.backoff})"
+        )
+
+
+# Polling used by execute_command_with_retry unless told otherwise. The
+# timeouts match the worst case of the fixed schedules above.
+STOP_POLL = AdaptivePoll(first_probe=5, min_interval=5, max_interval=30, timeout=180)
+START_POLL = AdaptivePoll(first_probe=5, min_interval=3, max_interval=15, timeout=100)
+
+
+def fixed_poll(command):
+    """Return the legacy fixed polling schedule for a command."""
+    if command == "stop":
+        return FixedPoll(STOP_INITIAL_WAIT, STOP_WAIT_BETWEEN, STOP_MAX_ATTEMPTS)
+    return FixedPoll(START_INITIAL_WAIT, START_WAIT_BETWEEN, START_MAX_ATTEMPTS)
+
+
+def adaptive_poll(command):
+    """Return the default adaptive polling schedule for a command."""
+    return STOP_POLL if command == "stop" else START_POLL
+
+
+def widest_poll(strategies):
+    """
+    Combine per-device polling schedules for a shared verification loop.
+    
+    The result probes as early and as often as the fastest device and
+    keeps waiting as long as the slowest one. Schedules other than
+    AdaptivePoll cannot be merged; the first one is used.
+    """
+    strategies = list(strategies)
+    if not all(isinstance(s, AdaptivePoll) for s in strategies):
+        return strategies[0]
+    return AdaptivePoll(
+        first_probe=min(s.first_probe for s in strategies),
+        min_interval=min(s.min_interval for s in strategies),
+        max_interval=max(s.max_interval for s in strategies),
+        timeout=max(s.timeout for s in strategies),
+        backoff=min(s.backoff for s in strategies),
+    )
+
+
+def _sanitize_api_response(response):
+    """
+    Sanitize API response for logging by redacting sensitive fields.
+    
+    Args:
+        response: API response (dict, str, or other type)
+    
+    Returns:
+        Sanitized response safe for logging
+    """
+    if isinstance(response, dict):
+        sanitized = response.copy()
+        # Redact common sensitive fields
+        sensitive_fields = ['api_key', 'apiKey', 'password', 'token', 'secret', 'auth']
+        for field in sensitive_fields:
+            if field in sanitized:
+                sanitized[field] = '***REDACTED***'
+        return sanitized
+    return response
+
+
+def _verify(client, device_serial, command, strategy, log, clock=SYSTEM_CLOCK):
+    """
+    Poll a device until it reaches the target state of a command.
+    
+    Args:
+        client: EddiClient instance
+        device_serial: Device serial number
+        command: "stop" (target sta=6) or "start" (target any sta except 6)
+        strategy: PollStrategy deciding the wait before each probe
+        log: Callable used to report progress
+        clock: Clock to sleep on
+    
+    Returns:
+        bool: True once the target state is seen, False if the strategy gives up
+    
+    Raises:
+        CircuitOpenError: If the server's circuit breaker opens while polling
+    """
+    delays = strategy.delays()
+    device_not_found_count = 0
+    last_sta = None
+    elapsed = 0.0
+    attempt = 0
+    changed = False
+    
+    while True:
+        try:
+            delay = next(delays) if attempt == 0 else delays.send(changed)
+        except StopIteration:
+            break
+        attempt += 1
+        changed = False
+        if delay > 0:
+            clock.sleep(delay)
+        elapsed += delay
+        
+        try:
+            statuses = client.get_eddi_statuses(device_serial)
+            device = next((d for d in statuses if str(d.serial) == device_serial), None)
+            
+            if not device:
+                device_not_found_count += 1
+                log(f"  Attempt {attempt} (+{elapsed:.0f}s): Device not found")
+                if device_not_found_count >= MAX_DEVICE_NOT_FOUND:
+                    log(f"✗ Device not found in {MAX_DEVICE_NOT_FOUND}+ consecutive attempts - check network/credentials")
+                    return False
+                continue
+            
+            # Reset counter if device is found
+            device_not_found_count = 0
+            
+            sta = device.sta
+            div = device.diversion or 0
+            changed = last_sta is not None and sta != last_sta
+            last_sta = sta
+            
+            log(f"  Attempt {attempt} (+{elapsed:.0f}s): sta={sta}, div={div}W")
+            
+            if command == "stop":
+                if sta == 6:
+                    log(f"✓ Device stopped successfully (sta=6)")
+                    return True
+                elif sta == 1:
+                    log(f"  → Device in paused state (sta=1), continuing to wait for sta=6...")
+            else:
+                if sta is None:
+                    log(f"  → Device status unavailable, retrying...")
+                elif sta == 6:
+                    log(f"  → Device still stopped (sta=6), waiting for start...")
+                else:
+                    # Any status except 6 (and not None) means the device has started successfully
+                    log(f"✓ Device started successfully (sta={sta}, {device.status_text}, {div}W)")
+                    return True
+            
+        except CircuitOpenError:
+            # The server is down; polling on would only wait out the timeout
+            raise
+        except Exception as e:
+            log(f"  Attempt {attempt} (+{elapsed:.0f}s): Error checking status: {e}")
+    
+    if command == "stop":
+        log(f"✗ Device did not reach stopped state (sta=6) after {attempt} attempts")
+    else:
+        log(f"✗ Device did not reach started state after {attempt} attempts")
+    return False
+
+
+def wait_and_verify_stop(client, device_serial, max_attempts=STOP_MAX_ATTEMPTS, wait_between=STOP_WAIT_BETWEEN, log=print, strategy=None,
+                         clock=SYSTEM_CLOCK):
+    """
+    Verify that device has stopped (sta=6) - ONLY sta=6 is acceptable.
+    Device transitions: sta=3 (diverting) -> sta=1 (paused) -> sta=6 (stopped)
+    This can take up to 2-3 minutes.
+    
+    Args:
+        client: EddiClient instance
+        device_serial: Device serial number
+        max_attempts: Maximum number of verification attempts
+        wait_between: Seconds to wait between attempts
+        log: Callable used to report progress (defaults to print)
+        strategy: Optional PollStrategy; overrides max_attempts and wait_between
+        clock: Clock to sleep on (a VirtualClock simulates the wait)
+    
+    Returns:
+        bool: True if stopped (sta=6), False otherwise
+    """
+    log(f"Verifying device stopped (expecting sta=6 ONLY)...")
+    log(f"Note: Device may go through sta=1 (paused) before reaching sta=6 (stopped)")
+    strategy = strategy or FixedPoll(0, wait_between, max_attempts)
+    return _verify(client, device_serial, "stop", strategy, log, clock)
+
+
+def wait_and_verify_start(client, device_serial, max_attempts=START_MAX_ATTEMPTS, wait_between=START_WAIT_BETWEEN, log=print, strategy=None,
+                          clock=SYSTEM_CLOCK):
+    """
+    Verify that device has started (any status except sta=6 stopped).
+    Success means sta != 6 (can be 1, 3, or other codes, but NOT 6).
+    
+    Args:
+        client: EddiClient instance
+        device_serial: Device serial number
+        max_attempts: Maximum number of verification attempts
+        wait_between: Seconds to wait between attempts
+        log: Callable used to report progress (defaults to print)
+        strategy: Optional PollStrategy; overrides max_attempts and wait_between
+        clock: Clock to sleep on (a VirtualClock simulates the wait)
+    
+    Returns:
+        bool: True if started (sta != 6), False otherwise
+    """
+    log(f"Verifying device started (expecting any status EXCEPT sta=6 stopped)...")
+    strategy = strategy or FixedPoll(0, wait_between, max_attempts)
+    return _verify(client, device_serial, "start", strategy, log, clock)
+
+
+def execute_command_with_retry(command, client, device_serial, max_retries=MAX_RETRIES, log=print, poll=None, latency=None,
+                               retry_delay=None, clock=SYSTEM_CLOCK, metrics=REGISTRY, backoff=None,
+                               budget=RUN_BUDGET):
+    """
+    Execute stop/start command with retry logic.
+    
+    Verification starts with an early probe and returns as soon as the
+    target state is seen (see AdaptivePoll). Pass poll=fixed_poll for the
+    previous fixed initial wait and interval.
+    
+    Retries wait with exponential backoff and jitter, and draw from the
+    run's retry budget; once it is spent the command fails without further
+    attempts. If the server's circuit breaker is open, verification stops
+    at once and the next attempt is made when the breaker allows a probe.
+    
+    Args:
+        command: "stop" or "start"
+        client: EddiClient instance
+        device_serial: Device serial number
+        max_retries: Maximum number of retry attempts
+        log: Callable used to report progress (defaults to print)
+        poll: Callable returning the PollStrategy for a command (default:
+            sized from latency if given, otherwise adaptive_poll)
+        latency: Optional LatencyModel; verified transition times are
+            recorded to it
+        retry_delay: Base delay before the first retry (default: RETRY_DELAY)
+        clock: Clock to read time from and sleep on
+        metrics: MetricsRegistry receiving attempt, retry and verify
+            duration metrics (None disables them)
+        backoff: Backoff between attempts (default: Backoff(retry_delay))
+        budget: RetryBudget retries draw from (default: RUN_BUDGET; None
+            allows every retry)
+    
+    Returns:
+        bool: True if command succeeded and verified, False otherwise
+    """
+    if poll is None:
+        if latency is not None:
+            poll = lambda cmd: latency.poll_strategy(device_serial, cmd)
+        else:
+            poll = adaptive_poll
+    if backoff is None:
+        backoff = Backoff(RETRY_DELAY if retry_delay is None else retry_delay)
+    if budget is not None:
+        budget.record_attempt()
+    
+    for retry in range(1, max_retries + 1):
+        log(f"\n{'='*60}")
+        log(f"Attempt {retry}/{max_retries}: Executing {command.upper()} command")
+        log(f"{'='*60}")
+        if metrics is not None and retry > 1:
+            metrics.inc("eddi_command_retries", command=command)
+        
+        try:
+            # Execute command
+            sent_at = clock.monotonic()
+            if command == "stop":
+                result = client.stop(device_serial)
+            elif command == "start":
+                result = client.start(device_serial)
+            else:
+                log(f"✗ Unknown command: {command}")
+                return False
+            
+            # Sanitize response for logging (redact sensitive fields)
+            sanitized_result = _sanitize_api_response(result)
+            log(f"Command sent: {sanitized_result}")
+            
+            # Poll until the command takes effect
+            strategy = poll(command)
+            if command == "stop":
+                # Stop can take 2-3 minutes: sta=3 -> sta=1 -> sta=6
+                verified = wait_and_verify_stop(client, device_serial, log=log, strategy=strategy, clock=clock)
+            else:  # start
+                verified = wait_and_verify_start(client, device_serial, log=log, strategy=strategy, clock=clock)
+            _record_attempt(metrics, command, "verified" if verified else "unverified", clock.monotonic() - sent_at)
+            
+            if verified:
+                if latency is not None:
+                    latency.record(device_serial, command, clock.monotonic() - sent_at)
+                return True
+            
+            error = None
+                
+        except Exception as e:
+            log(f"✗ Error executing command: {e}")
+            if metrics is not None:
+                metrics.inc("eddi_commands", command=command, result="error")
+            error = e
+        
+        if retry < max_retries and not _pause_before_retry(retry, backoff, budget, clock, log, error):
+            break
+    
+    log(f"\n✗ Command failed after {retry} attempts")
+    return False
+
+
+def _pause_before_retry(retry, backoff, budget, clock, log, error=None, serials=None):
+    """
+    Wait before the next attempt, if the retry budget allows one.
+    
+    After a CircuitOpenError the wait ends as soon as the breaker lets a
+    probe through, instead of running the full backoff.
+    
+    Returns:
+        bool: False if the budget is spent and no retry should be made
+    """
+    if budget is not None and not budget.try_spend(len(serials) if serials else 1):
+        log("\n✗ Retry budget of this run is spent, not retrying")
+        return False
+    delay = backoff.delay(retry)
+    if isinstance(error, CircuitOpenError):
+        delay = min(delay, error.retry_after)
+    target = f" {', '.join(serials)}" if serials else ""
+    log(f"\nRetrying{target} in {delay:.0f} seconds...")
+    clock.sleep(delay)
+    return True
+
+
+def _record_attempt(metrics, command, result, seconds):
+    if metrics is None:
+        return
+    metrics.inc("eddi_commands", command=command, result=result)
+    metrics.observe("eddi_verify_duration_seconds", seconds, command=command, result=result)
+
+
+def _verify_many(client, device_serials, command, strategy, log, clock=SYSTEM_CLOCK):
+    """
+    Poll several devices of one hub until each reaches the target state.
+    
+    Every probe is a single hub-wide status request that is checked
+    against all devices still pending; each device finishes as soon as it
+    converges, and the loop ends when none are left.
+    
+    Args:
+        client: EddiClient instance
+        device_serials: Serial numbers of the devices to verify
+        command: "stop" (target sta=6) or "start" (target any sta except 6)
+        strategy: PollStrategy deciding the wait before each probe
+        log: Callable used to report progress
+        clock: Clock to read time from and sleep on
+    
+    Returns:
+        dict: clock.monotonic() at which each device was seen in the target
+            state, or None for devices that never were
+    
+    Raises:
+        CircuitOpenError: If the server's circuit breaker opens while polling
+    """
+    mode = COMMAND_MODES[command]
+    pending = list(device_serials)
+    converged = dict.fromkeys(pending)
+    not_found = dict.fromkeys(pending, 0)
+    last_sta = {}
+    delays = strategy.delays()
+    elapsed = 0.0
+    attempt = 0
+    changed = False
+    
+    while pending:
+        try:
+            delay = next(delays) if attempt == 0 else delays.send(changed)
+        except StopIteration:
+            break
+        attempt += 1
+        changed = False
+        if delay > 0:
+            clock.sleep(delay)
+        elapsed += delay
+        
+        try:
+            statuses = {str(d.serial): d for d in client.get_eddi_statuses()}
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            log(f"  Attempt {attempt} (+{elapsed:.0f}s): Error checking status: {e}")
+            continue
+        seen_at = clock.monotonic()
+        
+        for serial in list(pending):
+            device = statuses.get(serial)
+            if device is None:
+                not_found[serial] += 1
+                log(f"  Attempt {attempt} (+{elapsed:.0f}s): {serial} not found")
+                if not_found[serial] >= MAX_DEVICE_NOT_FOUND:
+                    log(f"✗ {serial} not found in {MAX_DEVICE_NOT_FOUND}+ consecutive attempts")
+                    pending.remove(serial)
+                continue
+            not_found[serial] = 0
+            
+            if serial in last_sta and device.sta != last_sta[serial]:
+                changed = True
+            last_sta[serial] = device.sta
+            
+            if device.in_mode(mode):
+                log(f"✓ {serial} reached {mode} mode (sta={device.sta}, {device.status_text}) after {elapsed:.0f}s")
+                converged[serial] = seen_at
+                pending.remove(serial)
+            else:
+                log(f"  Attempt {attempt} (+{elapsed:.0f}s): {serial} sta={device.sta}, div={device.diversion or 0}W")
+    
+    for serial in pending:
+        log(f"✗ {serial} did not reach {mode} mode after {attempt} attempts")
+    return converged
+
+
+def execute_batch_with_retry(command, client, device_serials, max_retries=MAX_RETRIES, log=print, poll=None,
+                             latency=None, max_workers=BATCH_MAX_WORKERS, retry_delay=None,
+                             clock=SYSTEM_CLOCK, metrics=REGISTRY, backoff=None,
+                             budget=RUN_BUDGET) -> Dict[str, bool]:
+    """
+    Execute stop/start on several devices of one hub with shared verification.
+    
+    Mode changes are sent concurrently and verified together (see
+    _verify_many), so the batch takes about as long as its slowest device
+    instead of the sum of all of them. Devices that fail are retried
+    together; devices that succeeded are left alone. A single device is
+    handled by execute_command_with_retry.
+    
+    Args:
+        command: "stop" or "start"
+        client: EddiClient instance
+        device_serials: Serial numbers of the devices to act on
+        max_retries: Maximum number of attempts per device
+        log: Callable used to report progress (defaults to print)
+        poll: Callable returning the PollStrategy for a command (default:
+            merged from each device's learned latencies if latency is
+            given, otherwise adaptive_poll)
+        latency: Optional LatencyModel; each device's verified transition
+            time is recorded to it
+        max_workers: Most mode changes sent at the same time
+        retry_delay: Base delay before the first retry (default: RETRY_DELAY)
+        clock: Clock to read time from and sleep on
+        metrics: MetricsRegistry receiving attempt, retry and verify
+            duration metrics (None disables them)
+        backoff: Backoff between attempts (default: Backoff(retry_delay))
+        budget: RetryBudget retries draw from, one per device retried
+            (default: RUN_BUDGET; None allows every retry)
+    
+    Returns:
+        dict: Whether each device was verified, keyed by serial (empty
+        when no serials are given)
+    
+    Raises:
+        ValueError: If command is unknown
+    """
+    if command not in COMMAND_MODES:
+        raise ValueError(f"Invalid command: {command}. Must be 'stop' or 'start'")
+    serials = list(dict.fromkeys(str(serial) for serial in device_serials))
+    if not serials:
+        return {}
+    if len(serials) == 1:
+        ok = execute_command_with_retry(command, client, serials[0], max_retries, log=log, poll=poll, latency=latency,
+                                        retry_delay=retry_delay, clock=clock, metrics=metrics, backoff=backoff,
+                                        budget=budget)
+        return {serials[0]: ok}
+    if backoff is None:
+        backoff = Backoff(RETRY_DELAY if retry_delay is None else retry_delay)
+    if budget is not None:
+        budget.record_attempt(len(serials))
+    
+    results = dict.fromkeys(serials, False)
+    pending = list(serials)
+    if poll is None:
+        if latency is not None:
+            poll = lambda cmd: widest_poll(latency.poll_strategy(serial, cmd) for serial in pending)
+        else:
+            poll = adaptive_poll
+    
+    def send(serial):
+        sent_at = clock.monotonic()
+        return sent_at, getattr(client, command)(serial)
+    
+    for retry in range(1, max_retries + 1):
+        log(f"\n{'='*60}")
+        log(f"Attempt {retry}/{max_retries}: Executing {command.upper()} on {len(pending)} device(s)")
+        log(f"{'='*60}")
+        if metrics is not None and retry > 1:
+            metrics.inc("eddi_command_retries", len(pending), command=command)
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+            futures = {serial: executor.submit(send, serial) for serial in pending}
+        sent = {}
+        error = None
+        for serial, future in futures.items():
+            try:
+                sent[serial], result = future.result()
+                log(f"Command sent to {serial}: {_sanitize_api_response(result)}")
+            except Exception as e:
+                log(f"✗ Error sending {command.upper()} to {serial}: {e}")
+                if metrics is not None:
+                    metrics.inc("eddi_commands", command=command, result="error")
+                if isinstance(e, CircuitOpenError):
+                    error = e
+        
+        if sent:
+            try:
+                converged = _verify_many(client, list(sent), command, poll(command), log, clock)
+            except CircuitOpenError as e:
+                log(f"✗ {e}, stopping verification")
+                converged = dict.fromkeys(sent)
+                error = e
+            finished = clock.monotonic()
+            for serial, seen_at in converged.items():
+                if seen_at is None:
+                    _record_attempt(metrics, command, "unverified", finished - sent[serial])
+                else:
+                    _record_attempt(metrics, command, "verified", seen_at - sent[serial])
+                    results[serial] = True
+                    if latency is not None:
+                        latency.record(serial, command, seen_at - sent[serial])
+        
+        pending = [serial for serial in pending if not results[serial]]
+        if not pending:
+            return results
+        if retry < max_retries and not _pause_before_retry(retry, backoff, budget, clock, log, error, pending):
+            break
+    
+    log(f"\n✗ Command failed on {', '.join(pending)} after {max_retries} attempts")
+    return results
+
+
+@dataclass
+class ReconcileResult:
+    """Outcome of reconciling one device with a desired state."""
+
+    serial: str
+    changed: bool
+    ok: bool
+
+
+def reconcile(command, client, device_serials: Optional[Iterable[str]] = None, max_retries=MAX_RETRIES,
+              log=print, poll=None, latency=None, clock=SYSTEM_CLOCK) -> List[ReconcileResult]:
+    """
+    Bring devices into the state of a command, skipping those already in it.
+    
+    The current state of every device is read with a single status call.
+    Only devices that differ are sent the command and verified together
+    (see execute_batch_with_retry), so a run where everything already
+    matches costs one request and no waiting.
+    If the state cannot be read, every device is treated as differing.
+    
+    Args:
+        command: "stop" or "start"
+        client: EddiClient instance
+        device_serials: Devices to reconcile (default: every eddi on the hub)
+        max_retries: Maximum number of retry attempts per changed device
+        log: Callable used to report progress (defaults to print)
+        poll: Callable returning the PollStrategy for a command
+        latency: Optional LatencyModel (see execute_command_with_retry)
+        clock: Clock to read time from and sleep on
+    
+    Returns:
+        list[ReconcileResult]: One result per device, in the order given
+    
+    Raises:
+        ValueError: If command is unknown
+    """
+    if command not in COMMAND_MODES:
+        raise ValueError(f"Invalid command: {command}. Must be 'stop' or 'start'")
+    mode = COMMAND_MODES[command]
+    targets = [str(serial) for serial in device_serials] if device_serials else None
+    
+    try:
+        single = targets[0] if targets and len(targets) == 1 else None
+        current = {str(s.serial): s for s in client.get_eddi_statuses(single)}
+    except Exception as e:
+        if targets is None:
+            raise
+        log(f"Could not read current state ({e}), sending {command.upper()} to every device")
+        current = {}
+    if targets is None:
+        targets = list(current)
+    
+    differing = []
+    for serial in targets:
+        status = current.get(serial)
+        if status is not None and status.in_mode(mode):
+            log(f"✓ Device {serial} already in {mode} mode (sta={status.sta}, {status.status_text}), nothing to do")
+        else:
+            if status is not None:
+                log(f"Device {serial} is {status.status_text} (sta={status.sta}), sending {command.upper()}")
+            differing.append(serial)
+    
+    verified = {}
+    if differing:
+        verified = execute_batch_with_retry(
+            command, client, differing, max_retries, log=log, poll=poll, latency=latency, clock=clock
+        )
+    return [
+        ReconcileResult(serial, changed=serial in verified, ok=verified.get(serial, True))
+        for serial in targets
+    ]
@@ -0,0 +1,210 @@
+"""Request, discovery and status-cache logic shared by the sync and async clients.
+
+:class:`ClientCore` holds everything about talking to myenergi that does
+not depend on the HTTP library: which server to use and when to forget
+it, the circuit breaker, retry budget and backoff of each request, the
+request hooks, and the status cache. It performs no I/O itself.
+
+A request is driven through :meth:`ClientCore.exchange`, a generator
+that yields what the transport should do next: :data:`SEND` to send
+the request (the transport sends back a :class:`Reply`), or a number
+of seconds to sleep. ``EddiClient`` drives it with ``requests`` and
+blocking sleeps, ``AsyncEddiClient`` with ``httpx`` and ``await``, so
+both follow the same retry and breaker rules by construction.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Generator, Mapping, Optional, Sequence, Tuple
+
+from .discovery import ASN_HEADER, DIRECTOR_URL, REJECTION_STATUS_CODES, ServerCache, server_url_from_asn
+from .metrics import REGISTRY, RequestEvent
+from .resilience import DEFAULT_RESILIENCE, SERVER_FAILURE_STATUS_CODES, CircuitOpenError, Resilience
+
+# Yielded by ClientCore.exchange when the transport should send the request
+SEND = None
+
+
+@dataclass
+class Reply:
+    """Outcome of sending a request once, as reported by a transport.
+
+    Exactly one of ``response`` and ``error`` is set. ``response`` needs
+    ``status_code``, ``content`` and ``history`` (the responses of any
+    digest challenges answered on the way), which both requests and httpx
+    responses have.
+    """
+
+    seconds: float
+    response: Any = None
+    error: Optional[BaseException] = None
+    # For errors: whether the server is to blame (connection problem or timeout)
+    server_failure: bool = False
+
+
+# What a transport is asked to do next: send (SEND) or sleep (seconds)
+Step = Optional[float]
+
+
+class ClientCore:
+    """Server discovery, resilience, hooks and status cache of one hub's client."""
+
+    def __init__(
+        self,
+        serial_number: str,
+        base_url: Optional[str] = None,
+        server_cache: Optional[ServerCache] = None,
+        status_ttl: float = 0.0,
+        hooks: Optional[Sequence[Callable[[RequestEvent], None]]] = None,
+        resilience: Optional[Resilience] = None,
+    ):
+        """Initialize the shared client state.
+
+        Args:
+            serial_number: The hub serial number
+            base_url: Optional base URL. If not provided, the server is
+                discovered through the myenergi director and cached on disk
+            server_cache: Cache of discovered servers (default: on-disk cache)
+            status_ttl: Seconds a status response is reused by later calls
+                (0 disables caching; concurrent calls are always coalesced)
+            hooks: Callables receiving a RequestEvent after every HTTP
+                exchange (default: record to the metrics REGISTRY)
+            resilience: Circuit breakers, retry budget and request retry
+                policy (default: DEFAULT_RESILIENCE, shared by all clients)
+        """
+        self.serial_number = serial_number
+
+        # Without an explicit base URL, follow the director's ASN header
+        self.discover = base_url is None
+        self.server_cache = server_cache or ServerCache()
+        self._cached_base_url = self.server_cache.get(serial_number) if self.discover else None
+        self.base_url = base_url or self._cached_base_url or DIRECTOR_URL
+        self.hooks = list(hooks) if hooks is not None else [REGISTRY.record_request]
+        self.resilience = resilience or DEFAULT_RESILIENCE
+
+        # Status responses keyed by API path, with the time they were requested
+        self.status_ttl = status_ttl
+        self._status_cache: Dict[str, Tuple[float, Any]] = {}
+        self._status_generation = 0
+
+    # Requests
+
+    def exchange(self, path: str) -> Generator[Step, Reply, Any]:
+        """Steps of one GET of an API path through the server's circuit breaker.
+
+        Yields SEND when the transport should send the request to
+        ``self.base_url`` and send back a Reply, or the seconds to sleep
+        before the next attempt. Server-side failures (connection errors,
+        timeouts, 5xx and 429) are retried with jittered backoff while the
+        retry budget allows. Every exchange is reported to the hooks; its
+        time covers any digest challenge answered on the way. A send that
+        raises instead of replying (the transport must then close the
+        generator) counts as a failure of the server.
+
+        Returns:
+            The final response (raised as the generator's StopIteration value)
+
+        Raises:
+            CircuitOpenError: If the breaker is open; nothing is sent
+            Exception: The transport error of the last attempt
+        """
+        resilience = self.resilience
+        resilience.budget.record_attempt()
+        retry = 0
+        while True:
+            breaker = resilience.breaker(self.base_url)
+            try:
+                breaker.before_request()
+            except CircuitOpenError as e:
+                self._emit(RequestEvent(path, 0.0, error=type(e).__name__))
+                raise
+            try:
+                reply: Reply = yield SEND
+            except BaseException:
+                # The send raised something the transport could not report,
+                # or was cancelled: count it, so a probe does not stay claimed
+                breaker.record_failure()
+                raise
+            if reply.error is not None:
+                failed = reply.server_failure
+            else:
+                failed = reply.response.status_code in SERVER_FAILURE_STATUS_CODES
+            if failed:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+            if reply.error is not None:
+                self._emit(RequestEvent(path, reply.seconds, error=type(reply.error).__name__))
+            else:
+                response = reply.response
+                challenges = sum(1 for earlier in response.history if earlier.status_code == 401)
+                self._emit(RequestEvent(
+                    path, reply.seconds, response.status_code, len(response.content), challenges
+                ))
+            if not failed or retry >= resilience.request_retries or not resilience.budget.try_spend():
+                if reply.error is not None:
+                    raise reply.error
+                return reply.response
+            retry += 1
+            yield resilience.request_backoff.delay(retry)
+
+    def _emit(self, event: RequestEvent) -> None:
+        for hook in self.hooks:
+            hook(event)
+
+    # Server discovery
+
+    def _follow_asn(self, headers: Mapping[str, str]) -> None:
+        """Switch to (and remember) the server named in a response's ASN header."""
+        if not self.discover:
+            return
+        server = server_url_from_asn(headers.get(ASN_HEADER))
+        if server is None:
+            return
+        self.base_url = server
+        if server != self._cached_base_url:
+            self.server_cache.set(self.serial_number, server)
+            self._cached_base_url = server
+
+    def _forget_server(self, unreachable: bool, status_code: Optional[int] = None) -> bool:
+        """Drop a discovered server that rejected a request.
+
+        Args:
+            unreachable: Whether the request failed to connect
+            status_code: HTTP status of the failed request, if it got one
+
+        Returns:
+            True if the request should be retried through the director
+        """
+        if not self.discover or self.base_url == DIRECTOR_URL:
+            return False
+        if not unreachable and status_code not in REJECTION_STATUS_CODES:
+            return False
+        self.server_cache.invalidate(self.serial_number)
+        self._cached_base_url = None
+        self.base_url = DIRECTOR_URL
+        return True
+
+    # Status cache
+
+    def _cached_status(self, path: str) -> Optional[Any]:
+        """A status response still within status_ttl, if any."""
+        cached = self._status_cache.get(path)
+        if cached is not None and time.monotonic() - cached[0] < self.status_ttl:
+            return cached[1]
+        return None
+
+    def _store_status(self, path: str, started: float, result: Any, generation: int) -> None:
+        """Cache a status response requested at ``started`` (time.monotonic).
+
+        A response whose request began before the last invalidate_status
+        may predate a mode change, so it is not cached.
+        """
+        if self.status_ttl > 0 and generation == self._status_generation:
+            self._status_cache[path] = (started, result)
+
+    def invalidate_status(self) -> None:
+        """Drop cached status so the next call fetches fresh data."""
+        self._status_cache.clear()
+        self._status_generation += 1
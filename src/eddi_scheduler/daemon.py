@@ -0,0 +1,197 @@
+"""Long-running scheduler that executes transitions in-process."""
+
+import signal
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from .cache import JsonCache, cache_dir
+from .control import MAX_RETRIES, execute_command_with_retry
+from .latency import LatencyModel
+from .schedule import Schedule, Transition
+
+# Longest single sleep, so clock changes and suspends are noticed promptly
+MAX_SLEEP = 300.0
+
+# A transition missed by less than this (e.g. during a restart) still runs
+DEFAULT_CATCH_UP = timedelta(minutes=30)
+
+
+def utc_now() -> datetime:
+    """Return the current time as an aware UTC datetime."""
+    return datetime.now(timezone.utc)
+
+
+class SchedulerDaemon:
+    """Sleep until each scheduled transition and execute it with verification.
+
+    The client stays warm between transitions, so each command reuses the
+    discovered server, digest challenge and HTTP connection. The instant of
+    the last executed transition is saved to disk; after a restart, a
+    transition missed within the catch-up window is executed once and
+    nothing is executed twice.
+
+    Commands are issued ahead of each transition by the expected latency
+    of that command on that device, so the device lands in its new state
+    at the scheduled instant rather than minutes after it. The landing
+    error (verified time minus target) is logged and saved.
+    """
+
+    def __init__(
+        self,
+        client,
+        device_serial: str,
+        schedule: Schedule,
+        state_path: Optional[Path] = None,
+        catch_up: timedelta = DEFAULT_CATCH_UP,
+        max_retries: int = MAX_RETRIES,
+        latency: Optional[LatencyModel] = None,
+        log: Callable[[str], None] = print,
+        now: Callable[[], datetime] = utc_now,
+        lead_times: Optional[Dict[str, float]] = None,
+        lead_percentile: float = 50,
+    ):
+        """Initialize the daemon.
+
+        Args:
+            client: EddiClient instance
+            device_serial: Serial number of the eddi to control
+            schedule: Schedule to follow
+            state_path: Where to save progress (default: in the cache directory)
+            catch_up: How late a missed transition may still be executed
+            max_retries: Maximum command attempts per transition
+            latency: Optional LatencyModel used for verification
+            log: Callable used to report progress
+            now: Callable returning the current aware datetime
+            lead_times: Seconds to issue each command ("stop"/"start") early;
+                overrides the latency model. Without either, commands are
+                issued on time
+            lead_percentile: Percentile of measured latencies used as lead
+        """
+        self.client = client
+        self.device_serial = device_serial
+        self.schedule = schedule
+        self.state = JsonCache(state_path or cache_dir() / f"daemon-{device_serial}.json")
+        self.catch_up = catch_up
+        self.max_retries = max_retries
+        self.latency = latency
+        self.log = log
+        self.now = now
+        self.lead_times = lead_times or {}
+        self.lead_percentile = lead_percentile
+        self.stop_event = threading.Event()
+
+    def last_executed(self) -> Optional[datetime]:
+        """Return the instant of the last executed transition, if any."""
+        value = self.state.load().get("last_executed")
+        return datetime.fromisoformat(value) if value else None
+
+    def lead_time(self, action: str) -> timedelta:
+        """How early to issue an action so it lands on time."""
+        if action in self.lead_times:
+            seconds = self.lead_times[action]
+        elif self.latency is not None:
+            seconds = self.latency.lead_time(self.device_serial, action, self.lead_percentile)
+        else:
+            seconds = 0.0
+        return timedelta(seconds=max(seconds, 0.0))
+
+    def _mark_executed(self, transition: Transition, ok: bool, landing_error: Optional[float]) -> None:
+        self.state.save({
+            "last_executed": transition.when.isoformat(),
+            "action": transition.action,
+            "ok": ok,
+            "landing_error": landing_error,
+        })
+
+    def execute(self, transition: Transition) -> bool:
+        """Execute a transition now and record it as done."""
+        local = transition.when.astimezone(self.schedule.tz)
+        self.log(f"Executing {transition.action.upper()} scheduled for {local:%Y-%m-%d %H:%M %Z}")
+        ok = execute_command_with_retry(
+            transition.action,
+            self.client,
+            self.device_serial,
+            self.max_retries,
+            log=self.log,
+            latency=self.latency,
+        )
+        landing_error = (self.now() - transition.when).total_seconds() if ok else None
+        self._mark_executed(transition, ok, landing_error)
+        if ok:
+            self.log(f"✓ {transition.action.upper()} verified {landing_error:+.0f}s from the scheduled time")
+        else:
+            self.log(f"✗ {transition.action.upper()} failed")
+        return ok
+
+    def catch_up_missed(self) -> Optional[bool]:
+        """Execute the most recent transition if it was missed recently.
+
+        Returns:
+            The command result, or None if nothing needed catching up
+        """
+        now = self.now()
+        previous = self.schedule.previous_transition(now)
+        if previous is None or now - previous.when > self.catch_up:
+            return None
+        last = self.last_executed()
+        if last is not None and last >= previous.when:
+            return None
+        self.log(f"Catching up missed transition from {now - previous.when} ago")
+        return self.execute(previous)
+
+    def run_once(self) -> Optional[bool]:
+        """Sleep until the next transition, then execute it.
+
+        Returns:
+            The command result, or None if stopped or nothing is scheduled
+        """
+        # A transition issued early is still ahead of the clock; skip it
+        after = self.now()
+        last = self.last_executed()
+        if last is not None and last > after:
+            after = last
+        transition = self.schedule.next_transition(after)
+        if transition is None:
+            self.log("No upcoming transitions in the schedule")
+            self.stop_event.wait(MAX_SLEEP)
+            return None
+
+        local = transition.when.astimezone(self.schedule.tz)
+        lead = self.lead_time(transition.action)
+        fire_at = transition.when - lead
+        self.log(
+            f"Next: {transition.action.upper()} at {local:%Y-%m-%d %H:%M %Z}"
+            + (f", issued {lead.total_seconds():.0f}s early" if lead else "")
+        )
+        while not self.stop_event.is_set():
+            remaining = (fire_at - self.now()).total_seconds()
+            if remaining <= 0:
+                if -remaining > self.catch_up.total_seconds():
+                    # e.g. the machine was suspended through the transition
+                    self.log(f"Skipping {transition.action.upper()}: woke {-remaining:.0f}s late")
+                    return None
+                return self.execute(transition)
+            self.stop_event.wait(min(remaining, MAX_SLEEP))
+        return None
+
+    def run(self) -> None:
+        """Run until stop() is called."""
+        self.catch_up_missed()
+        while not self.stop_event.is_set():
+            self.run_once()
+        self.log("Scheduler stopped")
+
+    def stop(self) -> None:
+        """Ask the daemon to exit; a command in progress is allowed to finish."""
+        self.stop_event.set()
+
+    def install_signal_handlers(self) -> None:
+        """Stop cleanly on SIGINT and SIGTERM."""
+        def handle(signum, frame):
+            self.log(f"Received signal {signum}, shutting down after the current step...")
+            self.stop()
+
+        signal.signal(signal.SIGINT, handle)
+        signal.signal(signal.SIGTERM, handle)
@@ -0,0 +1,69 @@
+"""Discovery and caching of the myenergi server that hosts each hub."""
+
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from .cache import JsonCache, cache_dir
+
+# The director answers for any hub and names the right server in ASN_HEADER
+DIRECTOR_URL = "https://director.myenergi.net"
+ASN_HEADER = "x_myenergi-asn"
+
+# Seconds a discovered server is trusted before asking the director again
+DEFAULT_SERVER_TTL = 7 * 24 * 3600
+
+# HTTP status codes meaning the server no longer accepts this hub
+REJECTION_STATUS_CODES = (401, 403, 404)
+
+
+def server_url_from_asn(asn: Any) -> Optional[str]:
+    """Turn an ASN header value into a base URL.
+
+    Args:
+        asn: Value of the x_myenergi-asn response header
+
+    Returns:
+        Base URL such as "https://s18.myenergi.net", or None if the value
+        is missing or not a server name
+    """
+    if not isinstance(asn, str):
+        return None
+    asn = asn.strip().rstrip("/")
+    if not asn or asn == "undefined":
+        return None
+    if asn.startswith(("http://", "https://")):
+        return asn
+    return f"https://{asn}"
+
+
+class ServerCache:
+    """Hub serial to server base URL mapping persisted on disk with a TTL."""
+
+    def __init__(self, path: Optional[Path] = None, ttl: float = DEFAULT_SERVER_TTL):
+        """Initialize the server cache.
+
+        Args:
+            path: Cache file location (default: servers.json in the cache directory)
+            ttl: Seconds an entry stays valid
+        """
+        self.store = JsonCache(path or cache_dir() / "servers.json")
+        self.ttl = ttl
+
+    def get(self, serial: str) -> Optional[str]:
+        """Return the cached server for a hub, if present and fresh."""
+        entry = self.store.load().get(str(serial))
+        if not isinstance(entry, dict):
+            return None
+        if time.time() - entry.get("updated", 0) > self.ttl:
+            return None
+        return entry.get("base_url")
+
+    def set(self, serial: str, base_url: str) -> None:
+        """Remember the server for a hub."""
+        entry = {"base_url": base_url, "updated": time.time()}
+        self.store.update(lambda data: data.update({str(serial): entry}))
+
+    def invalidate(self, serial: str) -> None:
+        """Forget the server for a hub."""
+        self.store.update(lambda data: data.pop(str(serial), None) is not None)
@@ -0,0 +1,368 @@
+"""Local stand-in for the myenergi API, for offline and load testing.
+
+Implements the endpoints the clients use, with digest authentication
+(optionally with expiring nonces),
+eddi devices that move through their real state sequences
+(3 -> 1 -> 6 on stop, 6 -> 1 -> 3 on start) after configurable delays,
+and optional response latency and error injection. Any number of hubs
+can be simulated.
+
+Run in-process::
+
+    with FakeMyenergiServer([FakeHub("12345678", "secret")]) as server:
+        client = EddiClient("12345678", "secret", base_url=server.url)
+
+or standalone::
+
+    python -m eddi_scheduler.fakeserver --hubs 3 --eddis 2 --time-scale 0.1
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .discovery import ASN_HEADER
+from .models import EddiState
+
+REALM = "MyEnergi Telemetry"
+
+# Seconds for each step of a transition at time_scale=1, matching devices
+# in the field: stop reaches sta=6 after ~2.5 minutes, start leaves it in ~45s
+DEFAULT_STOP_DELAYS = (10.0, 150.0)
+DEFAULT_START_DELAYS = (45.0, 60.0)
+
+_DIGEST_FIELD = re.compile(r'(\w+)=(?:"([^"]*)"|([^,\s]*))')
+
+
+def _md5(text: str) -> str:
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+@dataclass
+class FakeEddi:
+    """A simulated eddi device.
+
+    A mode change starts a sequence of timed steps: stop goes through
+    Paused (sta=1) to Stopped (sta=6); start goes to Paused, then to
+    Diverting (sta=3) if ``surplus`` watts are available.
+    """
+
+    serial: int
+    surplus: float = 1500.0
+    sta: int = int(EddiState.DIVERTING)
+    temp1: float = 52.0
+    temp2: float = 48.0
+    _steps: List[Tuple[float, int]] = field(default_factory=list, repr=False)
+
+    def set_mode(self, mode: str, now: float, stop_delays, start_delays) -> None:
+        """Begin moving towards a mode (``"stop"`` or ``"normal"``)."""
+        if mode == "stop":
+            first, second = stop_delays
+            self._steps = [(now + first, int(EddiState.PAUSED)), (now + second, int(EddiState.STOPPED))]
+        else:
+            first, second = start_delays
+            self._steps = [(now + first, int(EddiState.PAUSED))]
+            if self.surplus > 0:
+                self._steps.append((now + second, int(EddiState.DIVERTING)))
+
+    def advance(self, now: float) -> None:
+        """Apply the steps that are due."""
+        while self._steps and self._steps[0][0] <= now:
+            self.sta = self._steps.pop(0)[1]
+
+    def status(self, now: float) -> Dict[str, Any]:
+        """The device entry of a jstatus response."""
+        self.advance(now)
+        diversion = int(self.surplus) if self.sta == EddiState.DIVERTING else 0
+        grid = -int(self.surplus) + diversion
+        return {
+            "sno": self.serial, "sta": self.sta, "div": diversion, "grd": grid,
+            "gen": int(self.surplus) + 300, "tp1": self.temp1, "tp2": self.temp2,
+            "ht1": "Tank 1", "ht2": "Tank 2", "che": 3.2,
+        }
+
+
+@dataclass
+class FakeHub:
+    """A simulated hub: digest credentials and its eddi devices."""
+
+    serial: str
+    api_key: str
+    eddis: List[FakeEddi] = field(default_factory=list)
+
+    def __post_init__(self):
+        if not self.eddis:
+            self.eddis = [FakeEddi(int(self.serial) + 1)]
+
+    def find(self, serial: str) -> Optional[FakeEddi]:
+        return next((e for e in self.eddis if str(e.serial) == str(serial)), None)
+
+
+def history_day(serial: int, day: date, hourly: bool = False) -> Dict[str, Any]:
+    """Synthetic cgi-jday/cgi-jdayhour response: a sunny day around noon."""
+    records = []
+    steps = 24 if hourly else 1440
+    for step in range(steps):
+        minute = step * 60 if hourly else step
+        hour, minute_of_hour = divmod(minute, 60)
+        sun = max(0.0, 1 - abs(hour + minute_of_hour / 60 - 12.5) / 6)
+        scale = 60 if hourly else 1
+        record = {"yr": day.year, "mon": day.month, "dom": day.day, "dow": day.strftime("%a")}
+        if hour:
+            record["hr"] = hour
+        if minute_of_hour and not hourly:
+            record["min"] = minute_of_hour
+        record.update({
+            "gep": int(3000 * sun * 60 * scale),
+            "h1d": int(1500 * sun * 60 * scale),
+            "exp": int(800 * sun * 60 * scale),
+            "imp": int((1 - sun) * 400 * 60 * scale),
+        })
+        records.append(record)
+    return {f"U{serial}": records}
+
+
+class FakeMyenergiServer:
+    """Threaded HTTP server simulating the myenergi API for several hubs."""
+
+    def __init__(
+        self,
+        hubs: List[FakeHub],
+        host: str = "127.0.0.1",
+        port: int = 0,
+        time_scale: float = 1.0,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        stop_delays: Tuple[float, float] = DEFAULT_STOP_DELAYS,
+        start_delays: Tuple[float, float] = DEFAULT_START_DELAYS,
+        seed: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+        nonce_lifetime: Optional[float] = None,
+    ):
+        """Initialize the server (call start() or use it as a context manager).
+
+        Args:
+            hubs: Hubs to simulate
+            host: Interface to bind
+            port: Port to bind (0 picks a free one; see url)
+            time_scale: Multiplier applied to transition delays (0.01 makes
+                a 150 s stop take 1.5 s)
+            latency: Seconds added to every response
+            error_rate: Fraction of authenticated requests answered with 500
+            stop_delays: Seconds until sta=1 and sta=6 after a stop
+            start_delays: Seconds until sta=1 and sta=3 after a start
+            seed: Seed for error injection
+            clock: Monotonic clock driving the simulation
+            nonce_lifetime: Seconds a nonce is accepted after it was issued;
+                later requests get a new challenge with stale=true (default:
+                nonces never expire)
+        """
+        self.hubs = {hub.serial: hub for hub in hubs}
+        self.time_scale = time_scale
+        self.latency = latency
+        self.error_rate = error_rate
+        self.stop_delays = stop_delays
+        self.start_delays = start_delays
+        self.clock = clock
+        self.random = random.Random(seed)
+        self.nonce_lifetime = nonce_lifetime
+        self.requests: Dict[str, int] = {}
+        self.challenges = 0
+        self._nonces: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        """Base URL to pass to a client."""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeMyenergiServer":
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the port."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeMyenergiServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    # Simulation
+
+    def now(self) -> float:
+        return self.clock()
+
+    def _delays(self, delays: Tuple[float, float]) -> Tuple[float, float]:
+        return delays[0] * self.time_scale, delays[1] * self.time_scale
+
+    def new_nonce(self) -> str:
+        nonce = os.urandom(16).hex()
+        with self._lock:
+            self._nonces[nonce] = self.now()
+            self.challenges += 1
+        return nonce
+
+    def nonce_expired(self, header: Optional[str]) -> bool:
+        """Whether a Digest Authorization header uses a nonce past its lifetime."""
+        issued = self._nonces.get(_digest_fields(header).get("nonce", ""))
+        return issued is not None and self.nonce_lifetime is not None and self.now() - issued > self.nonce_lifetime
+
+    def authenticate(self, header: Optional[str], method: str) -> Optional[FakeHub]:
+        """Check a Digest Authorization header; return the hub it is for."""
+        fields = _digest_fields(header)
+        hub = self.hubs.get(fields.get("username", ""))
+        if hub is None or fields.get("nonce") not in self._nonces or self.nonce_expired(header):
+            return None
+        ha1 = _md5(f"{hub.serial}:{REALM}:{hub.api_key}")
+        ha2 = _md5(f"{method}:{fields.get('uri', '')}")
+        if fields.get("qop"):
+            expected = _md5(f"{ha1}:{fields['nonce']}:{fields.get('nc', '')}:{fields.get('cnonce', '')}:{fields['qop']}:{ha2}")
+        else:
+            expected = _md5(f"{ha1}:{fields['nonce']}:{ha2}")
+        return hub if fields.get("response") == expected else None
+
+    def route(self, hub: FakeHub, path: str) -> Tuple[int, Any]:
+        """Answer an authenticated API path."""
+        now = self.now()
+        name = path.lstrip("/")
+        with self._lock:
+            self.requests[hub.serial] = self.requests.get(hub.serial, 0) + 1
+
+            if name == "cgi-jstatus-*":
+                return 200, [{"eddi": [e.status(now) for e in hub.eddis]}, {"zappi": []}, {"harvi": []}]
+            if name == "cgi-jstatus-E":
+                return 200, {"eddi": [e.status(now) for e in hub.eddis]}
+            match = re.fullmatch(r"cgi-jstatus-E(\d+)", name)
+            if match:
+                eddi = hub.find(match.group(1))
+                return 200, {"eddi": [eddi.status(now)] if eddi else []}
+
+            match = re.fullmatch(r"cgi-eddi-mode-E(\d+)-([01])", name)
+            if match:
+                eddi = hub.find(match.group(1))
+                if eddi is None:
+                    return 200, {"status": -14, "statustext": "Device not found"}
+                mode = "normal" if match.group(2) == "1" else "stop"
+                eddi.set_mode(mode, now, self._delays(self.stop_delays), self._delays(self.start_delays))
+                return 200, {"status": 0, "statustext": ""}
+
+        match = re.fullmatch(r"cgi-jday(hour)?-E(\d+)-(\d{4}-\d{2}-\d{2})", name)
+        if match and hub.find(match.group(2)):
+            return 200, history_day(int(match.group(2)), date.fromisoformat(match.group(3)), bool(match.group(1)))
+        return 404, {"status": -1, "statustext": "Not found"}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; without this, delayed
+            # ACKs add ~40ms to every keep-alive request
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, code: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+                body = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header(ASN_HEADER, server.url)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                hub = server.authenticate(self.headers.get("Authorization"), "GET")
+                if hub is None:
+                    challenge = f'Digest realm="{REALM}", nonce="{server.new_nonce()}", qop="auth", algorithm="MD5"'
+                    if server.nonce_expired(self.headers.get("Authorization")):
+                        challenge += ", stale=true"
+                    self._send(401, {"status": -1, "statustext": "Unauthorized"}, {"WWW-Authenticate": challenge})
+                    return
+                if server.error_rate and server.random.random() < server.error_rate:
+                    self._send(500, {"status": -1, "statustext": "Injected error"})
+                    return
+                code, payload = server.route(hub, self.path)
+                self._send(code, payload)
+
+        return Handler
+
+
+def _digest_fields(header: Optional[str]) -> Dict[str, str]:
+    """Parse the fields of a Digest Authorization header ({} if not Digest)."""
+    if not header or not header.startswith("Digest "):
+        return {}
+    return {key: quoted or bare for key, quoted, bare in _DIGEST_FIELD.findall(header[7:])}
+
+
+def make_hubs(count: int, eddis_per_hub: int = 1, first_serial: int = 10000000,
+              api_key: str = "secret") -> List[FakeHub]:
+    """Build hubs with sequential serials, all sharing one API key."""
+    hubs = []
+    for index in range(count):
+        serial = first_serial + index * 100
+        eddis = [FakeEddi(serial + 1 + offset) for offset in range(eddis_per_hub)]
+        hubs.append(FakeHub(str(serial), api_key, eddis))
+    return hubs
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run a fake server until interrupted."""
+    parser = argparse.ArgumentParser(description="Local stand-in for the myenergi API")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8080, help="Port to bind (0 for any free port)")
+    parser.add_argument("--hubs", type=int, default=1, help="Number of simulated hubs")
+    parser.add_argument("--eddis", type=int, default=1, help="Eddi devices per hub")
+    parser.add_argument("--api-key", default="secret", help="API key shared by all hubs")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiplier for transition delays")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--seed", type=int, help="Seed for error injection")
+    parser.add_argument("--nonce-lifetime", type=float, help="Seconds before a nonce goes stale (default: never)")
+    args = parser.parse_args(argv)
+
+    hubs = make_hubs(args.hubs, args.eddis, api_key=args.api_key)
+    server = FakeMyenergiServer(
+        hubs, args.host, args.port, args.time_scale, args.latency, args.error_rate, seed=args.seed,
+        nonce_lifetime=args.nonce_lifetime,
+    )
+    print(f"Fake myenergi API on {server.url} (api key {args.api_key!r})", file=sys.stderr)
+    for hub in hubs:
+        print(f"  hub {hub.serial}: eddi {', '.join(str(e.serial) for e in hub.eddis)}", file=sys.stderr)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
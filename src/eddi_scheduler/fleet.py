@@ -0,0 +1,204 @@
+"""Run commands across an inventory of hubs in parallel."""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, List, Optional, Union
+
+from .client import EddiClient
+from .config import load_document
+from .control import MAX_RETRIES, execute_command_with_retry
+from .latency import LatencyModel
+
+# Default number of hubs handled at the same time
+DEFAULT_MAX_WORKERS = 16
+
+FLEET_COMMANDS = ("status", "stop", "start")
+
+
+@dataclass
+class Hub:
+    """A hub entry from the fleet inventory."""
+
+    name: str
+    serial: str
+    api_key: str = field(repr=False)
+    base_url: Optional[str] = None
+    device: Optional[str] = None
+
+
+@dataclass
+class FleetResult:
+    """Outcome of a command on one device of a hub."""
+
+    hub: str
+    device: Optional[str]
+    ok: bool
+    detail: str
+    elapsed: float = 0.0
+
+
+def load_inventory(path: Union[str, Path]) -> List[Hub]:
+    """Load hubs from a TOML or YAML inventory file.
+
+    The file holds a list of ``hub`` tables and an optional ``defaults``
+    table whose keys apply to every hub::
+
+        [defaults]
+        base_url = "https://s18.myenergi.net"
+
+        [[hub]]
+        name = "home"
+        serial = "12345678"
+        api_key_env = "HOME_EDDI_API_KEY"   # or api_key = "..."
+        device = "10088888"                 # optional, defaults to first eddi
+
+    Args:
+        path: Path to the inventory file
+
+    Returns:
+        List of hubs in file order
+
+    Raises:
+        ValueError: If an entry is missing required fields
+    """
+    document = load_document(path)
+    defaults = document.get("defaults", {})
+    hubs = []
+
+    for index, entry in enumerate(document.get("hub", []), start=1):
+        entry = {**defaults, **entry}
+        serial = entry.get("serial")
+        if not serial:
+            raise ValueError(f"Hub #{index} in {path} is missing 'serial'")
+
+        api_key = entry.get("api_key")
+        if not api_key and entry.get("api_key_env"):
+            api_key = os.environ.get(entry["api_key_env"])
+        if not api_key:
+            raise ValueError(f"Hub {serial} in {path} has no 'api_key' or 'api_key_env' value")
+
+        device = entry.get("device")
+        hubs.append(Hub(
+            name=str(entry.get("name", serial)),
+            serial=str(serial),
+            api_key=api_key,
+            base_url=entry.get("base_url"),
+            device=str(device) if device is not None else None
+        ))
+
+    return hubs
+
+
+def _run_hub(
+    command: str,
+    hub: Hub,
+    max_retries: int,
+    log: Optional[Callable[[str], None]],
+    client_factory: Callable[..., EddiClient],
+    latency: Optional[LatencyModel]
+) -> List[FleetResult]:
+    started = time.monotonic()
+
+    def elapsed() -> float:
+        return time.monotonic() - started
+
+    try:
+        client = client_factory(hub.serial, hub.api_key, hub.base_url)
+
+        if command == "status":
+            statuses = client.get_eddi_statuses(hub.device)
+            if not statuses:
+                return [FleetResult(hub.name, hub.device, False, "No eddi devices found", elapsed())]
+            results = []
+            for eddi in statuses:
+                detail = f"{eddi.status_text} (sta={eddi.sta}), div={eddi.diversion or 0}W, grd={eddi.grid or 0}W"
+                results.append(FleetResult(hub.name, str(eddi.serial), True, detail, elapsed()))
+            return results
+
+        device = hub.device
+        if not device:
+            devices = client.get_eddi_devices()
+            if not devices:
+                return [FleetResult(hub.name, None, False, "No eddi devices found", elapsed())]
+            device = str(devices[0].get("sno"))
+
+        def hub_log(message: str) -> None:
+            if log is not None:
+                for line in str(message).strip("\n").splitlines():
+                    log(f"[{hub.name}] {line}")
+
+        ok = execute_command_with_retry(command, client, device, max_retries, log=hub_log, latency=latency)
+        detail = "verified" if ok else f"not verified after {max_retries} attempts"
+        return [FleetResult(hub.name, device, ok, detail, elapsed())]
+
+    except Exception as e:
+        return [FleetResult(hub.name, hub.device, False, f"Error: {e}", elapsed())]
+
+
+def run_fleet(
+    command: str,
+    hubs: List[Hub],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    max_retries: int = MAX_RETRIES,
+    log: Optional[Callable[[str], None]] = None,
+    client_factory: Callable[..., EddiClient] = EddiClient,
+    latency: Optional[LatencyModel] = None
+) -> List[FleetResult]:
+    """Run a command against every hub using a bounded worker pool.
+
+    Stop and start commands are verified per hub, so the slow verification
+    waits of different hubs overlap instead of adding up.
+
+    Args:
+        command: "status", "stop" or "start"
+        hubs: Hubs to act on
+        max_workers: Maximum number of hubs handled at once
+        max_retries: Maximum command attempts per hub
+        log: Optional callable receiving per-hub progress lines
+        client_factory: Callable creating a client from (serial, api_key, base_url)
+        latency: Optional LatencyModel used to size verification per device
+            and to record how long each verified command took
+
+    Returns:
+        Results in inventory order, one per device acted on
+
+    Raises:
+        ValueError: If command is unknown
+    """
+    if command not in FLEET_COMMANDS:
+        raise ValueError(f"Invalid command: {command}. Must be one of {', '.join(FLEET_COMMANDS)}")
+    if not hubs:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(hubs))) as executor:
+        batches = executor.map(
+            lambda hub: _run_hub(command, hub, max_retries, log, client_factory, latency),
+            hubs
+        )
+        return [result for batch in batches for result in batch]
+
+
+def format_results(results: List[FleetResult]) -> str:
+    """Render fleet results as a plain-text table.
+
+    Args:
+        results: Results returned by run_fleet
+
+    Returns:
+        Table with one row per result
+    """
+    headers = ("HUB", "DEVICE", "RESULT", "TIME", "DETAIL")
+    rows = [
+        (r.hub, r.device or "-", "OK" if r.ok else "FAIL", f"{r.elapsed:.1f}s", r.detail)
+        for r in results
+    ]
+    widths = [max(len(row[i]) for row in [headers, *rows]) for i in range(len(headers) - 1)]
+
+    lines = []
+    for row in [headers, *rows]:
+        cells = [cell.ljust(width) for cell, width in zip(row, widths)]
+        lines.append("  ".join([*cells, row[-1]]))
+    return "\n".join(lines)
@@ -0,0 +1,495 @@
+"""Local HTTP gateway serving cached eddi status to many readers.
+
+Dashboards, home automation and the scheduler each polling myenergi
+means one cloud session and one ``cgi-jstatus`` request stream per
+reader. The gateway keeps a single poller per hub and answers local
+readers from memory, so cloud load stays the same however many readers
+there are:
+
+``GET /status``
+    Every device of every hub, with ``updated`` (epoch seconds), ``age``
+    and ``stale`` freshness metadata.
+``GET /status/<serial>``
+    One device.
+``GET /events``
+    Server-sent events: the current state of every device, then one
+    ``status`` event per device and sample with only the changed fields.
+    ``?device=<serial>`` limits the stream to one device.
+``POST /devices/<serial>/stop`` and ``POST /devices/<serial>/start``
+    Forward a mode change through :meth:`EddiClient.set_mode`. Identical
+    requests arriving while one is in flight share its result; a repeat
+    of the last command sent to the device within DUPLICATE_WINDOW is not
+    sent while the device is still changing state, and neither is a
+    command the fresh cached state already satisfies.
+``GET /healthz``
+    Poller state of each hub.
+
+Commands need ``Authorization: Bearer <token>``; a web page cannot send
+that header cross-origin without a preflight the gateway never answers.
+Requests whose ``Host`` is not the bound address, or whose ``Origin``
+is another site, are rejected, so DNS rebinding cannot reach the
+gateway either.
+"""
+
+import asyncio
+import hmac
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from .models import COMMAND_MODES, FIELD_KEYS, in_mode, status_text
+from .watch import DEFAULT_WATCH_INTERVAL, StatusWatcher
+
+# Samples a device may miss before its cached state is reported as stale
+STALE_AFTER_INTERVALS = 3
+
+# Seconds after a command during which the same command to the device is
+# not sent again (the device takes up to a few minutes to change state),
+# unless a later sample shows the command took effect
+DUPLICATE_WINDOW = 60.0
+
+# Seconds between keep-alive comments on idle event streams
+KEEPALIVE_INTERVAL = 15.0
+
+# Events queued for a slow event-stream reader before it is disconnected
+SUBSCRIBER_QUEUE_SIZE = 256
+
+# Field name of each API key, for turning raw deltas into typed ones
+_FIELD_NAMES = {key: name for name, key in FIELD_KEYS.items()}
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+    405: "Method Not Allowed", 502: "Bad Gateway",
+}
+
+# Addresses that also reach a server bound to a loopback interface
+_LOOPBACK_NAMES = ("127.0.0.1", "localhost", "[::1]")
+
+# Addresses that bind every interface, where any Host may be legitimate
+_WILDCARD_HOSTS = ("", "0.0.0.0", "::")
+
+
+def typed_fields(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Rename the API keys of a device entry (or a delta) to field names."""
+    return {_FIELD_NAMES[key]: value for key, value in raw.items() if key in _FIELD_NAMES}
+
+
+class HubPoller:
+    """Reads one hub's status upstream and keeps the latest state in memory."""
+
+    def __init__(
+        self,
+        name: str,
+        client,
+        device: Optional[str] = None,
+        interval: float = DEFAULT_WATCH_INTERVAL,
+        now: Callable[[], float] = time.time,
+    ):
+        """Initialize the poller.
+
+        Args:
+            name: Hub name reported to readers
+            client: EddiClient of the hub; only used from executor threads
+            device: Serial of a single eddi to poll (default: every eddi)
+            interval: Seconds between upstream samples
+            now: Wall clock for freshness timestamps
+        """
+        self.name = name
+        self.client = client
+        self.interval = interval
+        self.now = now
+        self.watcher = StatusWatcher(client, device, list(FIELD_KEYS), interval, now)
+        self.updated: Optional[float] = None
+        # When the latest good sample was started; a command sent before
+        # that is reflected in the cached state
+        self.sampled: Optional[float] = None
+        self.error: Optional[str] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def devices(self) -> Dict[str, Dict[str, Any]]:
+        """Latest typed status per device serial."""
+        return {serial: typed_fields(raw) for serial, raw in self.watcher.last.items()}
+
+    def stale(self) -> bool:
+        if self.updated is None:
+            return True
+        return self.now() - self.updated > self.interval * STALE_AFTER_INTERVALS
+
+    def poke(self) -> None:
+        """Sample again now instead of waiting for the interval."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def run(self, publish: Callable[[str, List[Dict[str, Any]]], None]) -> None:
+        """Sample forever, passing changes to publish(hub name, events)."""
+        loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        while True:
+            self._wake.clear()
+            started = self.now()
+            try:
+                devices = await loop.run_in_executor(None, self.watcher.fetch)
+            except Exception as e:
+                self.error = str(e)
+            else:
+                # Only the loop thread touches watcher.last, so handlers
+                # never see it change while they read it
+                events = self.watcher.update(devices)
+                self.error = None
+                self.updated = self.now()
+                self.sampled = started
+                if events:
+                    publish(self.name, events)
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+class Gateway:
+    """Cached status, coalesced commands and change streams for a set of hubs."""
+
+    def __init__(self, pollers: List[HubPoller], token: Optional[str] = None):
+        """Initialize the gateway.
+
+        Args:
+            pollers: One poller per hub
+            token: Bearer token that commands must carry (default: commands
+                are refused over HTTP)
+        """
+        self.pollers = pollers
+        self.token = token
+        # Host headers accepted, set by serve() from the bound address
+        # (None accepts any, for wildcard bindings)
+        self.hosts: Optional[Set[str]] = None
+        self.subscribers: Set[Tuple[asyncio.Queue, Optional[str]]] = set()
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._sent: Dict[str, Tuple[str, float]] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    # State
+
+    def find(self, serial: str) -> Optional[HubPoller]:
+        """The poller that has seen a device."""
+        for poller in self.pollers:
+            if serial in poller.watcher.last:
+                return poller
+        return None
+
+    def device(self, poller: HubPoller, serial: str) -> Dict[str, Any]:
+        """One device's cached status with freshness metadata."""
+        status = poller.devices()[serial]
+        status["status_text"] = status_text(status.get("sta"))
+        age = None if poller.updated is None else round(poller.now() - poller.updated, 3)
+        return {
+            "hub": poller.name,
+            "serial": serial,
+            "status": status,
+            "updated": poller.updated,
+            "age": age,
+            "stale": poller.stale(),
+            "error": poller.error,
+        }
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [self.device(poller, serial) for poller in self.pollers for serial in poller.watcher.last]
+
+    def health(self) -> List[Dict[str, Any]]:
+        return [
+            {"hub": p.name, "devices": len(p.watcher.last), "updated": p.updated, "stale": p.stale(), "error": p.error}
+            for p in self.pollers
+        ]
+
+    # Commands
+
+    async def command(self, serial: str, command: str) -> Dict[str, Any]:
+        """Forward stop/start, sharing the result of an identical request in flight.
+
+        Raises:
+            KeyError: If no poller has seen the device
+            requests.RequestException: If the upstream request fails
+        """
+        poller = self.find(serial)
+        if poller is None:
+            raise KeyError(serial)
+        key = (serial, command)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            result = dict(await asyncio.shield(pending))
+            result["coalesced"] = True
+            return result
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._send(poller, serial, command)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure nobody else awaited is not logged
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _settle(self, serial: str, sta: Optional[int], sampled: Optional[float]) -> None:
+        """Forget the last command sent to a device once a later sample shows it took effect.
+
+        Until then the device is moving through intermediate states (3 -> 1
+        on the way to 6), which say nothing about whether to repeat it.
+        """
+        sent = self._sent.get(serial)
+        if sent is not None and sampled is not None and sampled >= sent[1] and in_mode(sta, COMMAND_MODES[sent[0]]):
+            del self._sent[serial]
+
+    def _is_duplicate(self, poller: HubPoller, serial: str, command: str) -> bool:
+        """Whether a command would repeat one just sent or match the fresh state."""
+        sta = poller.watcher.last.get(serial, {}).get("sta")
+        self._settle(serial, sta, poller.sampled)
+        sent = self._sent.get(serial)
+        if sent is not None and poller.now() - sent[1] < DUPLICATE_WINDOW:
+            return sent[0] == command
+        return not poller.stale() and in_mode(sta, COMMAND_MODES[command])
+
+    async def _send(self, poller: HubPoller, serial: str, command: str) -> Dict[str, Any]:
+        async with self._locks.setdefault(serial, asyncio.Lock()):
+            if self._is_duplicate(poller, serial, command):
+                return {"serial": serial, "command": command, "sent": False, "coalesced": False}
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(None, poller.client.set_mode, serial, COMMAND_MODES[command])
+            self._sent[serial] = (command, poller.now())
+            poller.poke()
+            return {"serial": serial, "command": command, "sent": True, "coalesced": False, "response": response}
+
+    # Events
+
+    def publish(self, hub: str, events: List[Dict[str, Any]]) -> None:
+        """Queue changes for every subscriber, dropping those that fall behind.
+
+        A state change is also checked against the last command sent, so a
+        stop that reached sta=6 is settled even if it has since moved on.
+        """
+        for event in events:
+            serial = str(event["sno"])
+            if "sta" in event:
+                self._settle(serial, event["sta"], event["ts"])
+            message = {"hub": hub, "serial": serial, "ts": event["ts"], "changes": typed_fields(event)}
+            message["changes"].pop("serial", None)
+            for subscriber in list(self.subscribers):
+                queue, device = subscriber
+                if device is not None and device != serial:
+                    continue
+                try:
+                    queue.put_nowait(message)
+                except asyncio.QueueFull:
+                    # Replace the backlog with an end-of-stream marker
+                    self.subscribers.discard(subscriber)
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(None)
+
+    # Lifecycle
+
+    def start(self) -> None:
+        """Start every poller on the running loop."""
+        self._tasks = [asyncio.ensure_future(poller.run(self.publish)) for poller in self.pollers]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    # HTTP
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve HTTP/1.1 requests of one connection, keeping it alive."""
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except ValueError as e:
+                    _write_json(writer, 400, {"error": str(e)}, keep_alive=False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, headers = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                refused = self._refuse(method, headers)
+                if refused is not None:
+                    _write_json(writer, *refused, keep_alive)
+                    await writer.drain()
+                    if not keep_alive:
+                        break
+                    continue
+                url = urlsplit(target)
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                if url.path == "/events" and method == "GET":
+                    await self._stream(writer, query.get("device"))
+                    break
+                status, body = await self._route(method, url.path)
+                _write_json(writer, status, body, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Shutting down: end the connection quietly rather than fail the
+            # handler task, which asyncio would log as an error
+            pass
+        finally:
+            writer.close()
+
+    def _refuse(self, method: str, headers: Dict[str, str]) -> Optional[Tuple[int, Any]]:
+        """The error response for a request from an untrusted origin or without the token, if any."""
+        host = headers.get("host", "").lower()
+        if self.hosts is not None and host not in self.hosts:
+            return 403, {"error": f"Unexpected Host {host!r}"}
+        origin = headers.get("origin")
+        if origin is not None and urlsplit(origin).netloc.lower() != host:
+            return 403, {"error": f"Cross-origin requests are not allowed ({origin})"}
+        if method == "POST":
+            scheme, _, token = headers.get("authorization", "").partition(" ")
+            if self.token is None or scheme.lower() != "bearer" or not hmac.compare_digest(token.strip(), self.token):
+                return 401, {"error": "Commands need Authorization: Bearer <token>"}
+        return None
+
+    async def _route(self, method: str, path: str) -> Tuple[int, Any]:
+        parts = [part for part in path.split("/") if part]
+        if method == "GET" and parts == ["status"]:
+            return 200, self.snapshot()
+        if method == "GET" and len(parts) == 2 and parts[0] == "status":
+            poller = self.find(parts[1])
+            if poller is None:
+                return 404, {"error": f"Unknown device {parts[1]}"}
+            return 200, self.device(poller, parts[1])
+        if method == "GET" and parts == ["healthz"]:
+            return 200, self.health()
+        if len(parts) == 3 and parts[0] == "devices" and parts[2] in COMMAND_MODES:
+            if method != "POST":
+                return 405, {"error": "Use POST"}
+            try:
+                return 200, await self.command(parts[1], parts[2])
+            except KeyError:
+                return 404, {"error": f"Unknown device {parts[1]}"}
+            except Exception as e:
+                return 502, {"error": str(e)}
+        return 404, {"error": f"No route for {method} {path}"}
+
+    async def _stream(self, writer: asyncio.StreamWriter, device: Optional[str]) -> None:
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n"
+        )
+        for state in self.snapshot():
+            if device is None or state["serial"] == device:
+                writer.write(_sse("snapshot", state))
+        await writer.drain()
+
+        queue: asyncio.Queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+        subscriber = (queue, device)
+        self.subscribers.add(subscriber)
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    writer.write(b": keepalive\n\n")
+                else:
+                    if message is None:
+                        return
+                    writer.write(_sse("status", message))
+                await writer.drain()
+        finally:
+            self.subscribers.discard(subscriber)
+
+
+async def _read_request(reader: asyncio.StreamReader):
+    """Read a request line and headers, or None at end of stream.
+
+    Request bodies are read and discarded; no endpoint takes one.
+
+    Raises:
+        ValueError: If the Content-Length header is not a number
+    """
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        return None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise ValueError("Invalid Content-Length") from None
+    if length > 0:
+        await reader.readexactly(length)
+    return method.upper(), target, headers
+
+
+def _write_json(writer: asyncio.StreamWriter, status: int, body: Any, keep_alive: bool) -> None:
+    payload = json.dumps(body, separators=(",", ":")).encode()
+    writer.write(
+        f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload
+    )
+
+
+def _sse(event: str, data: Any) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+def allowed_hosts(host: str, port: int) -> Optional[Set[str]]:
+    """Host header values that address a server bound to host:port (None for any)."""
+    if host in _WILDCARD_HOSTS:
+        return None
+    names = {f"[{host}]" if ":" in host else host}
+    if host in ("127.0.0.1", "::1", "localhost"):
+        names.update(_LOOPBACK_NAMES)
+    hosts = {f"{name}:{port}".lower() for name in names}
+    if port == 80:
+        hosts.update(name.lower() for name in names)
+    return hosts
+
+
+async def serve(gateway: Gateway, host: str, port: int,
+                stop: Optional[asyncio.Event] = None,
+                ready: Optional[Callable[[Tuple[str, int]], None]] = None) -> None:
+    """Run the gateway until ``stop`` is set (or forever).
+
+    Args:
+        gateway: Gateway to serve
+        host: Interface to bind
+        port: Port to listen on (0 picks a free one)
+        stop: Event that shuts the server down when set
+        ready: Called with the bound (host, port) once listening
+    """
+    server = await asyncio.start_server(gateway.handle, host, port)
+    address = server.sockets[0].getsockname()[:2]
+    gateway.hosts = allowed_hosts(host, address[1])
+    gateway.start()
+    try:
+        if ready is not None:
+            ready(address)
+        await (stop or asyncio.Event()).wait()
+    finally:
+        server.close()
+        await server.wait_closed()
+        await gateway.stop()
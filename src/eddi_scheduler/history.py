@@ -0,0 +1,175 @@
+"""Per-day minute and hourly history, fetched in parallel and cached on disk."""
+
+import calendar
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .cache import JsonCache, cache_dir
+
+# Default number of days fetched at the same time
+DEFAULT_HISTORY_WORKERS = 8
+
+# Time after midnight UTC before the previous day is treated as complete
+SETTLE_TIME = timedelta(hours=1)
+
+HISTORY_KINDS = ("minute", "hour")
+
+# Energy counters in history records, in joules per minute (or per hour)
+ENERGY_KEYS = ("imp", "exp", "gen", "gep", "h1d", "h2d", "h1b", "h2b")
+
+
+def history_path(serial: str, day: date, hourly: bool = False) -> str:
+    """Build the API path for one day of history.
+
+    Args:
+        serial: Eddi serial number
+        day: UTC calendar day
+        hourly: Hourly totals instead of minute data
+
+    Returns:
+        API path, e.g. "cgi-jday-E10088888-2026-10-17"
+    """
+    endpoint = "cgi-jdayhour" if hourly else "cgi-jday"
+    return f"{endpoint}-E{serial}-{day:%Y-%m-%d}"
+
+
+def history_records(payload: Any) -> List[Dict[str, Any]]:
+    """Extract the records of a history response and timestamp them.
+
+    The API returns ``{"U<serial>": [...]}``; records omit ``hr`` and
+    ``min`` when they are zero. Each returned record gets a ``ts`` key
+    with the UTC epoch seconds at the start of its minute or hour.
+    """
+    if isinstance(payload, dict):
+        entries = next((value for value in payload.values() if isinstance(value, list)), [])
+    else:
+        entries = payload or []
+    records = []
+    for entry in entries:
+        record = dict(entry)
+        record["ts"] = calendar.timegm((
+            record["yr"], record["mon"], record["dom"], record.get("hr", 0), record.get("min", 0), 0
+        ))
+        records.append(record)
+    return records
+
+
+def day_range(start: date, end: date) -> List[date]:
+    """Days from start to end, both included."""
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def is_complete(day: date, now: Optional[datetime] = None) -> bool:
+    """Whether the history of a UTC day can no longer change."""
+    now = now or datetime.now(timezone.utc)
+    day_end = datetime(day.year, day.month, day.day, tzinfo=timezone.utc) + timedelta(days=1)
+    return now >= day_end + SETTLE_TIME
+
+
+class HistoryCache:
+    """Completed days of history, one file per device, kind and day.
+
+    A past day never changes, so a cached day is used forever. Days that
+    are not complete yet (see is_complete) are never written.
+    """
+
+    def __init__(self, root: Optional[Path] = None):
+        """Initialize the history cache.
+
+        Args:
+            root: Cache directory (default: history/ in the cache directory)
+        """
+        self.root = Path(root) if root is not None else cache_dir() / "history"
+
+    def _file(self, serial: str, day: date, hourly: bool) -> JsonCache:
+        kind = "hour" if hourly else "minute"
+        return JsonCache(self.root / str(serial) / kind / f"{day:%Y-%m-%d}.json")
+
+    def get(self, serial: str, day: date, hourly: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """Return the cached records of a day, or None if not cached."""
+        data = self._file(serial, day, hourly).load()
+        return data.get("records") if "records" in data else None
+
+    def set(self, serial: str, day: date, records: List[Dict[str, Any]], hourly: bool = False) -> None:
+        """Store the records of a completed day."""
+        self._file(serial, day, hourly).save({"records": records})
+
+
+def split_cached(
+    serial: str,
+    days: List[date],
+    hourly: bool = False,
+    cache: Optional[HistoryCache] = None,
+) -> Tuple[Dict[date, List[Dict[str, Any]]], List[date]]:
+    """Records of the days found in the cache, and the days still to fetch."""
+    found: Dict[date, List[Dict[str, Any]]] = {}
+    missing = []
+    for day in days:
+        cached = cache.get(serial, day, hourly) if cache is not None else None
+        if cached is not None:
+            found[day] = cached
+        else:
+            missing.append(day)
+    return found, missing
+
+
+def day_records(
+    payload: Any,
+    serial: str,
+    day: date,
+    hourly: bool = False,
+    cache: Optional[HistoryCache] = None,
+    now: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """Records of a fetched day, cached once the day is complete."""
+    records = history_records(payload)
+    if cache is not None and is_complete(day, now):
+        cache.set(serial, day, records, hourly)
+    return records
+
+
+def fetch_history(
+    get: Callable[[str], Any],
+    serial: str,
+    start: date,
+    end: date,
+    hourly: bool = False,
+    max_workers: int = DEFAULT_HISTORY_WORKERS,
+    cache: Optional[HistoryCache] = None,
+    now: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """Fetch a range of days, reading completed days from the cache.
+
+    Args:
+        get: Callable performing an authenticated GET of an API path and
+            returning the decoded JSON (e.g. EddiClient._get)
+        serial: Eddi serial number
+        start: First UTC day
+        end: Last UTC day (included)
+        hourly: Hourly totals instead of minute data
+        max_workers: Maximum days fetched at the same time
+        cache: Cache of completed days (None disables caching)
+        now: Current time, used to decide which days are complete
+
+    Returns:
+        Records of every day in time order (see history_records)
+
+    Raises:
+        ValueError: If end is before start
+    """
+    if end < start:
+        raise ValueError(f"End date {end} is before start date {start}")
+    days = day_range(start, end)
+    results, missing = split_cached(serial, days, hourly, cache)
+
+    def fetch(day: date) -> List[Dict[str, Any]]:
+        return day_records(get(history_path(serial, day, hourly)), serial, day, hourly, cache, now)
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+            for day, records in zip(missing, executor.map(fetch, missing)):
+                results[day] = records
+
+    return [record for day in days for record in results[day]]
@@ -0,0 +1,141 @@
+"""Learned command latencies, recorded from verified transitions."""
+
+import math
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .cache import JsonCache, cache_dir
+from .control import AdaptivePoll, PollStrategy, adaptive_poll
+
+# Samples kept per device and command; older ones are dropped
+DEFAULT_MAX_SAMPLES = 50
+
+# Samples needed before measurements replace the defaults
+MIN_SAMPLES = 3
+
+# Typical seconds from command to verified state when nothing is known
+DEFAULT_LATENCY = {
+    "stop": 150.0,
+    "start": 45.0,
+}
+
+
+def percentile(samples: Sequence[float], q: float) -> float:
+    """Linearly interpolated percentile of a non-empty sample.
+
+    Args:
+        samples: Values to summarize
+        q: Percentile between 0 and 100
+
+    Returns:
+        The q-th percentile
+    """
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _clamp(value: float, low: float, high: float) -> float:
+    return max(low, min(value, high))
+
+
+class LatencyStore:
+    """Seconds each verified command took, per device and command, on disk."""
+
+    def __init__(self, path: Optional[Path] = None, max_samples: int = DEFAULT_MAX_SAMPLES):
+        """Initialize the latency store.
+
+        Args:
+            path: Store location (default: latency.json in the cache directory)
+            max_samples: Most recent samples kept per device and command
+        """
+        self.store = JsonCache(path or cache_dir() / "latency.json")
+        self.max_samples = max_samples
+
+    @staticmethod
+    def _key(serial: str, command: str) -> str:
+        return f"{serial}:{command}"
+
+    def record(self, serial: str, command: str, seconds: float) -> None:
+        """Add a measured latency."""
+        key = self._key(serial, command)
+        sample = [round(time.time(), 1), round(seconds, 2)]
+
+        def add(data: Dict[str, Any]) -> None:
+            data[key] = (data.get(key, []) + [sample])[-self.max_samples:]
+
+        self.store.update(add)
+
+    def samples(self, serial: str, command: str) -> List[float]:
+        """Return recorded latencies, oldest first."""
+        entries = self.store.load().get(self._key(serial, command), [])
+        return [entry[1] for entry in entries]
+
+    def keys(self) -> List[Tuple[str, str]]:
+        """Return the (serial, command) pairs with recorded samples."""
+        pairs = []
+        for key in self.store.load():
+            serial, _, command = key.rpartition(":")
+            pairs.append((serial, command))
+        return sorted(pairs)
+
+
+class LatencyModel:
+    """Percentile view over a LatencyStore with sensible fallbacks.
+
+    Used by verification to size its first probe and timeout per device,
+    and by schedulers to decide how early to issue a command.
+    """
+
+    def __init__(self, store: Optional[LatencyStore] = None, defaults: Optional[Dict[str, float]] = None):
+        self.store = store or LatencyStore()
+        self.defaults = {**DEFAULT_LATENCY, **(defaults or {})}
+
+    def record(self, serial: str, command: str, seconds: float) -> None:
+        """Add a measured latency for a device and command."""
+        self.store.record(serial, command, seconds)
+
+    def percentile(self, serial: str, command: str, q: float) -> Optional[float]:
+        """Return the q-th percentile latency, or None without enough samples."""
+        samples = self.store.samples(serial, command)
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return percentile(samples, q)
+
+    def lead_time(self, serial: str, command: str, q: float = 50) -> float:
+        """Seconds before a target instant a command should be issued.
+
+        Args:
+            serial: Device serial number
+            command: "stop" or "start"
+            q: Percentile of past latencies to aim for
+
+        Returns:
+            Measured percentile, or the default latency for the command
+        """
+        value = self.percentile(serial, command, q)
+        return value if value is not None else self.defaults[command]
+
+    def poll_strategy(self, serial: str, command: str) -> PollStrategy:
+        """Polling schedule sized from this device's past latencies.
+
+        The first probe lands just before the fastest typical transition
+        (10th percentile), intervals scale with the median and the timeout
+        allows twice the 95th percentile. Without enough samples the
+        default adaptive schedule is used.
+        """
+        samples = self.store.samples(serial, command)
+        if len(samples) < MIN_SAMPLES:
+            return adaptive_poll(command)
+        p10 = percentile(samples, 10)
+        p50 = percentile(samples, 50)
+        p95 = percentile(samples, 95)
+        return AdaptivePoll(
+            first_probe=_clamp(p10 * 0.9, 2, 120),
+            min_interval=_clamp(p50 / 10, 2, 10),
+            max_interval=_clamp(p50 / 2, 5, 30),
+            timeout=_clamp(p95 * 2, 30, 600),
+        )
@@ -0,0 +1,281 @@
+"""Request and command metrics, exported in the OpenMetrics text format.
+
+EddiClient reports every HTTP exchange as a :class:`RequestEvent` to its
+hooks; by default the only hook is :data:`REGISTRY`, which turns events
+into latency histograms and counters per endpoint. Command execution
+adds retry counts and verification durations. The registry can be read
+in-process (:meth:`MetricsRegistry.snapshot`), written to a file
+(:class:`FileExporter`) or served on a local ``/metrics`` endpoint
+(:func:`serve`).
+"""
+
+import bisect
+import math
+import os
+import re
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence, Tuple, Union
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Bucket upper bounds in seconds
+REQUEST_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+VERIFY_BUCKETS = (5.0, 10.0, 30.0, 60.0, 120.0, 180.0, 300.0, 600.0)
+
+# Metric families: name -> (type, help, histogram buckets)
+METRICS = {
+    "eddi_request_duration_seconds": ("histogram", "Time from sending a request to its final response", REQUEST_BUCKETS),
+    "eddi_responses": ("counter", "Final HTTP responses by endpoint and status code", None),
+    "eddi_request_errors": ("counter", "Requests that failed without a response", None),
+    "eddi_digest_challenges": ("counter", "401 digest challenges answered", None),
+    "eddi_response_bytes": ("counter", "Response body bytes received", None),
+    "eddi_commands": ("counter", "Command attempts by command and result", None),
+    "eddi_command_retries": ("counter", "Command attempts after the first", None),
+    "eddi_verify_duration_seconds": ("histogram", "Time from sending a command to the end of its verification", VERIFY_BUCKETS),
+}
+
+# Runs of digits (serials, dates, mode values) dropped from paths to form endpoint labels
+_VARIABLE_PART = re.compile(r"\d[\d-]*")
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def endpoint_name(path: str) -> str:
+    """Endpoint label of an API path, without serials, dates or values.
+
+    >>> endpoint_name("cgi-eddi-mode-E10088888-0")
+    'cgi-eddi-mode-E'
+    """
+    return _VARIABLE_PART.sub("", path.lstrip("/"))
+
+
+@dataclass
+class RequestEvent:
+    """One HTTP exchange made by a client, passed to its hooks."""
+
+    path: str
+    seconds: float
+    status_code: Optional[int] = None
+    bytes: int = 0
+    challenges: int = 0
+    error: Optional[str] = None
+
+    @property
+    def endpoint(self) -> str:
+        return endpoint_name(self.path)
+
+
+class Histogram:
+    """Cumulative-bucket histogram."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """(upper bound, observations at or below it) pairs, ending with +Inf."""
+        total = 0
+        for bound, count in zip(self.bounds + (math.inf,), self.counts):
+            total += count
+            yield bound, total
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms of the families in METRICS."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        """Add to a counter."""
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """Add an observation to a histogram."""
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(METRICS[name][2])
+            histogram.observe(value)
+
+    def record_request(self, event: RequestEvent) -> None:
+        """Client hook: account for one HTTP exchange."""
+        endpoint = event.endpoint
+        self.observe("eddi_request_duration_seconds", event.seconds, endpoint=endpoint)
+        if event.status_code is not None:
+            self.inc("eddi_responses", endpoint=endpoint, code=event.status_code)
+        if event.error is not None:
+            self.inc("eddi_request_errors", endpoint=endpoint, error=event.error)
+        if event.challenges:
+            self.inc("eddi_digest_challenges", event.challenges, endpoint=endpoint)
+        if event.bytes:
+            self.inc("eddi_response_bytes", event.bytes, endpoint=endpoint)
+
+    def reset(self) -> None:
+        """Drop every recorded value."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current values as plain data.
+
+        Returns:
+            ``{name: [{"labels": {...}, "value": n}]}`` for counters and
+            ``{name: [{"labels": {...}, "count": n, "sum": s, "buckets": {le: n}}]}``
+            for histograms
+        """
+        result: Dict[str, Any] = {}
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                result.setdefault(name, []).append({"labels": dict(labels), "value": value})
+            for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                result.setdefault(name, []).append({
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "buckets": {_format_number(bound): total for bound, total in histogram.cumulative()},
+                })
+        return result
+
+    def to_openmetrics(self) -> str:
+        """Render every family in the OpenMetrics text format."""
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, _) in METRICS.items():
+                if kind == "counter":
+                    samples = [(labels, value) for (n, labels), value in sorted(self._counters.items()) if n == name]
+                else:
+                    samples = [(labels, h) for (n, labels), h in sorted(self._histograms.items(), key=lambda i: i[0]) if n == name]
+                if not samples:
+                    continue
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"# HELP {name} {help_text}")
+                for labels, value in samples:
+                    if kind == "counter":
+                        lines.append(f"{name}_total{_format_labels(labels)} {_format_number(value)}")
+                        continue
+                    for bound, total in value.cumulative():
+                        le = (("le", _format_number(bound)),)
+                        lines.append(f"{name}_bucket{_format_labels(labels, le)} {total}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(value.sum)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {value.count}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Union[str, Path]) -> None:
+        """Write the OpenMetrics text to a file, replacing it atomically."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self.to_openmetrics())
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+# Registry used by clients and commands unless told otherwise
+REGISTRY = MetricsRegistry()
+
+
+class FileExporter:
+    """Rewrite a metrics file periodically, and once more when stopped."""
+
+    def __init__(self, path: Union[str, Path], registry: MetricsRegistry = REGISTRY, interval: float = 30.0):
+        self.path = Path(path)
+        self.registry = registry
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> "FileExporter":
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.registry.write(self.path)
+
+    def stop(self) -> None:
+        """Stop the periodic writes and write the final values."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.registry.write(self.path)
+
+
+def serve(port: int, host: str = "127.0.0.1", registry: MetricsRegistry = REGISTRY) -> "ThreadingHTTPServer":
+    """Serve ``/metrics`` from a background thread.
+
+    Args:
+        port: Port to listen on (0 picks a free one; see server_address)
+        host: Interface to bind; defaults to local connections only
+        registry: Registry to expose
+
+    Returns:
+        The running server; call shutdown() to stop it
+    """
+    # Imported here so that clients not serving metrics do not load http.server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.to_openmetrics().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,194 @@
+"""Typed models of eddi device status."""
+
+import json
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_loads(data: Union[bytes, bytearray, str]) -> Any:
+    """Decode JSON, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class EddiState(IntEnum):
+    """Known values of the eddi ``sta`` field."""
+
+    PAUSED = 1
+    DIVERTING = 3
+    BOOSTING = 4
+    MAX_TEMP_REACHED = 5
+    STOPPED = 6
+
+    @property
+    def label(self) -> str:
+        """Human readable name of the state."""
+        return _STATE_LABELS[self]
+
+
+_STATE_LABELS = {
+    EddiState.PAUSED: "Paused",
+    EddiState.DIVERTING: "Diverting",
+    EddiState.BOOSTING: "Boosting",
+    EddiState.MAX_TEMP_REACHED: "Max Temp Reached",
+    EddiState.STOPPED: "Stopped",
+}
+
+# Status code meanings
+STATUS_CODES = {int(state): label for state, label in _STATE_LABELS.items()}
+
+
+def status_text(sta: Optional[int]) -> str:
+    """Describe a ``sta`` value, including unknown ones."""
+    return STATUS_CODES.get(sta, f"Unknown ({sta})")
+
+
+# Mode each command puts the device in (see EddiClient.set_mode)
+COMMAND_MODES = {
+    "stop": "stop",
+    "start": "normal",
+}
+
+
+def in_mode(sta: Optional[int], mode: str) -> bool:
+    """Whether a ``sta`` value shows the device already in a mode.
+
+    Stop mode is only confirmed by sta=6. Normal mode is any known state
+    other than 6, since a started device waits in Paused (sta=1) until
+    there is surplus power.
+
+    Raises:
+        ValueError: If mode is not "stop" or "normal"
+    """
+    if mode == "stop":
+        return sta == EddiState.STOPPED
+    if mode == "normal":
+        return sta is not None and sta != EddiState.STOPPED
+    raise ValueError(f"Invalid mode: {mode}. Must be 'stop' or 'normal'")
+
+
+# EddiStatus field name -> API key
+FIELD_KEYS = {
+    "serial": "sno",
+    "sta": "sta",
+    "diversion": "div",
+    "grid": "grd",
+    "generation": "gen",
+    "temp1": "tp1",
+    "temp2": "tp2",
+    "heater1": "ht1",
+    "heater2": "ht2",
+    "energy_today": "che",
+}
+
+# API keys in EddiStatus field order
+_ALL_KEYS = tuple(FIELD_KEYS.values())
+
+
+@dataclass(frozen=True)
+class EddiStatus:
+    """Snapshot of one eddi device.
+
+    Fields missing from the API response are None. ``sta`` keeps the raw code so unknown states
+    survive; use :attr:`state` for the enum.
+    """
+
+    __slots__ = tuple(FIELD_KEYS)
+
+    serial: int
+    sta: Optional[int]
+    diversion: Optional[int]
+    grid: Optional[int]
+    generation: Optional[int]
+    temp1: Optional[float]
+    temp2: Optional[float]
+    heater1: Optional[str]
+    heater2: Optional[str]
+    energy_today: Optional[float]
+
+    # Frozen dataclasses with __slots__ cannot restore their fields through
+    # setattr, which pickle and copy use by default
+    def __getstate__(self) -> tuple:
+        return tuple(getattr(self, name) for name in FIELD_KEYS)
+
+    def __setstate__(self, state: tuple) -> None:
+        for name, value in zip(FIELD_KEYS, state):
+            object.__setattr__(self, name, value)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "EddiStatus":
+        """Build a status from one device entry of a jstatus payload.
+
+        Args:
+            data: Device entry using the API's short keys
+
+        Returns:
+            Parsed status
+        """
+        return cls(*map(data.get, _ALL_KEYS))
+
+    @property
+    def state(self) -> Optional[EddiState]:
+        """The ``sta`` code as an enum, or None if missing or unknown."""
+        try:
+            return EddiState(self.sta)
+        except ValueError:
+            return None
+
+    @property
+    def status_text(self) -> str:
+        """Human readable description of ``sta``."""
+        return status_text(self.sta)
+
+    @property
+    def is_stopped(self) -> bool:
+        """Whether the device is in stop mode (sta=6)."""
+        return self.sta == EddiState.STOPPED
+
+    def in_mode(self, mode: str) -> bool:
+        """Whether the device is already in a mode ("stop" or "normal")."""
+        return in_mode(self.sta, mode)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the fields as a dictionary keyed by field name."""
+        return {name: getattr(self, name) for name in FIELD_KEYS}
+
+
+def find_eddi_devices(status: Any) -> List[Dict[str, Any]]:
+    """Extract the eddi device list from a jstatus payload.
+
+    Args:
+        status: Decoded response of a cgi-jstatus request, either the list
+            returned by the wildcard query or the object returned by an
+            eddi-scoped query
+
+    Returns:
+        List of eddi device information
+    """
+    if isinstance(status, dict):
+        status = [status]
+    for item in status:
+        if isinstance(item, dict) and "eddi" in item:
+            return item["eddi"] or []
+    return []
+
+
+def parse_eddi_statuses(payload: Any) -> List[EddiStatus]:
+    """Parse the eddi devices of a jstatus payload.
+
+    Args:
+        payload: Raw response body (bytes or str) or an already decoded payload
+
+    Returns:
+        One status per eddi device
+    """
+    if isinstance(payload, (bytes, bytearray, str)):
+        payload = json_loads(payload)
+    return [EddiStatus(*map(device.get, _ALL_KEYS)) for device in find_eddi_devices(payload)]
@@ -0,0 +1,377 @@
+"""Append-only telemetry store of fixed-width binary samples.
+
+Samples are written per device to one segment file per UTC day::
+
+    <root>/<serial>/<YYYY-MM-DD>.seg
+
+Each segment is a 32-byte header followed by 20-byte little-endian
+records in timestamp order, so the segment name indexes days and a
+binary search over the timestamp column indexes samples within a day.
+Segments can be read with :mod:`struct` alone, or memory-mapped as a
+NumPy structured array (``pip install eddi-scheduler[analysis]``).
+"""
+
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from .cache import data_dir
+from .fleet import DEFAULT_MAX_WORKERS
+from .models import EddiStatus
+
+MAGIC = b"EDDITEL\x00"
+FORMAT_VERSION = 1
+
+# magic, version, record size, device serial, day start (epoch seconds), padding
+HEADER = struct.Struct("<8sHHII12x")
+
+# timestamp, diversion W, grid W, tank temps in 0.1 °C, sta, padding
+RECORD = struct.Struct("<IiihhB3x")
+
+# Stored in place of values missing from the API response
+MISSING_INT = -(2 ** 31)
+MISSING_TEMP = -(2 ** 15)
+MISSING_STA = 255
+
+# Seconds between samples when none is given
+DEFAULT_INTERVAL = 10.0
+
+SEGMENT_SUFFIX = ".seg"
+
+# Added to the name of a segment whose header cannot be trusted, so that it
+# is kept for inspection but no longer read or appended to
+CORRUPT_SUFFIX = ".corrupt"
+
+
+class Sample(NamedTuple):
+    """One recorded status of a device; missing values are None."""
+
+    ts: int
+    sta: Optional[int]
+    diversion: Optional[int]
+    grid: Optional[int]
+    temp1: Optional[float]
+    temp2: Optional[float]
+
+
+def record_dtype():
+    """NumPy dtype matching RECORD, for memory-mapping segments."""
+    np = require_numpy()
+    return np.dtype({
+        "names": ["ts", "diversion", "grid", "temp1", "temp2", "sta"],
+        "formats": ["<u4", "<i4", "<i4", "<i2", "<i2", "u1"],
+        "offsets": [0, 4, 8, 12, 14, 16],
+        "itemsize": RECORD.size,
+    })
+
+
+def require_numpy():
+    """Import NumPy on first use, so that recording and the CLI do not pay for it.
+
+    Returns:
+        The numpy module
+
+    Raises:
+        ImportError: If numpy is not installed
+    """
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("Telemetry analysis requires the 'numpy' package (eddi-scheduler[analysis])") from None
+    return numpy
+
+
+def _int(value, missing: int) -> int:
+    return missing if value is None else int(value)
+
+
+def _temp(value) -> int:
+    return MISSING_TEMP if value is None else int(round(float(value) * 10))
+
+
+def pack_sample(ts: float, status: EddiStatus) -> bytes:
+    """Encode a status snapshot taken at ``ts`` as one record."""
+    sta = status.sta if status.sta is not None and 0 <= status.sta < MISSING_STA else MISSING_STA
+    return RECORD.pack(
+        int(ts),
+        _int(status.diversion, MISSING_INT),
+        _int(status.grid, MISSING_INT),
+        _temp(status.temp1),
+        _temp(status.temp2),
+        sta,
+    )
+
+
+def unpack_sample(data: Tuple[int, int, int, int, int, int]) -> Sample:
+    """Decode an unpacked record tuple into a Sample."""
+    ts, div, grd, tp1, tp2, sta = data
+    return Sample(
+        ts,
+        None if sta == MISSING_STA else sta,
+        None if div == MISSING_INT else div,
+        None if grd == MISSING_INT else grd,
+        None if tp1 == MISSING_TEMP else tp1 / 10,
+        None if tp2 == MISSING_TEMP else tp2 / 10,
+    )
+
+
+def _day_start(ts: float) -> int:
+    return int(ts) - int(ts) % 86400
+
+
+def segment_name(ts: float) -> str:
+    """File name of the segment holding a timestamp."""
+    return datetime.fromtimestamp(_day_start(ts), timezone.utc).strftime("%Y-%m-%d") + SEGMENT_SUFFIX
+
+
+def read_header(path: Union[str, Path]) -> Tuple[int, int]:
+    """Return the (serial, day start) of a segment.
+
+    Raises:
+        ValueError: If the file is not a telemetry segment
+    """
+    with open(path, "rb") as f:
+        raw = f.read(HEADER.size)
+    if len(raw) < HEADER.size:
+        raise ValueError(f"Truncated segment header: {path}")
+    magic, version, record_size, serial, day = HEADER.unpack(raw)
+    if magic != MAGIC or version != FORMAT_VERSION or record_size != RECORD.size:
+        raise ValueError(f"Not a telemetry segment (or unsupported version): {path}")
+    return serial, day
+
+
+def _record_count(path: Path) -> int:
+    # A record cut short by a crash is ignored
+    return max(os.path.getsize(path) - HEADER.size, 0) // RECORD.size
+
+
+class SegmentWriter:
+    """Appends samples of one device to its daily segments."""
+
+    def __init__(self, root: Path, serial: Union[int, str], log: Callable[[str], None] = print):
+        self.directory = Path(root) / str(serial)
+        self.serial = int(serial)
+        self.log = log
+        self._name: Optional[str] = None
+        self._last_ts = -1
+
+    def _open(self, ts: float) -> Path:
+        name = segment_name(ts)
+        path = self.directory / name
+        if name != self._name:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._last_ts = -1
+            if path.exists() and os.path.getsize(path) >= HEADER.size and not self._is_own(path, ts):
+                self._quarantine(path)
+            if not path.exists() or os.path.getsize(path) < HEADER.size:
+                with open(path, "wb") as f:
+                    f.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.size, self.serial, _day_start(ts)))
+            else:
+                count = _record_count(path)
+                # Drop a partial record left by an interrupted write
+                os.truncate(path, HEADER.size + count * RECORD.size)
+                if count:
+                    with open(path, "rb") as f:
+                        f.seek(HEADER.size + (count - 1) * RECORD.size)
+                        self._last_ts = RECORD.unpack(f.read(RECORD.size))[0]
+            self._name = name
+        return path
+
+    def _is_own(self, path: Path, ts: float) -> bool:
+        """Whether a segment's header is valid and names this device and day."""
+        try:
+            return read_header(path) == (self.serial, _day_start(ts))
+        except ValueError:
+            return False
+
+    def _quarantine(self, path: Path) -> None:
+        """Move a segment with a bad header aside, so that a new one is started."""
+        target = path.with_name(path.name + CORRUPT_SUFFIX)
+        number = 1
+        while target.exists():
+            number += 1
+            target = path.with_name(f"{path.name}{CORRUPT_SUFFIX}{number}")
+        os.replace(path, target)
+        self.log(f"Segment {path} has an invalid header; moved it to {target.name} and started a new one")
+
+    def append(self, ts: float, status: EddiStatus) -> bool:
+        """Append a sample; returns False if it is not newer than the last one."""
+        path = self._open(ts)
+        if int(ts) <= self._last_ts:
+            return False
+        with open(path, "ab") as f:
+            f.write(pack_sample(ts, status))
+        self._last_ts = int(ts)
+        return True
+
+
+class TelemetryStore:
+    """Root directory of recorded telemetry for any number of devices."""
+
+    def __init__(self, root: Optional[Union[str, Path]] = None, log: Callable[[str], None] = print):
+        """Initialize the store.
+
+        Args:
+            root: Store directory (default: telemetry/ in the data directory)
+            log: Callable told about segments set aside for a bad header
+        """
+        self.root = Path(root) if root is not None else data_dir() / "telemetry"
+        self.log = log
+        self._writers: Dict[int, SegmentWriter] = {}
+        self._lock = threading.Lock()
+
+    def append(self, ts: float, statuses: Iterable[EddiStatus]) -> int:
+        """Record a snapshot of several devices taken at ``ts``.
+
+        Returns:
+            Number of samples written
+        """
+        written = 0
+        with self._lock:
+            for status in statuses:
+                serial = int(status.serial)
+                writer = self._writers.get(serial)
+                if writer is None:
+                    writer = self._writers[serial] = SegmentWriter(self.root, serial, self.log)
+                written += writer.append(ts, status)
+        return written
+
+    def devices(self) -> List[str]:
+        """Return the serials with recorded data."""
+        if not self.root.is_dir():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir() and p.name.isdigit())
+
+    def segments(self, serial: Union[int, str], start: Optional[float] = None,
+                 end: Optional[float] = None) -> List[Path]:
+        """Segment files of a device overlapping [start, end), oldest first."""
+        directory = self.root / str(serial)
+        if not directory.is_dir():
+            return []
+        first = segment_name(start) if start is not None else ""
+        last = segment_name(end - 1) if end is not None else "~"
+        return sorted(
+            p for p in directory.glob(f"*{SEGMENT_SUFFIX}")
+            if first <= p.name <= last
+        )
+
+    def samples(self, serial: Union[int, str], start: Optional[float] = None,
+                end: Optional[float] = None) -> Iterator[Sample]:
+        """Iterate over the samples of a device with start <= ts < end."""
+        for path in self.segments(serial, start, end):
+            read_header(path)
+            with open(path, "rb") as f:
+                f.seek(HEADER.size)
+                data = f.read(_record_count(path) * RECORD.size)
+            for values in RECORD.iter_unpack(data):
+                if (start is None or values[0] >= start) and (end is None or values[0] < end):
+                    yield unpack_sample(values)
+
+    def load(self, serial: Union[int, str], start: Optional[float] = None, end: Optional[float] = None):
+        """Load the samples of a device as a NumPy structured array.
+
+        Each segment is memory-mapped and the range is cut with a binary
+        search over its timestamps, so only the requested rows are copied.
+        Values use RECORD's encoding: temperatures in 0.1 °C and the
+        MISSING_* sentinels for missing values.
+
+        Raises:
+            ImportError: If numpy is not installed
+        """
+        np = require_numpy()
+        dtype = record_dtype()
+        parts = []
+        for path in self.segments(serial, start, end):
+            read_header(path)
+            count = _record_count(path)
+            if not count:
+                continue
+            rows = np.memmap(path, dtype=dtype, mode="r", offset=HEADER.size, shape=(count,))
+            low = np.searchsorted(rows["ts"], start, "left") if start is not None else 0
+            high = np.searchsorted(rows["ts"], end, "left") if end is not None else count
+            parts.append(np.array(rows[low:high]))
+        if not parts:
+            return np.empty(0, dtype=dtype)
+        return np.concatenate(parts)
+
+
+class Recorder:
+    """Polls hubs at a fixed interval and appends every eddi to a store."""
+
+    def __init__(
+        self,
+        clients,
+        store: TelemetryStore,
+        interval: float = DEFAULT_INTERVAL,
+        log: Callable[[str], None] = print,
+        clock: Callable[[], float] = time.time,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ):
+        """Initialize the recorder.
+
+        Args:
+            clients: EddiClient instance, or a list of them (one per hub,
+                e.g. from a fleet inventory) polled in parallel
+            store: Where samples are written
+            interval: Seconds between samples
+            log: Callable used to report errors
+            clock: Callable returning the current epoch time
+            max_workers: Maximum number of hubs polled at once
+        """
+        self.clients: Sequence = list(clients) if isinstance(clients, (list, tuple)) else [clients]
+        self.store = store
+        self.interval = interval
+        self.log = log
+        self.clock = clock
+        self.max_workers = max_workers
+        self.stop_event = threading.Event()
+
+    def _poll(self, client) -> List[EddiStatus]:
+        try:
+            return client.get_eddi_statuses()
+        except Exception as e:
+            prefix = f"[{client.serial_number}] " if len(self.clients) > 1 else ""
+            self.log(f"{prefix}Error polling status: {e}")
+            return []
+
+    def sample(self) -> int:
+        """Take and store one snapshot of every eddi on every hub.
+
+        Returns:
+            Number of samples written (0 if every poll failed)
+        """
+        ts = self.clock()
+        if len(self.clients) == 1:
+            statuses = self._poll(self.clients[0])
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(self.clients))) as executor:
+                statuses = [status for batch in executor.map(self._poll, self.clients) for status in batch]
+        try:
+            return self.store.append(ts, statuses)
+        except (OSError, ValueError) as e:
+            self.log(f"Error writing samples: {e}")
+            return 0
+
+    def run(self, count: Optional[int] = None) -> None:
+        """Sample until stop() is called, or ``count`` polls have been made.
+
+        Polls are aligned to multiples of the interval, so a slow request
+        does not shift every later sample.
+        """
+        polls = 0
+        while not self.stop_event.is_set() and (count is None or polls < count):
+            self.sample()
+            polls += 1
+            if count is not None and polls >= count:
+                break
+            now = self.clock()
+            self.stop_event.wait(self.interval - now % self.interval)
+
+    def stop(self) -> None:
+        """Ask the recorder to exit after the current poll."""
+        self.stop_event.set()
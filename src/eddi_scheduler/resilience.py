@@ -0,0 +1,285 @@
+"""Retry budget, jittered backoff and per-server circuit breakers.
+
+When a myenergi server is degraded, retrying every failure on a fixed
+delay makes every hub of a fleet hit it again at the same moment and
+keeps each run busy for its full timeout. Three mechanisms limit that:
+
+* :class:`Backoff` spreads retries out: the delay grows exponentially
+  and part of it is random, so clients stop retrying in lockstep.
+* :class:`RetryBudget` caps retries to a fraction of first attempts
+  over a sliding window, so an outage adds a bounded amount of extra
+  load however long the process has been running.
+* :class:`CircuitBreaker`, one per base URL, fails requests immediately
+  after repeated server failures, and lets a single probe through once
+  the reset timeout has passed to detect recovery.
+
+:data:`DEFAULT_RESILIENCE` is shared by every client of the process.
+"""
+
+import random
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
+
+import requests
+
+from .clock import SYSTEM_CLOCK, Clock
+
+# Consecutive failures that open a breaker
+FAILURE_THRESHOLD = 5
+
+# Seconds an open breaker waits before letting a probe through; doubled
+# after each failed probe up to MAX_RESET_TIMEOUT
+RESET_TIMEOUT = 30.0
+MAX_RESET_TIMEOUT = 300.0
+
+# Retries allowed per first attempt, and retries always allowed, within
+# each RETRY_WINDOW seconds
+RETRY_RATIO = 0.2
+MIN_RETRIES = 10
+RETRY_WINDOW = 60.0
+
+# HTTP status codes meaning the server, not the request, failed
+SERVER_FAILURE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitOpenError(requests.RequestException):
+    """A request was refused locally because the server's breaker is open."""
+
+    def __init__(self, base_url: str, retry_after: float):
+        super().__init__(f"Circuit open for {base_url}, retry in {retry_after:.0f}s")
+        self.base_url = base_url
+        self.retry_after = retry_after
+
+
+@dataclass
+class Backoff:
+    """Exponential delays with jitter.
+
+    The n-th retry waits ``base * factor ** (n - 1)``, capped at ``cap``,
+    minus a random part of up to ``jitter`` of it.
+    """
+
+    base: float
+    factor: float = 2.0
+    cap: float = 300.0
+    jitter: float = 0.5
+    seed: Optional[int] = None
+    _random: random.Random = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if not 0 <= self.jitter <= 1:
+            raise ValueError("jitter must be between 0 and 1")
+        self._random = random.Random(self.seed)
+
+    def delay(self, retry: int) -> float:
+        """Seconds to wait before the given retry (1 for the first)."""
+        delay = min(self.cap, self.base * self.factor ** max(0, retry - 1))
+        return delay * (1 - self.jitter * self._random.random())
+
+
+class RetryBudget:
+    """Limits retries to a fraction of recent first attempts.
+
+    Over the last ``window`` seconds, ``minimum`` retries plus ``ratio``
+    per first attempt are allowed. Attempts and retries older than the
+    window no longer count, so a long healthy stretch in a daemon cannot
+    bank retries for a later outage, and the allowance refills after one.
+    """
+
+    def __init__(
+        self,
+        ratio: float = RETRY_RATIO,
+        minimum: float = MIN_RETRIES,
+        window: float = RETRY_WINDOW,
+        clock: Clock = SYSTEM_CLOCK,
+    ):
+        self.ratio = ratio
+        self.minimum = minimum
+        self.window = window
+        self.clock = clock
+        # [second, first attempts, retries] per second of the window
+        self._buckets: Deque[List[int]] = deque()
+        self._lock = threading.Lock()
+
+    def _bucket(self) -> List[int]:
+        now = int(self.clock.monotonic())
+        while self._buckets and self._buckets[0][0] <= now - self.window:
+            self._buckets.popleft()
+        if not self._buckets or self._buckets[-1][0] != now:
+            self._buckets.append([now, 0, 0])
+        return self._buckets[-1]
+
+    @property
+    def tokens(self) -> float:
+        """Retries currently allowed."""
+        with self._lock:
+            self._bucket()
+            attempts = sum(bucket[1] for bucket in self._buckets)
+            retries = sum(bucket[2] for bucket in self._buckets)
+        return self.minimum + self.ratio * attempts - retries
+
+    def record_attempt(self, count: int = 1) -> None:
+        """Account for first attempts."""
+        with self._lock:
+            self._bucket()[1] += count
+
+    def try_spend(self, count: int = 1) -> bool:
+        """Take retries if the budget allows all of them."""
+        with self._lock:
+            bucket = self._bucket()
+            attempts = sum(b[1] for b in self._buckets)
+            retries = sum(b[2] for b in self._buckets)
+            if self.minimum + self.ratio * attempts - retries < count:
+                return False
+            bucket[2] += count
+            return True
+
+    def reset(self) -> None:
+        """Forget every attempt and retry, as at the start of a run."""
+        with self._lock:
+            self._buckets.clear()
+
+
+class CircuitBreaker:
+    """Fails fast after repeated failures of one server.
+
+    Closed: requests pass and consecutive failures are counted. After
+    ``failure_threshold`` of them the breaker opens and requests fail
+    immediately. After ``reset_timeout`` seconds it is half-open: one
+    request is let through as a probe. Success closes the breaker; failure
+    opens it again for twice as long, up to ``max_reset_timeout``.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+        max_reset_timeout: float = MAX_RESET_TIMEOUT,
+        clock: Clock = SYSTEM_CLOCK,
+    ):
+        self.base_url = base_url
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.open_for = reset_timeout
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_request(self) -> None:
+        """Allow a request or raise CircuitOpenError."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            wait = self.opened_at + self.open_for - self.clock.monotonic()
+            if self.state == OPEN and wait <= 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            raise CircuitOpenError(self.base_url, max(0.0, wait))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.open_for = self.reset_timeout
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self.open_for = min(self.open_for * 2, self.max_reset_timeout)
+                self._open()
+            elif self.state == CLOSED and self.failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = self.clock.monotonic()
+        self._probing = False
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets a probe through (0 when closed)."""
+        with self._lock:
+            if self.state == CLOSED:
+                return 0.0
+            return max(0.0, self.opened_at + self.open_for - self.clock.monotonic())
+
+
+def is_server_failure(response: Optional[requests.Response] = None, error: Optional[BaseException] = None) -> bool:
+    """Whether an outcome counts against the server's breaker.
+
+    Connection problems, timeouts and 5xx/429 responses do; client errors
+    such as a wrong API key do not.
+    """
+    if error is not None:
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+    return response is not None and response.status_code in SERVER_FAILURE_STATUS_CODES
+
+
+class Resilience:
+    """Breakers per base URL plus the retry policy of client requests."""
+
+    def __init__(
+        self,
+        budget: Optional[RetryBudget] = None,
+        request_retries: int = 1,
+        request_backoff: Optional[Backoff] = None,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+        clock: Clock = SYSTEM_CLOCK,
+    ):
+        """Initialize the resilience settings.
+
+        Args:
+            budget: Retry budget shared by requests and commands
+                (default: RUN_BUDGET)
+            request_retries: Retries of a request that failed on the server side
+            request_backoff: Delays between request retries
+            failure_threshold: Consecutive failures that open a breaker
+            reset_timeout: Seconds before an open breaker is probed
+            clock: Clock to read time from and sleep on
+        """
+        self.budget = budget if budget is not None else RUN_BUDGET
+        self.request_retries = request_retries
+        self.request_backoff = request_backoff or Backoff(base=1.0, cap=10.0)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, base_url: str) -> CircuitBreaker:
+        """The breaker of a server, created on first use."""
+        with self._lock:
+            breaker = self._breakers.get(base_url)
+            if breaker is None:
+                breaker = self._breakers[base_url] = CircuitBreaker(
+                    base_url, self.failure_threshold, self.reset_timeout, clock=self.clock
+                )
+            return breaker
+
+    def reset(self) -> None:
+        """Forget the state of every server."""
+        with self._lock:
+            self._breakers.clear()
+
+
+# Retry budget of this run, shared by client requests and command retries;
+# the CLI resets it at the start of each command
+RUN_BUDGET = RetryBudget()
+
+# Resilience settings used by clients unless told otherwise
+DEFAULT_RESILIENCE = Resilience()
@@ -0,0 +1,359 @@
+"""Weekly start/stop schedule with explicit DST handling.
+
+Rules are compiled into a sorted index of exact transition instants, so
+looking up the next transition or the desired state at any moment is a
+binary search rather than a re-evaluation of every rule.
+"""
+
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from functools import lru_cache
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Union
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    from backports.zoneinfo import ZoneInfo
+
+from .config import load_document
+from .models import COMMAND_MODES
+
+DEFAULT_TIMEZONE = "Pacific/Auckland"
+
+SCHEDULE_ACTIONS = ("start", "stop")
+
+# Device mode each action leaves the eddi in (see EddiClient.set_mode)
+ACTION_MODES = COMMAND_MODES
+
+WEEKDAY_NAMES = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+# Pseudo-weekday for dates listed as holidays
+HOLIDAY = 7
+
+DAY_ALIASES = {
+    "daily": frozenset(range(7)),
+    "weekdays": frozenset(range(5)),
+    "weekends": frozenset({5, 6}),
+    "holidays": frozenset({HOLIDAY}),
+}
+
+# Weeks of transitions compiled into an index at a time
+DEFAULT_INDEX_WEEKS = 8
+
+
+@dataclass(frozen=True)
+class Rule:
+    """Run an action at a local wall-clock time on some weekdays.
+
+    ``days`` holds 0 (Monday) to 6 (Sunday), plus HOLIDAY for dates listed
+    as holidays. On a holiday only rules including HOLIDAY apply.
+    """
+
+    days: FrozenSet[int]
+    at: dt_time
+    action: str
+
+    def __post_init__(self):
+        if self.action not in SCHEDULE_ACTIONS:
+            raise ValueError(f"Invalid action: {self.action}. Must be 'start' or 'stop'")
+        if not self.days or not all(0 <= day <= HOLIDAY for day in self.days):
+            raise ValueError(f"Invalid days: {sorted(self.days)}. Use 0 (Monday) to 6 (Sunday)")
+
+
+@dataclass(frozen=True)
+class Transition:
+    """A scheduled action at an exact instant (timezone-aware, UTC)."""
+
+    when: datetime
+    action: str
+
+
+def localize(day: date, at: dt_time, tz: ZoneInfo) -> datetime:
+    """Resolve a local wall-clock time to an exact instant.
+
+    DST is handled explicitly rather than left to arithmetic:
+
+    * a time skipped by a spring-forward gap runs at the first valid
+      instant after the gap (e.g. 02:30 becomes 03:00);
+    * a time repeated by a fall-back overlap runs once, at its first
+      occurrence.
+
+    Args:
+        day: Local calendar date
+        at: Local wall-clock time
+        tz: Time zone of the schedule
+
+    Returns:
+        Aware datetime in UTC
+    """
+    local = datetime.combine(day, at).replace(tzinfo=tz, fold=0)
+    as_utc = local.astimezone(timezone.utc)
+    if as_utc.astimezone(tz).replace(tzinfo=None) == local.replace(tzinfo=None):
+        return as_utc
+
+    # Non-existent local time. fold=0 maps it with the pre-gap offset (an
+    # instant after the gap) and fold=1 with the post-gap offset (an instant
+    # before it); the clocks jumped somewhere in between.
+    before = int(local.replace(fold=1).astimezone(timezone.utc).timestamp())
+    after = int(as_utc.timestamp())
+    after_offset = as_utc.astimezone(tz).utcoffset()
+    while after - before > 1:
+        middle = (before + after) // 2
+        if datetime.fromtimestamp(middle, tz).utcoffset() == after_offset:
+            after = middle
+        else:
+            before = middle
+    return datetime.fromtimestamp(after, timezone.utc)
+
+
+class TransitionIndex:
+    """Sorted transitions of a schedule over a fixed time range.
+
+    Lookups are binary searches over precomputed UTC timestamps.
+    """
+
+    def __init__(self, transitions: Sequence[Transition], start: datetime, end: datetime,
+                 initial: Optional[Transition] = None):
+        """Initialize the index.
+
+        Args:
+            transitions: Transitions with start <= when < end, in time order
+            start: Start of the covered range
+            end: End of the covered range (exclusive)
+            initial: Last transition before start, if any
+        """
+        self.transitions = list(transitions)
+        self.timestamps = [t.when.timestamp() for t in self.transitions]
+        self.start = start
+        self.end = end
+        self.initial = initial
+
+    def covers(self, when: datetime) -> bool:
+        """Whether an instant falls inside the indexed range."""
+        return self.start <= when < self.end
+
+    def next_after(self, when: datetime) -> Optional[Transition]:
+        """First transition strictly after an instant, if indexed."""
+        position = bisect_right(self.timestamps, when.timestamp())
+        return self.transitions[position] if position < len(self.transitions) else None
+
+    def last_at_or_before(self, when: datetime) -> Optional[Transition]:
+        """Last transition at or before an instant."""
+        position = bisect_right(self.timestamps, when.timestamp())
+        return self.transitions[position - 1] if position > 0 else self.initial
+
+    def between(self, start: datetime, end: datetime) -> List[Transition]:
+        """Transitions with start <= when < end."""
+        low = bisect_left(self.timestamps, start.timestamp())
+        high = bisect_left(self.timestamps, end.timestamp())
+        return self.transitions[low:high]
+
+
+class Schedule:
+    """A set of weekly rules in one time zone."""
+
+    def __init__(
+        self,
+        rules: Sequence[Rule],
+        tz: str = DEFAULT_TIMEZONE,
+        holidays: Iterable[date] = (),
+        index_weeks: int = DEFAULT_INDEX_WEEKS
+    ):
+        """Initialize the schedule.
+
+        Args:
+            rules: Weekly rules
+            tz: IANA time zone name the rule times are in
+            holidays: Local dates on which only holiday rules apply
+            index_weeks: Weeks of transitions compiled per index
+        """
+        self.rules = list(rules)
+        self.timezone = tz
+        self.tz = ZoneInfo(tz)
+        self.holidays = frozenset(holidays)
+        self.index_weeks = index_weeks
+        self._index: Optional[TransitionIndex] = None
+
+    def _day_key(self, day: date) -> int:
+        return HOLIDAY if day in self.holidays else day.weekday()
+
+    def transitions_between(self, start: datetime, end: datetime) -> Iterator[Transition]:
+        """Evaluate the rules for transitions with start <= when < end.
+
+        Args:
+            start: Aware start instant
+            end: Aware end instant
+
+        Returns:
+            Iterator over the transitions in time order
+        """
+        first_day = start.astimezone(self.tz).date() - timedelta(days=1)
+        last_day = end.astimezone(self.tz).date() + timedelta(days=1)
+        transitions: List[Transition] = []
+        day = first_day
+        while day <= last_day:
+            key = self._day_key(day)
+            for rule in self.rules:
+                if key in rule.days:
+                    when = localize(day, rule.at, self.tz)
+                    if start <= when < end:
+                        transitions.append(Transition(when, rule.action))
+            day += timedelta(days=1)
+        transitions.sort(key=lambda t: t.when)
+        return iter(transitions)
+
+    def compile(self, start: datetime, weeks: Optional[int] = None) -> TransitionIndex:
+        """Precompute the transitions of the next weeks into an index.
+
+        Args:
+            start: Aware start instant
+            weeks: Weeks to cover (default: index_weeks)
+
+        Returns:
+            Index covering [start, start + weeks)
+        """
+        end = start + timedelta(weeks=weeks or self.index_weeks)
+        # The state at start is set by the last transition before it, which
+        # may be up to a week earlier, or longer across holidays.
+        lookback = list(self.transitions_between(start - timedelta(weeks=2), start))
+        initial = lookback[-1] if lookback else None
+        return TransitionIndex(list(self.transitions_between(start, end)), start, end, initial)
+
+    def index_for(self, when: datetime) -> TransitionIndex:
+        """Return a cached index covering an instant, compiling one if needed.
+
+        A new index starts a day before the instant so nearby lookups in
+        both directions stay inside it.
+        """
+        index = self._index
+        if index is None or not index.covers(when) or index.end - when < timedelta(days=8):
+            index = self.compile(when - timedelta(days=1))
+            self._index = index
+        return index
+
+    def next_transition(self, after: datetime) -> Optional[Transition]:
+        """Return the first transition strictly after an instant."""
+        return self.index_for(after).next_after(after)
+
+    def previous_transition(self, at_or_before: datetime) -> Optional[Transition]:
+        """Return the last transition at or before an instant."""
+        return self.index_for(at_or_before).last_at_or_before(at_or_before)
+
+    def desired_mode_at(self, when: datetime) -> Optional[str]:
+        """Return the mode the schedule wants at an instant.
+
+        Args:
+            when: Aware instant
+
+        Returns:
+            "normal" or "stop" (see EddiClient.set_mode), or None if no
+            transition precedes the instant
+        """
+        transition = self.previous_transition(when)
+        return ACTION_MODES[transition.action] if transition else None
+
+
+def parse_days(value: Union[str, Sequence[str]]) -> FrozenSet[int]:
+    """Parse day names ("mon".."sun", "weekdays", "weekends", "daily", "holidays").
+
+    Raises:
+        ValueError: If a name is unknown
+    """
+    names = [value] if isinstance(value, str) else list(value)
+    days = set()
+    for name in names:
+        key = str(name).strip().lower()
+        if key in DAY_ALIASES:
+            days |= DAY_ALIASES[key]
+        elif key[:3] in WEEKDAY_NAMES:
+            days.add(WEEKDAY_NAMES.index(key[:3]))
+        else:
+            raise ValueError(f"Unknown day: {name}")
+    return frozenset(days)
+
+
+def parse_time(value: Any) -> dt_time:
+    """Parse a "HH:MM" string (or a TOML/YAML time) into a time.
+
+    Raises:
+        ValueError: If the value is not a valid time
+    """
+    if isinstance(value, dt_time):
+        return value
+    if isinstance(value, int):
+        # YAML 1.1 reads unquoted 11:00 as a sexagesimal number of minutes
+        return dt_time(value // 60, value % 60)
+    try:
+        return dt_time.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError(f"Invalid time: {value}. Use HH:MM") from None
+
+
+def _parse_rules(entries: Sequence[Dict[str, Any]], source: str) -> List[Rule]:
+    rules = []
+    for number, entry in enumerate(entries, start=1):
+        try:
+            rules.append(Rule(parse_days(entry["days"]), parse_time(entry["time"]), entry["action"]))
+        except KeyError as e:
+            raise ValueError(f"Rule #{number} in {source} is missing {e}") from None
+        except ValueError as e:
+            raise ValueError(f"Rule #{number} in {source}: {e}") from None
+    return rules
+
+
+def load_schedule(path: Union[str, Path], device: Optional[str] = None) -> Schedule:
+    """Load a schedule from a TOML or YAML file.
+
+    Example::
+
+        timezone = "Pacific/Auckland"
+        holidays = ["2026-12-25"]
+
+        [[rule]]
+        days = "weekdays"
+        time = "11:00"
+        action = "start"
+
+        [devices.10088888]        # optional per-device override
+        timezone = "..."          # any top-level key can be overridden
+        [[devices.10088888.rule]]
+        days = ["sat", "sun"]
+        time = "09:00"
+        action = "start"
+
+    Args:
+        path: Schedule file
+        device: Eddi serial whose overrides to apply, if any
+
+    Returns:
+        The schedule for the device
+
+    Raises:
+        ValueError: If the file is invalid
+    """
+    document = load_document(path)
+    overrides = (document.get("devices") or {}).get(str(device), {}) if device else {}
+    settings = {**document, **overrides}
+
+    rules = _parse_rules(settings.get("rule", []), str(path))
+    if not rules:
+        raise ValueError(f"No rules in {path}")
+
+    holidays = []
+    for value in settings.get("holidays", []):
+        holidays.append(value if isinstance(value, date) else date.fromisoformat(str(value)))
+
+    return Schedule(rules, settings.get("timezone", DEFAULT_TIMEZONE), holidays)
+
+
+# Schedule run by the GitHub Actions workflow, shipped as package data and
+# used when no schedule file is given
+DEFAULT_SCHEDULE_PATH = Path(__file__).with_name("schedule.toml")
+
+
+@lru_cache(maxsize=None)
+def default_schedule(device: Optional[str] = None) -> Schedule:
+    """Load the bundled schedule (see DEFAULT_SCHEDULE_PATH) for a device."""
+    return load_schedule(DEFAULT_SCHEDULE_PATH, device)
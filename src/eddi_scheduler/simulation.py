@@ -0,0 +1,459 @@
+"""Replay device behaviour against the retry/verification policy in virtual time.
+
+A :class:`Scenario` describes how a device responds to each command sent
+to it: the states it steps through and when, or that the command was
+lost. :func:`simulate` runs the real :func:`execute_command_with_retry`
+against a simulated client on a :class:`VirtualClock`, so a run that
+takes minutes on a real hub finishes in microseconds. :func:`sweep`
+evaluates a grid of polling and retry parameters over many scenarios
+in a process pool and reports success rate against time to verify.
+"""
+
+import functools
+import itertools
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .clock import VirtualClock
+from .control import (
+    MAX_RETRIES,
+    RETRY_DELAY,
+    START_INITIAL_WAIT,
+    START_MAX_ATTEMPTS,
+    START_WAIT_BETWEEN,
+    STOP_INITIAL_WAIT,
+    STOP_MAX_ATTEMPTS,
+    STOP_WAIT_BETWEEN,
+    AdaptivePoll,
+    FixedPoll,
+    PollStrategy,
+    adaptive_poll,
+    execute_command_with_retry,
+)
+from .latency import percentile
+from .models import COMMAND_MODES, EddiState, EddiStatus
+from .resilience import Backoff
+
+# Serial number of the simulated device
+SIM_SERIAL = "1"
+
+# State a device is in before the command it is simulated for
+INITIAL_STA = {
+    "stop": int(EddiState.DIVERTING),
+    "start": int(EddiState.STOPPED),
+}
+
+# Parameter values swept by default, around the adaptive polling currently
+# used (STOP_POLL and START_POLL)
+DEFAULT_GRIDS = {
+    "stop": {
+        "first_probe": (5, 10, 20),
+        "min_interval": (3, 5, 10),
+        "max_interval": (15, 30, 60),
+        "timeout": (180,),
+        "max_retries": (MAX_RETRIES,),
+        "retry_delay": (RETRY_DELAY,),
+    },
+    "start": {
+        "first_probe": (5, 10, 20),
+        "min_interval": (3, 5),
+        "max_interval": (10, 15, 30),
+        "timeout": (100,),
+        "max_retries": (MAX_RETRIES,),
+        "retry_delay": (RETRY_DELAY,),
+    },
+}
+
+# Parameter values swept for the legacy fixed schedules
+FIXED_GRIDS = {
+    "stop": {
+        "initial_wait": (10, 30, 60),
+        "interval": (5, 10, 15),
+        "max_attempts": (5, 10, 15),
+        "max_retries": (MAX_RETRIES,),
+        "retry_delay": (RETRY_DELAY,),
+    },
+    "start": {
+        "initial_wait": (10, 30, 50),
+        "interval": (5, 10),
+        "max_attempts": (3, 5, 8),
+        "max_retries": (MAX_RETRIES,),
+        "retry_delay": (RETRY_DELAY,),
+    },
+}
+
+# A trace is (seconds after the command, sta) steps; None means the command was lost
+Trace = Optional[Tuple[Tuple[float, int], ...]]
+
+
+@dataclass
+class Scenario:
+    """How a device responds to the commands of one run.
+
+    ``attempts[i]`` is the response to the i-th command sent; commands
+    beyond the list get the last entry. Each status probe fails with
+    probability ``error_rate``.
+    """
+
+    command: str
+    attempts: List[Trace]
+    initial_sta: Optional[int] = None
+    error_rate: float = 0.0
+    seed: int = 0
+
+    def __post_init__(self):
+        if self.command not in COMMAND_MODES:
+            raise ValueError(f"Invalid command: {self.command}. Must be 'stop' or 'start'")
+        if not self.attempts:
+            raise ValueError("A scenario needs at least one attempt")
+        if self.initial_sta is None:
+            self.initial_sta = INITIAL_STA[self.command]
+
+
+@dataclass(frozen=True)
+class Policy:
+    """Polling and retry parameters of execute_command_with_retry.
+
+    With ``first_probe`` set, verification polls like the default
+    AdaptivePoll(first_probe, min_interval, max_interval, timeout,
+    poll_backoff); otherwise it uses FixedPoll(initial_wait, interval,
+    max_attempts). Retries back off from ``retry_delay`` by
+    ``backoff_factor``, shortened by up to ``jitter`` of the delay at
+    random (see Backoff).
+    """
+
+    initial_wait: Optional[float] = None
+    interval: Optional[float] = None
+    max_attempts: Optional[int] = None
+    max_retries: int = MAX_RETRIES
+    retry_delay: float = RETRY_DELAY
+    backoff_factor: float = 2.0
+    jitter: float = 0.5
+    first_probe: Optional[float] = None
+    min_interval: Optional[float] = None
+    max_interval: Optional[float] = None
+    timeout: Optional[float] = None
+    poll_backoff: float = 1.5
+
+    def __post_init__(self):
+        if self.adaptive:
+            needed = ("min_interval", "max_interval", "timeout")
+        else:
+            needed = ("initial_wait", "interval", "max_attempts")
+        missing = [name for name in needed if getattr(self, name) is None]
+        if missing:
+            raise ValueError(f"Policy is missing {', '.join(missing)}")
+
+    @property
+    def adaptive(self) -> bool:
+        return self.first_probe is not None
+
+    @classmethod
+    def default(cls, command: str) -> "Policy":
+        """The adaptive polling currently used for a command (see adaptive_poll)."""
+        poll = adaptive_poll(command)
+        return cls(
+            first_probe=poll.first_probe, min_interval=poll.min_interval, max_interval=poll.max_interval,
+            timeout=poll.timeout, poll_backoff=poll.backoff,
+        )
+
+    @classmethod
+    def fixed(cls, command: str) -> "Policy":
+        """The legacy fixed schedule of a command (see fixed_poll)."""
+        if command == "stop":
+            return cls(STOP_INITIAL_WAIT, STOP_WAIT_BETWEEN, STOP_MAX_ATTEMPTS)
+        return cls(START_INITIAL_WAIT, START_WAIT_BETWEEN, START_MAX_ATTEMPTS)
+
+    def poll(self, command: str) -> PollStrategy:
+        if self.adaptive:
+            return AdaptivePoll(self.first_probe, self.min_interval, self.max_interval, self.timeout, self.poll_backoff)
+        return FixedPoll(self.initial_wait, self.interval, self.max_attempts)
+
+    def backoff(self, seed: int) -> Backoff:
+        return Backoff(self.retry_delay, self.backoff_factor, jitter=self.jitter, seed=seed)
+
+
+# Policy fields used by only one polling strategy
+_FIXED_FIELDS = ("initial_wait", "interval", "max_attempts")
+_ADAPTIVE_FIELDS = ("first_probe", "min_interval", "max_interval", "timeout", "poll_backoff")
+
+
+@dataclass
+class Outcome:
+    """Result of one simulated run."""
+
+    ok: bool
+    seconds: float
+    probes: int
+    commands: int
+
+
+@dataclass
+class SweepResult:
+    """Aggregate outcome of one policy over all scenarios."""
+
+    policy: Policy
+    scenarios: int
+    success_rate: float
+    median_seconds: Optional[float]
+    p90_seconds: Optional[float]
+    mean_probes: float
+    mean_commands: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Flat dict of the policy parameters and results.
+
+        Only the polling parameters of the policy's strategy are included.
+        """
+        unused = _FIXED_FIELDS if self.policy.adaptive else _ADAPTIVE_FIELDS
+        row = {"polling": "adaptive" if self.policy.adaptive else "fixed"}
+        row.update((key, value) for key, value in asdict(self.policy).items() if key not in unused)
+        row.update(
+            scenarios=self.scenarios,
+            success_rate=round(self.success_rate, 4),
+            median_seconds=None if self.median_seconds is None else round(self.median_seconds, 1),
+            p90_seconds=None if self.p90_seconds is None else round(self.p90_seconds, 1),
+            mean_probes=round(self.mean_probes, 2),
+            mean_commands=round(self.mean_commands, 2),
+        )
+        return row
+
+
+@functools.lru_cache(maxsize=None)
+def _status(serial: str, sta: Optional[int]) -> EddiStatus:
+    # Statuses are never modified by callers, so one object per state is shared
+    return EddiStatus.from_dict({"sno": int(serial), "sta": sta, "div": 0})
+
+
+class SimulatedClient:
+    """Stands in for EddiClient, replaying a scenario on a virtual clock."""
+
+    def __init__(self, scenario: Scenario, clock: VirtualClock, serial: str = SIM_SERIAL):
+        self.scenario = scenario
+        self.clock = clock
+        self.serial = serial
+        self.sta = scenario.initial_sta
+        self.random = random.Random(scenario.seed)
+        self.commands = 0
+        self.probes = 0
+        self._steps: List[Tuple[float, int]] = []
+
+    def _advance(self) -> None:
+        now = self.clock.monotonic()
+        while self._steps and self._steps[0][0] <= now:
+            self.sta = self._steps.pop(0)[1]
+
+    def _command(self, eddi_serial: str) -> Dict[str, Any]:
+        attempts = self.scenario.attempts
+        trace = attempts[min(self.commands, len(attempts) - 1)]
+        self.commands += 1
+        if trace is not None:
+            self._advance()
+            sent = self.clock.monotonic()
+            self._steps = sorted((sent + offset, sta) for offset, sta in trace)
+        return {"status": 0, "statustext": ""}
+
+    def stop(self, eddi_serial: str) -> Dict[str, Any]:
+        return self._command(eddi_serial)
+
+    def start(self, eddi_serial: str) -> Dict[str, Any]:
+        return self._command(eddi_serial)
+
+    def get_eddi_statuses(self, eddi_serial: Optional[str] = None) -> List[EddiStatus]:
+        self.probes += 1
+        if self.scenario.error_rate and self.random.random() < self.scenario.error_rate:
+            raise ConnectionError("Simulated request failure")
+        self._advance()
+        return [_status(self.serial, self.sta)]
+
+
+def _quiet(message: str) -> None:
+    pass
+
+
+def simulate(scenario: Scenario, policy: Policy) -> Outcome:
+    """Run one scenario through execute_command_with_retry in virtual time."""
+    clock = VirtualClock()
+    client = SimulatedClient(scenario, clock)
+    ok = execute_command_with_retry(
+        scenario.command, client, SIM_SERIAL, policy.max_retries, log=_quiet,
+        poll=policy.poll, backoff=policy.backoff(scenario.seed), clock=clock, metrics=None, budget=None,
+    )
+    return Outcome(ok, clock.monotonic(), client.probes, client.commands)
+
+
+def evaluate(policy: Policy, scenarios: Sequence[Scenario]) -> SweepResult:
+    """Run every scenario under one policy and summarize the outcomes.
+
+    Times are seconds from the first command until the target state was
+    seen, over successful runs only.
+    """
+    outcomes = [simulate(scenario, policy) for scenario in scenarios]
+    times = [o.seconds for o in outcomes if o.ok]
+    count = len(outcomes) or 1
+    return SweepResult(
+        policy=policy,
+        scenarios=len(outcomes),
+        success_rate=len(times) / count,
+        median_seconds=percentile(times, 50) if times else None,
+        p90_seconds=percentile(times, 90) if times else None,
+        mean_probes=sum(o.probes for o in outcomes) / count,
+        mean_commands=sum(o.commands for o in outcomes) / count,
+    )
+
+
+def policy_grid(**values: Iterable[Any]) -> List[Policy]:
+    """Every combination of the given Policy parameter values."""
+    names = list(values)
+    return [Policy(**dict(zip(names, combo))) for combo in itertools.product(*(values[n] for n in names))]
+
+
+_worker_scenarios: Sequence[Scenario] = ()
+
+
+def _init_worker(scenarios: Sequence[Scenario]) -> None:
+    global _worker_scenarios
+    _worker_scenarios = scenarios
+
+
+def _evaluate_in_worker(policy: Policy) -> SweepResult:
+    return evaluate(policy, _worker_scenarios)
+
+
+def sweep(scenarios: Sequence[Scenario], policies: Sequence[Policy], processes: Optional[int] = None) -> List[SweepResult]:
+    """Evaluate policies over the same scenarios, in parallel.
+
+    Scenarios are sent to each worker process once; policies are then
+    distributed across the pool.
+
+    Args:
+        scenarios: Scenarios every policy is evaluated on
+        policies: Parameter sets to compare
+        processes: Worker processes (default: CPU count; 1 runs in-process)
+
+    Returns:
+        One result per policy, in the order given
+    """
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(policies) == 1:
+        return [evaluate(policy, scenarios) for policy in policies]
+    chunksize = max(1, len(policies) // (processes * 4))
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(list(scenarios),)) as executor:
+        return list(executor.map(_evaluate_in_worker, policies, chunksize=chunksize))
+
+
+def rank(results: Iterable[SweepResult]) -> List[SweepResult]:
+    """Order results by success rate, then by median and p90 time to verify."""
+    return sorted(
+        results,
+        key=lambda r: (-r.success_rate, r.median_seconds or math.inf, r.p90_seconds or math.inf, r.mean_probes),
+    )
+
+
+def _lognormal(rng: random.Random, median: float, sigma: float) -> float:
+    return rng.lognormvariate(math.log(median), sigma)
+
+
+def synthetic_scenarios(
+    command: str,
+    count: int,
+    seed: int = 0,
+    lost_rate: float = 0.05,
+    error_rate: float = 0.02,
+    median: Optional[float] = None,
+    sigma: float = 0.35,
+    attempts: int = 4,
+) -> List[Scenario]:
+    """Generate scenarios with field-like timing.
+
+    Stop goes 3 -> 1 within seconds and reaches 6 after a log-normal delay
+    (median 150s); start leaves 6 after a log-normal delay (median 45s)
+    and reaches 3 shortly after. Each command is independently lost with
+    probability ``lost_rate``.
+
+    Args:
+        command: "stop" or "start"
+        count: Number of scenarios
+        seed: Random seed; the same seed gives the same scenarios
+        lost_rate: Probability that a command has no effect
+        error_rate: Probability that a status probe fails
+        median: Median seconds to the target state (default: 150 for
+            stop, 45 for start)
+        sigma: Log-normal shape; larger values give a longer tail
+        attempts: Number of commands described per scenario
+
+    Returns:
+        Generated scenarios
+    """
+    if median is None:
+        median = 150.0 if command == "stop" else 45.0
+    rng = random.Random(seed)
+    scenarios = []
+    for index in range(count):
+        traces: List[Trace] = []
+        for _ in range(attempts):
+            if rng.random() < lost_rate:
+                traces.append(None)
+                continue
+            target = _lognormal(rng, median, sigma)
+            if command == "stop":
+                paused = min(rng.uniform(3, 20), target / 2)
+                traces.append(((paused, int(EddiState.PAUSED)), (target, int(EddiState.STOPPED))))
+            else:
+                traces.append(((target, int(EddiState.PAUSED)), (target + rng.uniform(10, 60), int(EddiState.DIVERTING))))
+        scenarios.append(Scenario(command, traces, error_rate=error_rate, seed=seed * 1000003 + index))
+    return scenarios
+
+
+def scenarios_from_latencies(command: str, samples: Sequence[float], error_rate: float = 0.0) -> List[Scenario]:
+    """Scenarios replaying recorded verification times (see LatencyStore).
+
+    A recorded latency is when the target state was first seen, so these
+    scenarios are slightly pessimistic: the real transition happened at
+    most one poll interval earlier.
+    """
+    scenarios = []
+    for index, seconds in enumerate(samples):
+        if command == "stop":
+            trace = ((min(10.0, seconds / 2), int(EddiState.PAUSED)), (seconds, int(EddiState.STOPPED)))
+        else:
+            trace = ((seconds, int(EddiState.PAUSED)),)
+        scenarios.append(Scenario(command, [trace], error_rate=error_rate, seed=index))
+    return scenarios
+
+
+def load_scenarios(path: Union[str, Path]) -> List[Scenario]:
+    """Load recorded scenarios from a JSON file.
+
+    The file holds a list of objects::
+
+        [{"command": "stop", "initial_sta": 3, "error_rate": 0.0,
+          "attempts": [[[12, 1], [164, 6]], null]}]
+
+    where each attempt is a list of [seconds after the command, sta]
+    steps, or null for a command that had no effect.
+
+    Raises:
+        ValueError: If an entry is malformed
+    """
+    data = json.loads(Path(path).read_text())
+    scenarios = []
+    for index, entry in enumerate(data):
+        try:
+            attempts = [
+                None if attempt is None else tuple((float(t), int(sta)) for t, sta in attempt)
+                for attempt in entry["attempts"]
+            ]
+            scenarios.append(Scenario(
+                entry["command"], attempts, entry.get("initial_sta"),
+                float(entry.get("error_rate", 0.0)), int(entry.get("seed", index)),
+            ))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid scenario {index} in {path}: {e}") from e
+    return scenarios
@@ -0,0 +1,137 @@
+"""Continuous status sampling that reports only what changed."""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from .models import FIELD_KEYS
+
+# Default seconds between samples of `eddi status --watch`
+DEFAULT_WATCH_INTERVAL = 5.0
+
+
+# API keys accepted by resolve_fields
+_KNOWN_KEYS = frozenset(FIELD_KEYS.values())
+
+
+def resolve_fields(fields: Optional[Iterable[str]]) -> Optional[List[str]]:
+    """Map field names to API keys.
+
+    Accepts API keys ("div") and EddiStatus field names ("diversion").
+    The serial number is always included.
+
+    Returns:
+        API keys in the order given, or None for every key
+
+    Raises:
+        ValueError: If a name is neither a field name nor its API key
+    """
+    if fields is None:
+        return None
+    keys = ["sno"]
+    for name in fields:
+        key = FIELD_KEYS.get(name, name)
+        if key not in _KNOWN_KEYS:
+            known = ", ".join(f"{field} ({api_key})" for field, api_key in FIELD_KEYS.items())
+            raise ValueError(f"Unknown field: {name}. Use one of {known}")
+        if key not in keys:
+            keys.append(key)
+    return keys
+
+
+def project(device: Dict[str, Any], keys: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """Keep only the given keys of a device entry (all if keys is None)."""
+    if keys is None:
+        return dict(device)
+    return {key: device[key] for key in keys if key in device}
+
+
+def diff(previous: Optional[Dict[str, Any]], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Keys whose value changed, appeared, or disappeared (as None)."""
+    if previous is None:
+        return dict(current)
+    changed = {key: value for key, value in current.items() if previous.get(key, object()) != value}
+    changed.update({key: None for key in previous if key not in current})
+    return changed
+
+
+class StatusWatcher:
+    """Poll eddi status with one client and yield per-device changes.
+
+    Each sample yields one event per device whose projected fields
+    changed: the first sample has every field, later ones only the
+    changed keys. Events carry ``sno`` and ``ts`` (epoch seconds).
+    """
+
+    def __init__(
+        self,
+        client,
+        device: Optional[str] = None,
+        fields: Optional[Iterable[str]] = None,
+        interval: float = DEFAULT_WATCH_INTERVAL,
+        now: Callable[[], float] = time.time,
+    ):
+        """Initialize the watcher.
+
+        Args:
+            client: EddiClient instance, kept warm across samples
+            device: Serial of a single eddi (default: every eddi on the hub)
+            fields: Field names or API keys to watch (default: all)
+            interval: Seconds between samples
+            now: Wall clock used for event timestamps
+        """
+        self.client = client
+        self.device = device
+        self.keys = resolve_fields(fields)
+        self.interval = interval
+        self.now = now
+        self.last: Dict[str, Dict[str, Any]] = {}
+        self.stop_event = threading.Event()
+
+    def sample(self) -> List[Dict[str, Any]]:
+        """Read status once and return the changes since the previous sample."""
+        return self.update(self.fetch())
+
+    def fetch(self) -> List[Dict[str, Any]]:
+        """Read the device entries upstream without touching ``last``."""
+        return self.client.get_eddi_devices(self.device)
+
+    def update(self, devices: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Record fetched device entries and return the changes since the previous sample."""
+        ts = self.now()
+        events = []
+        for device in devices:
+            serial = str(device.get("sno"))
+            current = project(device, self.keys)
+            changed = diff(self.last.get(serial), current)
+            self.last[serial] = current
+            changed.pop("sno", None)
+            if changed:
+                events.append({"ts": round(ts, 3), "sno": device.get("sno"), **changed})
+        return events
+
+    def __iter__(self) -> Iterator[List[Dict[str, Any]]]:
+        return self.run()
+
+    def run(self, count: Optional[int] = None, on_error: Optional[Callable[[Exception], None]] = None):
+        """Yield the changes of each sample until stop() or ``count`` samples.
+
+        Samples that fail are passed to on_error (or re-raised if None);
+        the next successful sample is compared with the last good one.
+        """
+        taken = 0
+        while not self.stop_event.is_set():
+            try:
+                yield self.sample()
+            except Exception as e:
+                if on_error is None:
+                    raise
+                on_error(e)
+            taken += 1
+            if count is not None and taken >= count:
+                return
+            self.stop_event.wait(self.interval)
+
+    def stop(self) -> None:
+        """Stop after the current sample."""
+        self.stop_event.set()
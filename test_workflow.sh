@@ -13,7 +13,7 @@ if [ ! -f .secrets ]; then
     echo "Create .secrets file with:"
     echo "  EDDI_SERIAL_NUMBER=your_serial"
     echo "  EDDI_API_KEY=your_key"
-    echo "  EDDI_BASE_URL=https://s18.myenergi.net"
+    echo "  EDDI_BASE_URL=https://s18.myenergi.net  (optional)"
     exit 1
 fi
 
@@ -50,7 +50,7 @@ pixi run python scripts/eddi_control.py \
     "$COMMAND" \
     --serial "$EDDI_SERIAL_NUMBER" \
     --api-key "$EDDI_API_KEY" \
-    --base-url "${EDDI_BASE_URL:-https://s18.myenergi.net}" \
+    ${EDDI_BASE_URL:+--base-url "$EDDI_BASE_URL"} \
     --max-retries 3
 
 EXIT_CODE=$?
@@ -0,0 +1,19 @@
+"""Shared test fixtures."""
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path, monkeypatch):
+    """Keep on-disk caches and data out of the user's home directory."""
+    monkeypatch.setenv("EDDI_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("EDDI_DATA_DIR", str(tmp_path / "data"))
+
+
+@pytest.fixture(autouse=True)
+def fresh_resilience(monkeypatch):
+    """Start every test with closed circuit breakers and a full retry budget."""
+    from eddi_scheduler.resilience import DEFAULT_RESILIENCE, RUN_BUDGET
+
+    DEFAULT_RESILIENCE.reset()
+    RUN_BUDGET.reset()
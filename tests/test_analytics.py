@@ -0,0 +1,96 @@
+"""Tests for the energy analytics."""
+
+from datetime import date, datetime, time, timezone
+import pytest
+from eddi_scheduler.models import EddiStatus
+from eddi_scheduler.recorder import TelemetryStore
+from eddi_scheduler.schedule import Rule, Schedule, ZoneInfo
+
+np = pytest.importorskip("numpy")
+
+from eddi_scheduler.analytics import (  # noqa: E402
+    period_boundaries, summarize_history, summarize_telemetry
+)
+
+NZ = ZoneInfo("Pacific/Auckland")
+
+
+def local_ts(*args):
+    """Epoch seconds of a New Zealand wall-clock time."""
+    return datetime(*args, tzinfo=NZ).timestamp()
+
+
+def test_day_boundaries_follow_dst():
+    """Test the day clocks go forward is 23 hours long."""
+    labels, starts = period_boundaries(local_ts(2026, 9, 26, 12), local_ts(2026, 9, 28, 12), "day")
+
+    assert labels == ["2026-09-26", "2026-09-27", "2026-09-28"]
+    assert np.diff(starts).tolist() == [86400, 82800, 86400]
+
+
+def test_month_boundaries():
+    """Test months are labelled and closed by the next month's start."""
+    labels, starts = period_boundaries(local_ts(2026, 1, 15), local_ts(2026, 3, 2), "month")
+
+    assert labels == ["2026-01", "2026-02", "2026-03"]
+    assert starts[-1] == local_ts(2026, 4, 1)
+
+
+def test_summarize_telemetry(tmp_path):
+    """Test energy, state hours and gaps are integrated per day."""
+    store = TelemetryStore(tmp_path)
+    begin = local_ts(2026, 10, 16, 10)
+    # Two hours at 60 s intervals: diverting 1 kW and exporting 500 W, then stopped
+    for i in range(120):
+        diverting = i < 60
+        store.append(begin + i * 60, [EddiStatus.from_dict({
+            "sno": 101, "sta": 3 if diverting else 6, "div": 1000 if diverting else 0,
+            "grd": -500 if diverting else 200,
+        })])
+    # A recorder outage of a day is not integrated
+    store.append(begin + 86400, [EddiStatus.from_dict({"sno": 101, "sta": 6, "div": 0, "grd": 0})])
+
+    (first, second) = summarize_telemetry(store.load(101), "day", "Pacific/Auckland")
+
+    assert first["period"] == "2026-10-16"
+    assert first["samples"] == 120
+    assert first["diverted_kwh"] == pytest.approx(1.0)
+    assert first["exported_kwh"] == pytest.approx(0.5)
+    assert first["hours_diverting"] == pytest.approx(1.0)
+    assert first["hours_stopped"] == pytest.approx((59 * 60 + 300) / 3600, abs=1e-3)
+    assert second["samples"] == 1
+
+
+def history_day(day, minutes):
+    """History records for the given minutes of a UTC day."""
+    return [
+        {"ts": int(datetime.combine(day, time(), timezone.utc).timestamp()) + m * 60,
+         "h1d": 60000, "exp": 30000}
+        for m in minutes
+    ]
+
+
+def test_summarize_history_with_schedule():
+    """Test heater energy, export avoided and schedule fit."""
+    # Running 00:00-12:00 UTC every day
+    schedule = Schedule([
+        Rule(frozenset(range(7)), time(0, 0), "start"),
+        Rule(frozenset(range(7)), time(12, 0), "stop"),
+    ], "UTC")
+    records = history_day(date(2026, 10, 16), range(600, 660)) + history_day(date(2026, 10, 16), range(780, 840))
+
+    (row,) = summarize_history(records, "day", "UTC", schedule)
+
+    assert row["heater1_kwh"] == pytest.approx(120 * 60000 / 3.6e6)
+    assert row["export_avoided_kwh"] == row["heater1_kwh"]
+    assert row["surplus_kwh"] == pytest.approx(120 * 90000 / 3.6e6)
+    assert row["schedule_match"] == pytest.approx(0.5)
+
+
+def test_summarize_history_weekly_grouping():
+    """Test records are grouped by ISO week starting Monday."""
+    records = [r for d in range(12, 26) for r in history_day(date(2026, 10, d), [0])]
+
+    rows = summarize_history(records, "week", "UTC")
+
+    assert [(r["period"], r["samples"]) for r in rows] == [("2026-10-12", 7), ("2026-10-19", 7)]
@@ -0,0 +1,232 @@
+"""Tests for the AsyncEddiClient."""
+
+import asyncio
+from datetime import date
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from eddi_scheduler.async_client import AsyncEddiClient, gather_status
+from eddi_scheduler.auth import DigestCache
+from eddi_scheduler.history import HistoryCache
+from eddi_scheduler.resilience import CircuitOpenError, Resilience
+
+
+def make_client(handler, **kwargs):
+    """Create a test client backed by a mock transport."""
+    return AsyncEddiClient(
+        "12345678",
+        "test_api_key",
+        "https://test.myenergi.net",
+        transport=httpx.MockTransport(handler),
+        **kwargs
+    )
+
+
+def test_client_initialization():
+    """Test client initialization."""
+    client = AsyncEddiClient("12345678", "test_key")
+    assert client.serial_number == "12345678"
+    assert client.base_url == "https://director.myenergi.net"
+
+
+def test_get_eddi_devices():
+    """Test getting eddi devices."""
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        return httpx.Response(200, json=[
+            {"eddi": [{"sno": 10088888, "sta": 1}]},
+            {"harvi": []}
+        ])
+
+    async def run():
+        async with make_client(handler) as client:
+            return await client.get_eddi_devices()
+
+    assert asyncio.run(run()) == [{"sno": 10088888, "sta": 1}]
+    assert requested == ["https://test.myenergi.net/cgi-jstatus-E"]
+
+
+def test_set_mode_stop():
+    """Test setting device to stop mode."""
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        return httpx.Response(200, json={"status": 0, "statustext": ""})
+
+    async def run():
+        async with make_client(handler) as client:
+            return await client.stop("10088888")
+
+    assert asyncio.run(run()) == {"status": 0, "statustext": ""}
+    assert requested == ["https://test.myenergi.net/cgi-eddi-mode-E10088888-0"]
+
+
+def test_set_mode_invalid():
+    """Test setting invalid mode raises error."""
+    async def run():
+        async with make_client(lambda request: httpx.Response(200)) as client:
+            await client.set_mode("10088888", "invalid")
+
+    with pytest.raises(ValueError, match="Invalid mode"):
+        asyncio.run(run())
+
+
+def test_http_error_raises():
+    """Test a failed request raises an HTTP error."""
+    async def run():
+        async with make_client(lambda request: httpx.Response(500)) as client:
+            await client.get_status()
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(run())
+
+
+def test_gather_status_respects_concurrency_limit():
+    """Test shared semaphore caps requests in flight across clients."""
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json=[{"eddi": []}])
+
+    async def run():
+        semaphore = asyncio.Semaphore(3)
+        clients = [make_client(handler, semaphore=semaphore) for _ in range(10)]
+        try:
+            return await gather_status(clients)
+        finally:
+            for client in clients:
+                await client.aclose()
+
+    results = asyncio.run(run())
+    assert results == [[{"eddi": []}]] * 10
+    assert peak == 3
+
+
+def test_concurrent_status_calls_share_one_request():
+    """Test concurrent status calls are coalesced into one request."""
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json=[{"eddi": []}])
+
+    async def run():
+        async with make_client(handler) as client:
+            return await asyncio.gather(*(client.get_eddi_devices() for _ in range(5)))
+
+    assert asyncio.run(run()) == [[]] * 5
+    assert calls == 1
+
+
+def test_status_cache_invalidated_by_set_mode():
+    """Test cached status is dropped after a mode change."""
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, json=[{"eddi": []}] if "jstatus" in request.url.path else {"status": 0})
+
+    async def run():
+        async with make_client(handler, status_ttl=60) as client:
+            await client.get_status()
+            await client.get_status()
+            await client.start("10088888")
+            await client.get_status()
+
+    asyncio.run(run())
+    assert calls == ["/cgi-jstatus-*", "/cgi-eddi-mode-E10088888-1", "/cgi-jstatus-*"]
+
+
+def test_breaker_is_shared_with_sync_clients():
+    """Test server failures open the shared breaker and later calls fail fast."""
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        return httpx.Response(503)
+
+    resilience = Resilience(request_retries=0, failure_threshold=2)
+
+    async def run():
+        async with make_client(handler, resilience=resilience) as client:
+            for _ in range(2):
+                with pytest.raises(httpx.HTTPStatusError):
+                    await client.get_status()
+            with pytest.raises(CircuitOpenError):
+                await client.get_status()
+
+    asyncio.run(run())
+    assert len(requested) == 2
+    assert resilience.breaker("https://test.myenergi.net").state == "open"
+
+
+def test_ensure_mode_and_hooks():
+    """Test ensure_mode skips a device already in the mode and every exchange reaches the hooks."""
+    events = []
+
+    def handler(request):
+        return httpx.Response(200, json={"eddi": [{"sno": 10088888, "sta": 6}]})
+
+    async def run():
+        async with make_client(handler, hooks=[events.append]) as client:
+            return await client.ensure_mode("10088888", "stop")
+
+    assert asyncio.run(run()) is None
+    assert [(e.endpoint, e.status_code) for e in events] == [("cgi-jstatus-E", 200)]
+
+
+def test_digest_challenge_is_reused_by_the_next_client(tmp_path):
+    """Test a persisted challenge lets a new client skip the 401 round-trip."""
+    statuses = []
+
+    def handler(request):
+        if "Authorization" not in request.headers:
+            statuses.append(401)
+            return httpx.Response(401, headers={
+                "WWW-Authenticate": 'Digest realm="MyEnergi Telemetry", nonce="abc123", qop="auth"'
+            })
+        statuses.append(200)
+        return httpx.Response(200, json={"eddi": []})
+
+    async def run():
+        for _ in range(2):
+            async with make_client(handler, digest_cache=DigestCache(tmp_path / "digest.json")) as client:
+                await client.get_eddi_devices()
+
+    asyncio.run(run())
+    assert statuses == [401, 200, 200]
+
+
+def test_get_history_fetches_uncached_days_only(tmp_path):
+    """Test completed days come from the history cache on a rerun."""
+    requested = []
+
+    def handler(request):
+        requested.append(request.url.path)
+        year, month, day = map(int, request.url.path.rsplit("-", 3)[1:])
+        return httpx.Response(200, json={"U10088888": [
+            {"yr": year, "mon": month, "dom": day, "hr": 12, "min": 30, "imp": 1200},
+        ]})
+
+    async def run():
+        async with make_client(handler, history_cache=HistoryCache(tmp_path)) as client:
+            first = await client.get_history("10088888", date(2025, 1, 1), date(2025, 1, 3))
+            second = await client.get_history("10088888", date(2025, 1, 1), date(2025, 1, 3))
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert [r["dom"] for r in first] == [1, 2, 3]
+    assert second == first
+    assert len(requested) == 3
@@ -0,0 +1,66 @@
+"""Tests for preemptive digest authentication."""
+
+from unittest.mock import Mock
+import requests
+from eddi_scheduler.auth import DigestCache, PreemptiveDigestAuth
+
+
+CHALLENGE = {"realm": "MyEnergi Telemetry", "nonce": "abc123", "qop": "auth", "algorithm": "MD5"}
+
+
+def prepared_request(url="https://s18.myenergi.net/cgi-jstatus-*"):
+    """Create a prepared GET request."""
+    return requests.Request("GET", url).prepare()
+
+
+def test_fresh_auth_waits_for_challenge(tmp_path):
+    """Test no Authorization header is sent without a known challenge."""
+    auth = PreemptiveDigestAuth("12345678", "key", DigestCache(tmp_path / "digest.json"))
+
+    request = auth(prepared_request())
+
+    assert "Authorization" not in request.headers
+
+
+def test_seeded_auth_answers_preemptively(tmp_path):
+    """Test a cached challenge is used on the first request."""
+    cache = DigestCache(tmp_path / "digest.json")
+    cache.save("12345678", {"chal": CHALLENGE, "last_nonce": "abc123", "nonce_count": 4})
+    auth = PreemptiveDigestAuth("12345678", "key", cache)
+
+    request = auth(prepared_request())
+
+    header = request.headers["Authorization"]
+    assert header.startswith("Digest ")
+    assert 'nonce="abc123"' in header
+    assert "nc=00000005" in header
+
+
+def test_persist_saves_only_new_challenges(tmp_path):
+    """Test the cache is written when the nonce changes, not on every request."""
+    cache = DigestCache(tmp_path / "digest.json")
+    cache.save("12345678", {"chal": CHALLENGE, "last_nonce": "abc123", "nonce_count": 1})
+    auth = PreemptiveDigestAuth("12345678", "s3cret-password", cache)
+    auth(prepared_request())
+    cache.save = Mock(wraps=cache.save)
+
+    auth.persist()
+    cache.save.assert_not_called()
+
+    auth._thread_local.chal = {**CHALLENGE, "nonce": "def456"}
+    auth._thread_local.last_nonce = "def456"
+    auth._thread_local.nonce_count = 1
+    auth.persist()
+    auth.persist()
+
+    cache.save.assert_called_once()
+    assert cache.load("12345678")["chal"]["nonce"] == "def456"
+    assert "s3cret-password" not in (tmp_path / "digest.json").read_text()
+
+
+def test_expired_state_is_ignored(tmp_path):
+    """Test challenges older than max_age are not reused."""
+    cache = DigestCache(tmp_path / "digest.json", max_age=-1)
+    cache.save("12345678", {"chal": CHALLENGE, "last_nonce": "abc123", "nonce_count": 1})
+
+    assert cache.load("12345678") is None
@@ -0,0 +1,140 @@
+"""Tests for the surplus-driven autopilot."""
+
+from unittest.mock import Mock
+import pytest
+from eddi_scheduler.autopilot import Autopilot, AutopilotConfig, TokenBucket
+from eddi_scheduler.models import EddiStatus
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def reading(sta, div, grd):
+    """A status poll result."""
+    return [EddiStatus.from_dict({"sno": 101, "sta": sta, "div": div, "grd": grd})]
+
+
+def make_pilot(**overrides):
+    """Autopilot with a fake clock, a window of 2 and no dwell by default."""
+    clock = FakeClock()
+    config = AutopilotConfig(**{"window": 2, "min_on": 0, "min_off": 0, **overrides})
+    client = Mock()
+    return Autopilot(client, "101", config, log=lambda message: None, clock=clock), client, clock
+
+
+def test_starts_once_window_mean_exceeds_threshold():
+    """Test a single spike does not start the heater but sustained export does."""
+    pilot, client, clock = make_pilot()
+    client.get_eddi_statuses.side_effect = [reading(6, 0, 200), reading(6, 0, -900), reading(6, 0, -900)]
+
+    assert pilot.step() is None
+    assert pilot.step() is None  # mean of 200 W import and 900 W export
+    assert pilot.step() == "normal"
+    client.set_mode.assert_called_once_with("101", "normal")
+
+
+def test_hysteresis_band_holds_mode():
+    """Test surplus between the thresholds changes nothing."""
+    pilot, client, clock = make_pilot()
+    client.get_eddi_statuses.side_effect = [reading(3, 300, 0)] * 4
+
+    assert [pilot.step() for _ in range(4)] == [None] * 4
+    client.set_mode.assert_not_called()
+
+
+def test_min_on_dwell_delays_stop():
+    """Test the heater keeps running until its minimum on-time has passed."""
+    pilot, client, clock = make_pilot(min_on=600)
+    client.get_eddi_statuses.return_value = reading(6, 0, -1000)
+    pilot.step()
+    assert pilot.step() == "normal"
+
+    client.get_eddi_statuses.return_value = reading(1, 0, 500)
+    clock.now += 300
+    assert [pilot.step(), pilot.step()] == [None, None]
+    clock.now += 300
+    assert pilot.step() == "stop"
+
+
+def test_mode_follows_changes_made_outside_the_autopilot():
+    """Test a device stopped by someone else is seen as stopped and can be restarted."""
+    pilot, client, clock = make_pilot()
+    client.get_eddi_statuses.return_value = reading(3, 300, 0)
+    pilot.step()
+    assert pilot.mode == "normal"
+
+    client.get_eddi_statuses.return_value = reading(6, 0, 0)
+    pilot.step()
+    assert pilot.mode == "stop"
+    client.get_eddi_statuses.return_value = reading(6, 0, -900)
+    pilot.step()
+    assert pilot.step() == "normal"
+
+
+def test_transitional_states_are_ignored_while_settling():
+    """Test a stop in progress (3 -> 1 -> 6) does not flip the mode back to normal."""
+    pilot, client, clock = make_pilot(settle=200)
+    client.get_eddi_statuses.return_value = reading(3, 0, 0)
+    pilot.step()
+    assert pilot.step() == "stop"
+
+    for sta in (3, 1):
+        client.get_eddi_statuses.return_value = reading(sta, 0, 0)
+        pilot.step()
+        assert pilot.mode == "stop"
+
+    clock.now += 200
+    assert pilot.step() == "stop"  # the stop never took effect, so it is sent again
+
+
+def test_budget_limits_calls():
+    """Test polls stop once the hourly budget is used up."""
+    pilot, client, clock = make_pilot(max_calls_per_hour=60)
+    client.get_eddi_statuses.return_value = reading(3, 300, 0)
+
+    for _ in range(10):
+        pilot.step()
+
+    assert client.get_eddi_statuses.call_count == pilot.budget.capacity
+    clock.now += 1 / pilot.budget.rate
+    pilot.step()
+    assert client.get_eddi_statuses.call_count == pilot.budget.capacity + 1
+
+
+def test_budget_never_exceeds_the_hourly_cap():
+    """Test no rolling hour, including the first and one after an idle hour, allows more than the cap."""
+    pilot, client, clock = make_pilot(max_calls_per_hour=120)
+    calls = []
+    for second in range(3 * 3600):
+        clock.now = 1000.0 + second
+        if 3600 <= second < 7200:
+            continue  # idle: the bucket refills to its burst
+        if pilot.budget.try_acquire():
+            calls.append(second)
+
+    assert max(sum(1 for t in calls if start <= t < start + 3600) for start in calls) <= 120
+
+
+def test_token_bucket_refills():
+    """Test tokens come back at the configured rate."""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1.0, capacity=2, clock=clock)
+
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert bucket.wait_time() == pytest.approx(1.0)
+    clock.now += 1
+    assert bucket.try_acquire()
+
+
+def test_config_rejects_inverted_thresholds():
+    """Test the stop threshold must be below the start threshold."""
+    with pytest.raises(ValueError):
+        AutopilotConfig(start_above=100, stop_below=200)
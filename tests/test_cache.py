@@ -0,0 +1,37 @@
+"""Tests for the on-disk JSON caches."""
+
+import threading
+from eddi_scheduler.cache import JsonCache
+from eddi_scheduler.discovery import ServerCache
+
+
+def test_update_skips_write_when_nothing_changed(tmp_path):
+    """Test a change returning False leaves the file alone."""
+    cache = JsonCache(tmp_path / "cache.json")
+
+    cache.update(lambda data: data.update({"a": 1}))
+    cache.update(lambda data: data.pop("b", None) is not None)
+
+    assert cache.load() == {"a": 1}
+    JsonCache(tmp_path / "other.json").update(lambda data: False)
+    assert not (tmp_path / "other.json").exists()
+
+
+def test_parallel_caches_of_one_file_keep_every_entry(tmp_path):
+    """Test threads with their own cache instances (as in a fleet run) do not lose each other's writes."""
+    path = tmp_path / "servers.json"
+    start = threading.Barrier(16)
+
+    def remember(hub: int) -> None:
+        cache = ServerCache(path)
+        start.wait()
+        for n in range(10):
+            cache.set(f"{hub}-{n}", f"https://s{hub}.myenergi.net")
+
+    threads = [threading.Thread(target=remember, args=(hub,)) for hub in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(JsonCache(path).load()) == 160
@@ -1,8 +1,11 @@
 """Tests for the EddiClient."""
 
+import json
 import pytest
+import requests
 from unittest.mock import Mock, patch
 from eddi_scheduler.client import EddiClient
+from eddi_scheduler.discovery import ServerCache
 
 
 @pytest.fixture
@@ -16,13 +19,15 @@ def test_client_initialization():
     client = EddiClient("12345678", "test_key")
     assert client.serial_number == "12345678"
     assert client.api_key == "test_key"
-    assert client.base_url == "https://s18.myenergi.net"
+    assert client.base_url == "https://director.myenergi.net"
+    assert client.discover
 
 
 def test_client_custom_base_url():
     """Test client with custom base URL."""
     client = EddiClient("12345678", "test_key", "https://custom.url")
     assert client.base_url == "https://custom.url"
+    assert not client.discover
 
 
 @patch("eddi_scheduler.client.requests.Session")
@@ -30,7 +35,8 @@ def test_get_status(mock_session_class, client):
     """Test getting device status."""
     mock_session = Mock()
     mock_response = Mock()
-    mock_response.json.return_value = [{"eddi": [{"sno": 10088888}]}]
+    mock_response.history = []
+    mock_response.content = json.dumps([{"eddi": [{"sno": 10088888}]}]).encode()
     mock_session.get.return_value = mock_response
     client.session = mock_session
     
@@ -45,10 +51,11 @@ def test_get_eddi_devices(mock_session_class, client):
     """Test getting eddi devices."""
     mock_session = Mock()
     mock_response = Mock()
-    mock_response.json.return_value = [
+    mock_response.history = []
+    mock_response.content = json.dumps([
         {"eddi": [{"sno": 10088888, "sta": 1}]},
         {"harvi": []}
-    ]
+    ]).encode()
     mock_session.get.return_value = mock_response
     client.session = mock_session
     
@@ -57,12 +64,30 @@ def test_get_eddi_devices(mock_session_class, client):
     assert result == [{"sno": 10088888, "sta": 1}]
 
 
+def test_get_eddi_devices_scoped_query(client):
+    """Test eddi queries use the eddi-only endpoints."""
+    client.session = Mock()
+    client.session.get.return_value = mock_response({"eddi": [{"sno": 10088888, "sta": 6}]})
+
+    assert client.get_eddi_devices() == [{"sno": 10088888, "sta": 6}]
+    assert client.get_eddi_devices("10088888") == [{"sno": 10088888, "sta": 6}]
+    assert client.get_eddi_devices("10099999") == []
+
+    urls = [call[0][0] for call in client.session.get.call_args_list]
+    assert urls == [
+        "https://test.myenergi.net/cgi-jstatus-E",
+        "https://test.myenergi.net/cgi-jstatus-E10088888",
+        "https://test.myenergi.net/cgi-jstatus-E10099999",
+    ]
+
+
 @patch("eddi_scheduler.client.requests.Session")
 def test_get_eddi_devices_empty(mock_session_class, client):
     """Test getting eddi devices when none exist."""
     mock_session = Mock()
     mock_response = Mock()
-    mock_response.json.return_value = [{"harvi": []}]
+    mock_response.history = []
+    mock_response.content = json.dumps([{"harvi": []}]).encode()
     mock_session.get.return_value = mock_response
     client.session = mock_session
     
@@ -76,7 +101,8 @@ def test_set_mode_stop(mock_session_class, client):
     """Test setting device to stop mode."""
     mock_session = Mock()
     mock_response = Mock()
-    mock_response.json.return_value = {"status": 0, "statustext": ""}
+    mock_response.history = []
+    mock_response.content = json.dumps({"status": 0, "statustext": ""}).encode()
     mock_session.get.return_value = mock_response
     client.session = mock_session
     
@@ -93,7 +119,8 @@ def test_set_mode_normal(mock_session_class, client):
     """Test setting device to normal mode."""
     mock_session = Mock()
     mock_response = Mock()
-    mock_response.json.return_value = {"status": 0, "statustext": ""}
+    mock_response.history = []
+    mock_response.content = json.dumps({"status": 0, "statustext": ""}).encode()
     mock_session.get.return_value = mock_response
     client.session = mock_session
     
@@ -116,7 +143,8 @@ def test_stop(mock_session_class, client):
     """Test stop convenience method."""
     mock_session = Mock()
     mock_response = Mock()
-    mock_response.json.return_value = {"status": 0}
+    mock_response.history = []
+    mock_response.content = json.dumps({"status": 0}).encode()
     mock_session.get.return_value = mock_response
     client.session = mock_session
     
@@ -130,10 +158,182 @@ def test_start(mock_session_class, client):
     """Test start convenience method."""
     mock_session = Mock()
     mock_response = Mock()
-    mock_response.json.return_value = {"status": 0}
+    mock_response.history = []
+    mock_response.content = json.dumps({"status": 0}).encode()
     mock_session.get.return_value = mock_response
     client.session = mock_session
     
     result = client.start("10088888")
     
     assert result == {"status": 0}
+
+
+def mock_response(payload, headers=None, status_code=200):
+    """Create a mock response with JSON payload and headers."""
+    response = Mock()
+    response.history = []
+    response.content = json.dumps(payload).encode()
+    response.headers = headers or {}
+    response.status_code = status_code
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.HTTPError(response=response)
+    return response
+
+
+def test_discovery_follows_asn_header(tmp_path):
+    """Test the director's ASN header selects and caches the server."""
+    cache = ServerCache(tmp_path / "servers.json")
+    client = EddiClient("12345678", "test_key", server_cache=cache)
+    client.session = Mock()
+    client.session.get.return_value = mock_response(
+        [{"eddi": []}], {"x_myenergi-asn": "s7.myenergi.net"}
+    )
+
+    client.get_status()
+    client.get_status()
+
+    assert client.session.get.call_args_list[0][0][0] == "https://director.myenergi.net/cgi-jstatus-*"
+    assert client.session.get.call_args_list[1][0][0] == "https://s7.myenergi.net/cgi-jstatus-*"
+    assert cache.get("12345678") == "https://s7.myenergi.net"
+    # A new client starts from the cached server
+    assert EddiClient("12345678", "test_key", server_cache=cache).base_url == "https://s7.myenergi.net"
+
+
+def test_discovery_cache_expires(tmp_path):
+    """Test stale cache entries are ignored."""
+    cache = ServerCache(tmp_path / "servers.json", ttl=-1)
+    cache.set("12345678", "https://s7.myenergi.net")
+
+    assert cache.get("12345678") is None
+
+
+def test_discovery_invalidates_rejecting_server(tmp_path):
+    """Test a server rejecting the hub is forgotten and the director retried."""
+    cache = ServerCache(tmp_path / "servers.json")
+    cache.set("12345678", "https://s7.myenergi.net")
+    client = EddiClient("12345678", "test_key", server_cache=cache)
+    client.session = Mock()
+    client.session.get.side_effect = [
+        mock_response({}, status_code=401),
+        mock_response([{"eddi": []}], {"x_myenergi-asn": "s18.myenergi.net"}),
+    ]
+
+    assert client.get_status() == [{"eddi": []}]
+    assert client.session.get.call_args_list[1][0][0] == "https://director.myenergi.net/cgi-jstatus-*"
+    assert cache.get("12345678") == "https://s18.myenergi.net"
+
+
+def test_explicit_base_url_ignores_asn_header(tmp_path):
+    """Test a pinned base URL is never replaced."""
+    cache = ServerCache(tmp_path / "servers.json")
+    client = EddiClient("12345678", "test_key", "https://custom.url", server_cache=cache)
+    client.session = Mock()
+    client.session.get.return_value = mock_response([], {"x_myenergi-asn": "s7.myenergi.net"})
+
+    client.get_status()
+
+    assert client.base_url == "https://custom.url"
+    assert cache.get("12345678") is None
+
+
+def test_status_cache_reuses_response(client):
+    """Test status is served from cache within the TTL."""
+    client.status_ttl = 60
+    client.session = Mock()
+    client.session.get.return_value = mock_response([{"eddi": [{"sno": 1}]}])
+
+    client.get_eddi_devices()
+    client.get_eddi_devices()
+
+    assert client.session.get.call_count == 1
+
+
+def test_set_mode_invalidates_status_cache(client):
+    """Test a mode change forces the next status call to the API."""
+    client.status_ttl = 60
+    client.session = Mock()
+    client.session.get.return_value = mock_response([{"eddi": []}])
+
+    client.get_status()
+    client.stop("10088888")
+    client.get_status()
+
+    assert client.session.get.call_count == 3
+
+
+def test_concurrent_status_calls_share_one_request(client):
+    """Test callers arriving while a request is in flight share it."""
+    import threading
+    from eddi_scheduler.client import _Flight
+
+    release = threading.Event()
+    entered = threading.Event()
+    waiting = threading.Semaphore(0)
+    original_wait = _Flight.wait
+
+    def slow_get(url):
+        entered.set()
+        release.wait(5)
+        return mock_response([{"eddi": []}])
+
+    def counting_wait(flight):
+        waiting.release()
+        return original_wait(flight)
+
+    client.session = Mock()
+    client.session.get.side_effect = slow_get
+    results = []
+    leader = threading.Thread(target=lambda: results.append(client.get_status()))
+    followers = [threading.Thread(target=lambda: results.append(client.get_status())) for _ in range(5)]
+
+    with patch.object(_Flight, "wait", counting_wait):
+        leader.start()
+        assert entered.wait(5)
+        for thread in followers:
+            thread.start()
+        for _ in followers:
+            assert waiting.acquire(timeout=5)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(5)
+
+    assert results == [[{"eddi": []}]] * 6
+    assert client.session.get.call_count == 1
+
+
+def test_get_eddi_statuses_typed_fields(client):
+    """Test typed statuses parse the API keys, leaving missing ones as None."""
+    client.session = Mock()
+    client.session.get.return_value = mock_response(
+        {"eddi": [{"sno": 10088888, "sta": 3, "div": 1500, "grd": -20, "tp1": 55}]}
+    )
+
+    (status,) = client.get_eddi_statuses("10088888")
+
+    assert status.serial == 10088888
+    assert status.sta == 3
+    assert status.diversion == 1500
+    assert status.grid == -20
+    assert status.temp1 == 55
+    assert status.heater1 is None
+
+
+def test_ensure_mode_skips_when_already_in_mode(client):
+    """Test no command is sent when the device already matches."""
+    client.session = Mock()
+    client.session.get.return_value = mock_response({"eddi": [{"sno": 10088888, "sta": 6}]})
+
+    assert client.ensure_mode("10088888", "stop") is None
+    assert client.session.get.call_count == 1
+
+
+def test_ensure_mode_sends_when_different(client):
+    """Test the mode change is sent when the device differs."""
+    client.session = Mock()
+    client.session.get.side_effect = [
+        mock_response({"eddi": [{"sno": 10088888, "sta": 6}]}),
+        mock_response({"status": 0, "statustext": ""}),
+    ]
+
+    assert client.ensure_mode("10088888", "normal") == {"status": 0, "statustext": ""}
+    assert client.session.get.call_args[0][0].endswith("/cgi-eddi-mode-E10088888-1")
@@ -0,0 +1,230 @@
+"""Tests for command execution and verification."""
+
+import pytest
+from unittest.mock import Mock, patch
+from eddi_scheduler import control
+from eddi_scheduler.clock import Clock, VirtualClock
+from eddi_scheduler.resilience import Backoff
+from eddi_scheduler.models import EddiStatus
+
+
+def client_with_states(*states):
+    """Create a mock client whose device reports the given sta values in turn."""
+    client = Mock()
+    client.get_eddi_statuses.side_effect = [
+        [EddiStatus.from_dict({"sno": 101, "sta": sta})] for sta in states
+    ]
+    client.stop.return_value = {"status": 0}
+    client.start.return_value = {"status": 0}
+    return client
+
+
+@patch("eddi_scheduler.clock.time.sleep")
+def test_wait_and_verify_stop_waits_for_sta_6(mock_sleep):
+    """Test stop verification passes through sta=1 until sta=6."""
+    client = client_with_states(3, 1, 6)
+
+    assert control.wait_and_verify_stop(client, "101", log=lambda message: None)
+    assert client.get_eddi_statuses.call_count == 3
+
+
+@patch("eddi_scheduler.clock.time.sleep")
+def test_wait_and_verify_start_fails_when_stopped(mock_sleep):
+    """Test start verification fails if the device stays stopped."""
+    client = client_with_states(6, 6)
+
+    assert not control.wait_and_verify_start(client, "101", max_attempts=2, log=lambda message: None)
+
+
+@patch("eddi_scheduler.clock.time.sleep")
+def test_execute_command_with_retry_start(mock_sleep):
+    """Test start command is sent and verified."""
+    client = client_with_states(1)
+    messages = []
+
+    assert control.execute_command_with_retry("start", client, "101", log=messages.append)
+    client.start.assert_called_once_with("101")
+    assert any("started successfully" in message for message in messages)
+
+
+def test_execute_runs_in_virtual_time():
+    """Test an injected clock replaces real sleeps, including the retry backoff."""
+    client = client_with_states(3, 3, 6)
+    clock = VirtualClock()
+
+    ok = control.execute_command_with_retry(
+        "stop", client, "101", max_retries=2, log=lambda message: None,
+        poll=lambda command: control.FixedPoll(30, 15, 2), backoff=Backoff(60, jitter=0), clock=clock,
+    )
+
+    assert ok is True
+    assert client.stop.call_count == 2
+    assert clock.monotonic() == 30 + 15 + 60 + 30
+
+
+def test_adaptive_poll_backs_off_and_resets_on_change():
+    """Test waits grow while nothing changes and reset when the state moves."""
+    strategy = control.AdaptivePoll(first_probe=2, min_interval=2, max_interval=8, timeout=100, backoff=2)
+    delays = strategy.delays()
+
+    observed = [next(delays)]
+    for changed in [False, False, False, True, False]:
+        observed.append(delays.send(changed))
+
+    assert observed == [2, 4, 8, 8, 2, 4]
+
+
+def test_adaptive_poll_respects_timeout():
+    """Test the total wait never exceeds the timeout."""
+    strategy = control.AdaptivePoll(first_probe=5, min_interval=5, max_interval=30, timeout=60)
+    delays = strategy.delays()
+
+    total = next(delays)
+    for delay in iter(lambda: delays.send(False), None):
+        total += delay
+        if total >= 60:
+            break
+
+    assert total == 60
+
+
+def test_fixed_poll_matches_legacy_schedule():
+    """Test the fixed strategy reproduces the old initial wait and interval."""
+    assert list(control.fixed_poll("stop").delays()) == [30] + [15] * 9
+
+
+@patch("eddi_scheduler.clock.time.sleep")
+def test_execute_returns_as_soon_as_target_seen(mock_sleep):
+    """Test adaptive verification does not wait out the old fixed delay."""
+    client = client_with_states(3, 1, 6)
+
+    assert control.execute_command_with_retry("stop", client, "101", log=lambda message: None)
+    waited = sum(call[0][0] for call in mock_sleep.call_args_list)
+    assert waited < control.STOP_INITIAL_WAIT
+
+
+@patch("eddi_scheduler.clock.time.sleep")
+def test_execute_records_latency(mock_sleep):
+    """Test a verified command records its latency."""
+    client = client_with_states(6)
+    latency = Mock()
+    latency.poll_strategy.return_value = control.FixedPoll(0, 1, 1)
+
+    assert control.execute_command_with_retry("stop", client, "101", log=lambda message: None, latency=latency)
+    latency.poll_strategy.assert_called_once_with("101", "stop")
+    serial, command, seconds = latency.record.call_args[0]
+    assert (serial, command) == ("101", "stop")
+    assert seconds >= 0
+
+
+def hub_with_states(states):
+    """Create a mock client whose hub reports one status per serial."""
+    client = Mock()
+    client.get_eddi_statuses.return_value = [
+        EddiStatus.from_dict({"sno": int(serial), "sta": sta}) for serial, sta in states.items()
+    ]
+    client.stop.return_value = {"status": 0}
+    return client
+
+
+def test_reconcile_skips_devices_already_in_state():
+    """Test nothing is sent when every device already matches."""
+    client = hub_with_states({"101": 6, "102": 6})
+
+    results = control.reconcile("stop", client, log=lambda message: None)
+
+    assert [(r.serial, r.changed, r.ok) for r in results] == [("101", False, True), ("102", False, True)]
+    client.get_eddi_statuses.assert_called_once()
+    client.stop.assert_not_called()
+
+
+@patch("eddi_scheduler.control.execute_command_with_retry", return_value=True)
+def test_reconcile_changes_only_differing_devices(mock_execute):
+    """Test only devices in another state get the command."""
+    client = hub_with_states({"101": 6, "102": 3})
+
+    results = control.reconcile("stop", client, log=lambda message: None)
+
+    assert [(r.serial, r.changed) for r in results] == [("101", False), ("102", True)]
+    mock_execute.assert_called_once()
+    assert mock_execute.call_args[0][:3] == ("stop", client, "102")
+
+
+@patch("eddi_scheduler.control.execute_command_with_retry", return_value=True)
+def test_reconcile_sends_when_state_unreadable(mock_execute):
+    """Test explicit devices are still commanded if the status read fails."""
+    client = Mock()
+    client.get_eddi_statuses.side_effect = RuntimeError("timeout")
+
+    results = control.reconcile("start", client, ["101"], log=lambda message: None)
+
+    assert results == [control.ReconcileResult("101", changed=True, ok=True)]
+    client.get_eddi_statuses.assert_called_once_with("101")
+
+
+def hub_with_sequences(sequences):
+    """Create a mock client whose hub reports successive sta values per serial."""
+    polls = [
+        [EddiStatus.from_dict({"sno": int(serial), "sta": states[min(i, len(states) - 1)]})
+         for serial, states in sequences.items()]
+        for i in range(max(len(states) for states in sequences.values()))
+    ]
+    client = Mock()
+    client.get_eddi_statuses.side_effect = polls
+    client.stop.return_value = {"status": 0}
+    return client
+
+
+@patch("eddi_scheduler.clock.time.sleep")
+def test_batch_verifies_devices_from_shared_polls(mock_sleep):
+    """Test each probe reads the hub once and devices finish independently."""
+    client = hub_with_sequences({"101": [1, 6], "102": [3, 1, 1, 6]})
+
+    results = control.execute_batch_with_retry(
+        "stop", client, ["101", "102"], log=lambda message: None, poll=lambda cmd: control.FixedPoll(0, 1, 5)
+    )
+
+    assert results == {"101": True, "102": True}
+    assert sorted(call[0][0] for call in client.stop.call_args_list) == ["101", "102"]
+    assert client.get_eddi_statuses.call_count == 4
+
+
+@patch("eddi_scheduler.clock.time.sleep")
+def test_batch_retries_only_failed_devices(mock_sleep):
+    """Test a retry round resends only to devices that did not converge."""
+    client = hub_with_sequences({"101": [6, 6], "102": [3, 6]})
+
+    results = control.execute_batch_with_retry(
+        "stop", client, ["101", "102"], max_retries=2, log=lambda message: None,
+        poll=lambda cmd: control.FixedPoll(0, 1, 1)
+    )
+
+    assert results == {"101": True, "102": True}
+    assert [call[0][0] for call in client.stop.call_args_list].count("101") == 1
+    assert [call[0][0] for call in client.stop.call_args_list].count("102") == 2
+
+
+def test_batch_without_devices_does_nothing():
+    """Test an empty batch (a hub with no eddis) returns no results instead of failing."""
+    client = Mock()
+
+    assert control.execute_batch_with_retry("stop", client, [], log=lambda message: None) == {}
+    client.stop.assert_not_called()
+
+
+def test_widest_poll_covers_every_device():
+    """Test merged polling probes as early as the fastest and waits as long as the slowest."""
+    merged = control.widest_poll([
+        control.AdaptivePoll(first_probe=10, min_interval=3, max_interval=20, timeout=100),
+        control.AdaptivePoll(first_probe=4, min_interval=5, max_interval=30, timeout=200),
+    ])
+
+    assert (merged.first_probe, merged.min_interval, merged.max_interval, merged.timeout) == (4, 3, 30, 200)
+
+
+def test_poll_strategy_and_clock_are_abstract():
+    """Test the strategy and clock bases cannot be used without their methods."""
+    with pytest.raises(TypeError):
+        control.PollStrategy()
+    with pytest.raises(TypeError):
+        Clock()
@@ -0,0 +1,111 @@
+"""Tests for the scheduler daemon."""
+
+from datetime import datetime, time, timedelta, timezone
+from unittest.mock import Mock, patch
+from eddi_scheduler.daemon import SchedulerDaemon
+from eddi_scheduler.schedule import Rule, Schedule
+
+SCHEDULE = Schedule([Rule(frozenset(range(7)), time(12, 0), "stop")], "UTC")
+
+
+class FakeClock:
+    """A clock that advances when the daemon sleeps."""
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def wait(self, seconds):
+        self.now += timedelta(seconds=seconds)
+        return False
+
+
+def make_daemon(tmp_path, clock):
+    """Create a daemon with a fake clock and temporary state."""
+    daemon = SchedulerDaemon(
+        Mock(), "101", SCHEDULE,
+        state_path=tmp_path / "state.json",
+        log=lambda message: None,
+        now=clock,
+    )
+    daemon.stop_event.wait = clock.wait
+    return daemon
+
+
+@patch("eddi_scheduler.daemon.execute_command_with_retry", return_value=True)
+def test_run_once_sleeps_until_transition(mock_execute, tmp_path):
+    """Test the next transition runs at its scheduled instant."""
+    clock = FakeClock(datetime(2026, 10, 17, 11, 0, tzinfo=timezone.utc))
+    daemon = make_daemon(tmp_path, clock)
+
+    assert daemon.run_once() is True
+    assert clock.now == datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+    assert mock_execute.call_args[0][:3] == ("stop", daemon.client, "101")
+    assert daemon.last_executed() == datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+
+
+@patch("eddi_scheduler.daemon.execute_command_with_retry", return_value=True)
+def test_catch_up_runs_missed_transition_once(mock_execute, tmp_path):
+    """Test a restart shortly after a transition executes it exactly once."""
+    clock = FakeClock(datetime(2026, 10, 17, 12, 10, tzinfo=timezone.utc))
+
+    assert make_daemon(tmp_path, clock).catch_up_missed() is True
+    assert make_daemon(tmp_path, clock).catch_up_missed() is None
+    assert mock_execute.call_count == 1
+
+
+@patch("eddi_scheduler.daemon.execute_command_with_retry", return_value=True)
+def test_catch_up_ignores_old_transitions(mock_execute, tmp_path):
+    """Test transitions older than the catch-up window are skipped."""
+    clock = FakeClock(datetime(2026, 10, 17, 13, 0, tzinfo=timezone.utc))
+
+    assert make_daemon(tmp_path, clock).catch_up_missed() is None
+    mock_execute.assert_not_called()
+
+
+def test_stop_interrupts_wait(tmp_path):
+    """Test stop() ends the wait without executing anything."""
+    clock = FakeClock(datetime(2026, 10, 17, 11, 0, tzinfo=timezone.utc))
+    daemon = make_daemon(tmp_path, clock)
+    daemon.stop()
+
+    assert daemon.run_once() is None
+    assert daemon.last_executed() is None
+
+
+@patch("eddi_scheduler.daemon.execute_command_with_retry")
+def test_run_once_issues_command_early_by_lead_time(mock_execute, tmp_path):
+    """Test commands fire ahead by the expected latency and report landing error."""
+    clock = FakeClock(datetime(2026, 10, 17, 11, 0, tzinfo=timezone.utc))
+    daemon = make_daemon(tmp_path, clock)
+    daemon.latency = Mock()
+    daemon.latency.lead_time.return_value = 150.0
+
+    def verify_after_140s(*args, **kwargs):
+        clock.now += timedelta(seconds=140)
+        return True
+
+    mock_execute.side_effect = verify_after_140s
+
+    assert daemon.run_once() is True
+    daemon.latency.lead_time.assert_called_once_with("101", "stop", 50)
+    assert daemon.state.load()["landing_error"] == -10.0
+
+    # The transition already ran, so the next one is tomorrow's
+    mock_execute.side_effect = None
+    mock_execute.return_value = True
+    daemon.run_once()
+    assert clock.now.date() == datetime(2026, 10, 18).date()
+    assert mock_execute.call_count == 2
+
+
+def test_configured_lead_overrides_latency_model(tmp_path):
+    """Test explicit lead times win over measured ones."""
+    daemon = make_daemon(tmp_path, FakeClock(datetime(2026, 10, 17, tzinfo=timezone.utc)))
+    daemon.latency = Mock()
+    daemon.lead_times = {"stop": 30}
+
+    assert daemon.lead_time("stop") == timedelta(seconds=30)
+    daemon.latency.lead_time.assert_not_called()
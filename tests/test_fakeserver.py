@@ -0,0 +1,91 @@
+"""Tests for the local fake myenergi server."""
+
+import pytest
+import requests
+from eddi_scheduler.client import EddiClient
+from eddi_scheduler.control import FixedPoll, execute_command_with_retry
+from eddi_scheduler.fakeserver import FakeEddi, FakeHub, FakeMyenergiServer, make_hubs
+from eddi_scheduler.fleet import Hub, run_fleet
+
+
+@pytest.fixture
+def server():
+    """A fake server with one hub, running in the background."""
+    with FakeMyenergiServer([FakeHub("12345678", "secret", [FakeEddi(10088888)])], time_scale=0.01) as server:
+        yield server
+
+
+def test_status_with_digest_auth(server):
+    """Test a real client authenticates and parses fake statuses."""
+    client = EddiClient("12345678", "secret", base_url=server.url)
+
+    statuses = client.get_eddi_statuses()
+
+    assert [(s.serial, s.sta) for s in statuses] == [(10088888, 3)]
+    assert client.get_eddi_devices("10088888")[0]["sno"] == 10088888
+
+
+def test_wrong_api_key_is_rejected(server):
+    """Test a bad password gets a 401 like the real API."""
+    client = EddiClient("12345678", "wrong", base_url=server.url, persist_digest=False)
+
+    with pytest.raises(requests.HTTPError, match="401"):
+        client.get_status()
+
+
+def test_stop_moves_through_intermediate_states():
+    """Test a stop goes 3 -> 1 -> 6 after the configured delays."""
+    eddi = FakeEddi(1)
+    eddi.set_mode("stop", 0.0, (10, 150), (45, 60))
+
+    assert eddi.status(5)["sta"] == 3
+    assert eddi.status(20)["sta"] == 1
+    assert eddi.status(150)["sta"] == 6
+
+
+def test_stop_is_verified_end_to_end(server):
+    """Test execute_command_with_retry verifies a stop against the simulation."""
+    client = EddiClient("12345678", "secret", base_url=server.url)
+
+    ok = execute_command_with_retry(
+        "stop", client, "10088888", max_retries=1, log=lambda message: None,
+        poll=lambda command: FixedPoll(0, 0.1, 40),
+    )
+
+    assert ok is True
+    assert client.get_eddi_statuses("10088888")[0].sta == 6
+
+
+def test_fleet_across_hubs_with_errors():
+    """Test fleet status over several hubs, with injected errors reported per hub."""
+    hubs = make_hubs(3, eddis_per_hub=2)
+    with FakeMyenergiServer(hubs, error_rate=1.0) as failing, FakeMyenergiServer(hubs) as working:
+        inventory = [Hub(f"hub{i}", hub.serial, hub.api_key, working.url) for i, hub in enumerate(hubs)]
+        inventory.append(Hub("broken", hubs[0].serial, hubs[0].api_key, failing.url))
+
+        results = run_fleet("status", inventory)
+
+    assert sum(r.ok for r in results) == 6
+    assert [r.hub for r in results if not r.ok] == ["broken"]
+    assert "500" in results[-1].detail
+
+
+def test_stale_persisted_nonce_costs_one_round_trip():
+    """Test an expired saved nonce gets stale=true and is replaced after one extra 401."""
+    clock = [0.0]
+    hub = FakeHub("12345678", "secret", [FakeEddi(10088888)])
+    with FakeMyenergiServer([hub], clock=lambda: clock[0], nonce_lifetime=60) as server:
+        EddiClient("12345678", "secret", base_url=server.url).get_status()
+        EddiClient("12345678", "secret", base_url=server.url).get_status()
+        assert server.challenges == 1
+
+        clock[0] = 120.0
+        client = EddiClient("12345678", "secret", base_url=server.url)
+        response = client.session.get(f"{server.url}/cgi-jstatus-*")
+        assert response.status_code == 200
+        assert "stale=true" in response.history[0].headers["WWW-Authenticate"]
+        client.auth.persist()
+        assert server.challenges == 2
+
+        EddiClient("12345678", "secret", base_url=server.url).get_status()
+        assert server.challenges == 2
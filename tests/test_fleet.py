@@ -0,0 +1,120 @@
+"""Tests for fleet mode."""
+
+import pytest
+from unittest.mock import Mock, patch
+from eddi_scheduler.fleet import Hub, load_inventory, run_fleet, format_results
+from eddi_scheduler.models import EddiStatus
+
+
+INVENTORY = """
+[defaults]
+base_url = "https://s11.myenergi.net"
+
+[[hub]]
+name = "home"
+serial = "11111111"
+api_key = "key1"
+
+[[hub]]
+serial = "22222222"
+api_key_env = "TEST_HUB_KEY"
+device = 10099999
+base_url = "https://s18.myenergi.net"
+"""
+
+
+def fake_factory(devices_by_serial):
+    """Create a client factory returning mocks with canned devices."""
+    def factory(serial, api_key, base_url):
+        client = Mock()
+        client.get_eddi_devices.return_value = devices_by_serial[serial]
+        client.get_eddi_statuses.return_value = [
+            EddiStatus.from_dict(device) for device in devices_by_serial[serial]
+        ]
+        return client
+    return factory
+
+
+def test_load_inventory(tmp_path, monkeypatch):
+    """Test loading hubs with defaults and env var keys."""
+    monkeypatch.setenv("TEST_HUB_KEY", "key2")
+    path = tmp_path / "inventory.toml"
+    path.write_text(INVENTORY)
+
+    hubs = load_inventory(path)
+
+    assert hubs == [
+        Hub("home", "11111111", "key1", "https://s11.myenergi.net", None),
+        Hub("22222222", "22222222", "key2", "https://s18.myenergi.net", "10099999"),
+    ]
+
+
+def test_load_inventory_missing_key(tmp_path, monkeypatch):
+    """Test a hub without an API key is rejected."""
+    monkeypatch.delenv("TEST_HUB_KEY", raising=False)
+    path = tmp_path / "inventory.toml"
+    path.write_text(INVENTORY)
+
+    with pytest.raises(ValueError, match="22222222"):
+        load_inventory(path)
+
+
+def test_run_fleet_status():
+    """Test status reports every device of every hub in order."""
+    hubs = [Hub("a", "1", "k"), Hub("b", "2", "k")]
+    factory = fake_factory({
+        "1": [{"sno": 101, "sta": 3, "div": 1200, "grd": -50}],
+        "2": [],
+    })
+
+    results = run_fleet("status", hubs, client_factory=factory)
+
+    assert [(r.hub, r.device, r.ok) for r in results] == [("a", "101", True), ("b", None, False)]
+    assert "Diverting" in results[0].detail
+
+
+@patch("eddi_scheduler.fleet.execute_command_with_retry")
+def test_run_fleet_stop_uses_first_device(mock_execute):
+    """Test stop resolves the first eddi and verifies it."""
+    mock_execute.return_value = True
+    factory = fake_factory({"1": [{"sno": 101}, {"sno": 102}]})
+
+    results = run_fleet("stop", [Hub("a", "1", "k")], max_retries=2, client_factory=factory)
+
+    assert results[0].ok
+    assert results[0].device == "101"
+    assert mock_execute.call_args[0][0] == "stop"
+    assert mock_execute.call_args[0][2] == "101"
+
+
+def test_run_fleet_error_is_reported():
+    """Test an exception on one hub does not abort the others."""
+    def factory(serial, api_key, base_url):
+        client = Mock()
+        client.get_eddi_statuses.side_effect = RuntimeError("boom")
+        return client
+
+    results = run_fleet("status", [Hub("a", "1", "k")], client_factory=factory)
+
+    assert not results[0].ok
+    assert "boom" in results[0].detail
+
+
+def test_run_fleet_invalid_command():
+    """Test unknown commands are rejected."""
+    with pytest.raises(ValueError, match="Invalid command"):
+        run_fleet("reboot", [Hub("a", "1", "k")])
+
+
+def test_format_results():
+    """Test result table layout."""
+    results = run_fleet(
+        "status",
+        [Hub("home", "1", "k")],
+        client_factory=fake_factory({"1": [{"sno": 101, "sta": 6}]})
+    )
+
+    lines = format_results(results).splitlines()
+
+    assert lines[0].split() == ["HUB", "DEVICE", "RESULT", "TIME", "DETAIL"]
+    assert lines[1].split()[:3] == ["home", "101", "OK"]
@@ -0,0 +1,221 @@
+"""Tests for the local status gateway."""
+
+import asyncio
+import json
+import threading
+from unittest.mock import Mock
+from eddi_scheduler.gateway import Gateway, HubPoller, allowed_hosts, serve, typed_fields
+
+
+TOKEN = "s3cret"
+
+
+def make_gateway(devices=None, now=lambda: 1000.0):
+    """Create a gateway over one hub whose client returns the given devices."""
+    client = Mock()
+    client.get_eddi_devices.return_value = devices or [{"sno": 101, "sta": 3, "div": 1500}]
+    client.set_mode.return_value = {"status": 0}
+    poller = HubPoller("home", client, interval=5, now=now)
+    return Gateway([poller], token=TOKEN), poller, client
+
+
+async def request(address, method, path, **headers):
+    """Send one request and return (status code, decoded JSON body)."""
+    headers = {"Host": "%s:%d" % tuple(address), "Connection": "close", **headers}
+    reader, writer = await asyncio.open_connection(*address)
+    lines = "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+    writer.write(f"{method} {path} HTTP/1.1\r\n{lines}\r\n".encode())
+    await writer.drain()
+    head, _, body = (await reader.read()).partition(b"\r\n\r\n")
+    writer.close()
+    return int(head.split()[1]), json.loads(body)
+
+
+def test_typed_fields_renames_api_keys():
+    """Test API keys become field names and unknown keys are dropped."""
+    assert typed_fields({"sno": 101, "div": 1500, "pri": 1}) == {"serial": 101, "diversion": 1500}
+
+
+def test_status_is_served_from_cache_with_freshness():
+    """Test readers get the cached state without extra upstream requests."""
+    clock = [1000.0]
+    gateway, poller, client = make_gateway(now=lambda: clock[0])
+    poller.watcher.sample()
+    poller.updated = 1000.0
+    clock[0] = 1002.0
+
+    for _ in range(3):
+        states = gateway.snapshot()
+    assert client.get_eddi_devices.call_count == 1
+    assert states[0]["status"]["diversion"] == 1500
+    assert states[0]["status"]["status_text"] == "Diverting"
+    assert (states[0]["age"], states[0]["stale"]) == (2.0, False)
+
+    clock[0] = 1016.0
+    assert gateway.snapshot()[0]["stale"] is True
+
+
+def test_identical_commands_are_sent_once():
+    """Test concurrent and repeated identical commands reach the hub once."""
+    gateway, poller, client = make_gateway()
+    poller.watcher.sample()
+    poller.updated = 1000.0
+    release = threading.Event()
+    client.set_mode.side_effect = lambda serial, mode: release.wait(5) and {"status": 0}
+
+    async def run():
+        first = asyncio.ensure_future(gateway.command("101", "stop"))
+        second = asyncio.ensure_future(gateway.command("101", "stop"))
+        await asyncio.sleep(0.05)
+        release.set()
+        results = await asyncio.gather(first, second)
+        return results + [await gateway.command("101", "stop"), await gateway.command("101", "start")]
+
+    concurrent, coalesced, repeated, opposite = asyncio.run(run())
+
+    assert (concurrent["sent"], coalesced["coalesced"], repeated["sent"], opposite["sent"]) == (True, True, False, True)
+    assert [c.args for c in client.set_mode.call_args_list] == [("101", "stop"), ("101", "normal")]
+
+
+def test_command_skipped_when_fresh_state_matches():
+    """Test no command is sent when the cached state is already in that mode."""
+    gateway, poller, client = make_gateway([{"sno": 101, "sta": 6}])
+    poller.watcher.sample()
+    poller.updated = 1000.0
+
+    result = asyncio.run(gateway.command("101", "stop"))
+
+    assert result["sent"] is False
+    client.set_mode.assert_not_called()
+
+
+def test_repeats_are_suppressed_until_the_command_settles():
+    """Test a repeat is not sent while the device moves 3 -> 1, and the polled state decides once it settles."""
+    clock = [1000.0]
+    gateway, poller, client = make_gateway(now=lambda: clock[0])
+
+    def sample(sta):
+        client.get_eddi_devices.return_value = [{"sno": 101, "sta": sta}]
+        poller.updated = poller.sampled = clock[0]
+        gateway.publish("home", poller.watcher.sample())
+
+    sample(3)
+    assert asyncio.run(gateway.command("101", "stop"))["sent"] is True
+    for sta in (3, 1):
+        clock[0] += 5
+        sample(sta)
+        assert asyncio.run(gateway.command("101", "stop"))["sent"] is False
+
+    clock[0] += 5
+    sample(6)
+    clock[0] += 5
+    sample(3)  # started again outside the gateway
+    assert asyncio.run(gateway.command("101", "stop"))["sent"] is True
+    assert client.set_mode.call_count == 2
+
+
+def test_repeat_is_sent_after_the_window_if_the_command_was_lost():
+    """Test a stop that never took effect can be sent again once DUPLICATE_WINDOW has passed."""
+    clock = [1000.0]
+    gateway, poller, client = make_gateway(now=lambda: clock[0])
+    poller.watcher.sample()
+    poller.updated = poller.sampled = 1000.0
+
+    assert asyncio.run(gateway.command("101", "stop"))["sent"] is True
+    clock[0] = 1061.0
+    poller.watcher.sample()
+    poller.updated = poller.sampled = 1061.0
+
+    assert asyncio.run(gateway.command("101", "stop"))["sent"] is True
+
+
+def test_http_routes_and_event_stream():
+    """Test status and command routes, and that changes reach event streams."""
+    gateway, poller, client = make_gateway()
+
+    async def run():
+        stop = asyncio.Event()
+        address = []
+        server = asyncio.ensure_future(serve(gateway, "127.0.0.1", 0, stop, address.extend))
+        while poller.updated is None:
+            await asyncio.sleep(0.01)
+
+        reader, writer = await asyncio.open_connection(*address)
+        writer.write(b"GET /events?device=101 HTTP/1.1\r\nHost: %s:%d\r\n\r\n" % (address[0].encode(), address[1]))
+        await writer.drain()
+        while b"event: snapshot" not in await reader.readline():
+            pass
+
+        client.get_eddi_devices.return_value = [{"sno": 101, "sta": 6, "div": 0}]
+        results = [
+            await request(address, "GET", "/status/101"),
+            await request(address, "GET", "/status/999"),
+            await request(address, "POST", "/devices/101/stop", Authorization=f"Bearer {TOKEN}"),
+        ]
+        while b"event: status" not in await reader.readline():
+            pass
+        event = json.loads((await reader.readline())[len(b"data: "):])
+        writer.close()
+        stop.set()
+        await server
+        return results, event
+
+    results, event = asyncio.run(run())
+
+    assert results[0][0] == 200 and results[0][1]["status"]["sta"] == 3
+    assert results[1][0] == 404
+    assert results[2][0] == 200 and results[2][1]["sent"] is True
+    assert event["changes"] == {"sta": 6, "diversion": 0}
+    client.set_mode.assert_called_once_with("101", "stop")
+
+
+def test_bad_content_length_is_rejected():
+    """Test a malformed Content-Length gets 400 instead of breaking the handler."""
+    gateway, poller, client = make_gateway()
+
+    async def run():
+        server = await asyncio.start_server(gateway.handle, "127.0.0.1", 0)
+        reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+        writer.write(b"GET /status HTTP/1.1\r\nHost: test\r\nContent-Length: ten\r\n\r\n")
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return response
+
+    assert asyncio.run(run()).startswith(b"HTTP/1.1 400 ")
+
+
+def test_untrusted_requests_are_refused():
+    """Test commands need the token, and foreign Host or Origin headers are rejected."""
+    gateway, poller, client = make_gateway()
+
+    async def run():
+        stop = asyncio.Event()
+        address = []
+        server = asyncio.ensure_future(serve(gateway, "127.0.0.1", 0, stop, address.extend))
+        while poller.updated is None:
+            await asyncio.sleep(0.01)
+        port = address[1]
+        results = [
+            await request(address, "POST", "/devices/101/stop"),
+            await request(address, "POST", "/devices/101/stop", Authorization="Bearer wrong"),
+            await request(address, "GET", "/status", Host=f"evil.example:{port}"),
+            await request(address, "POST", "/devices/101/stop", Authorization=f"Bearer {TOKEN}",
+                          Origin="https://evil.example"),
+            await request(address, "GET", "/status", Host=f"localhost:{port}", Origin=f"http://localhost:{port}"),
+        ]
+        stop.set()
+        await server
+        return [status for status, _ in results]
+
+    assert asyncio.run(run()) == [401, 401, 403, 403, 200]
+    client.set_mode.assert_not_called()
+
+
+def test_allowed_hosts():
+    """Test loopback bindings accept their aliases and wildcard bindings accept any Host."""
+    assert allowed_hosts("127.0.0.1", 8765) == {"127.0.0.1:8765", "localhost:8765", "[::1]:8765"}
+    assert allowed_hosts("192.168.1.5", 80) == {"192.168.1.5:80", "192.168.1.5"}
+    assert allowed_hosts("0.0.0.0", 8765) is None
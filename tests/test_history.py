@@ -0,0 +1,72 @@
+"""Tests for history download and caching."""
+
+from datetime import date, datetime, timezone
+from unittest.mock import Mock
+import pytest
+from eddi_scheduler.history import (
+    HistoryCache, fetch_history, history_path, history_records, is_complete
+)
+
+NOW = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+
+
+def day_payload(path):
+    """Fake API response: two minutes of the day named in the path."""
+    year, month, day = map(int, path.rsplit("-", 3)[1:])
+    return {"U101": [
+        {"yr": year, "mon": month, "dom": day, "dow": "Mon", "h1d": 60000},
+        {"yr": year, "mon": month, "dom": day, "hr": 12, "min": 30, "imp": 1200},
+    ]}
+
+
+def test_history_path():
+    """Test minute and hourly endpoints."""
+    assert history_path("101", date(2026, 1, 2)) == "cgi-jday-E101-2026-01-02"
+    assert history_path("101", date(2026, 1, 2), hourly=True) == "cgi-jdayhour-E101-2026-01-02"
+
+
+def test_history_records_add_timestamps():
+    """Test missing hour and minute default to zero."""
+    records = history_records(day_payload("cgi-jday-E101-2026-10-16"))
+
+    assert [r["ts"] for r in records] == [
+        int(datetime(2026, 10, 16, tzinfo=timezone.utc).timestamp()),
+        int(datetime(2026, 10, 16, 12, 30, tzinfo=timezone.utc).timestamp()),
+    ]
+
+
+def test_is_complete():
+    """Test only days ended (plus settle time) are complete."""
+    assert is_complete(date(2026, 10, 16), NOW)
+    assert not is_complete(date(2026, 10, 17), NOW)
+    assert not is_complete(date(2026, 10, 16), datetime(2026, 10, 17, 0, 30, tzinfo=timezone.utc))
+
+
+def test_fetch_history_caches_past_days_only(tmp_path):
+    """Test a rerun only refetches today."""
+    get = Mock(side_effect=day_payload)
+    cache = HistoryCache(tmp_path)
+
+    first = fetch_history(get, "101", date(2026, 10, 14), date(2026, 10, 17), cache=cache, now=NOW)
+    assert get.call_count == 4
+    assert len(first) == 8
+
+    get.reset_mock()
+    second = fetch_history(get, "101", date(2026, 10, 14), date(2026, 10, 17), cache=cache, now=NOW)
+    get.assert_called_once_with("cgi-jday-E101-2026-10-17")
+    assert second == first
+
+
+def test_fetch_history_keeps_day_order():
+    """Test records come back in day order whatever the completion order."""
+    get = Mock(side_effect=day_payload)
+
+    records = fetch_history(get, "101", date(2026, 9, 1), date(2026, 9, 30), max_workers=8, now=NOW)
+
+    assert [r["ts"] for r in records] == sorted(r["ts"] for r in records)
+
+
+def test_fetch_history_rejects_reversed_range():
+    """Test end before start is an error."""
+    with pytest.raises(ValueError):
+        fetch_history(Mock(), "101", date(2026, 10, 2), date(2026, 10, 1))
@@ -0,0 +1,49 @@
+"""Tests for the learned latency model."""
+
+import pytest
+from eddi_scheduler.control import AdaptivePoll, STOP_POLL
+from eddi_scheduler.latency import LatencyModel, LatencyStore, percentile
+
+
+@pytest.fixture
+def model(tmp_path):
+    """Create a model backed by a temporary store."""
+    return LatencyModel(LatencyStore(tmp_path / "latency.json", max_samples=5))
+
+
+def test_percentile_interpolates():
+    """Test percentiles interpolate between samples."""
+    assert percentile([10, 20, 30, 40], 50) == 25
+    assert percentile([10], 90) == 10
+
+
+def test_defaults_until_enough_samples(model):
+    """Test the default latency is used with too few samples."""
+    model.record("101", "stop", 40)
+
+    assert model.percentile("101", "stop", 50) is None
+    assert model.lead_time("101", "stop") == 150
+    assert model.poll_strategy("101", "stop") is STOP_POLL
+
+
+def test_learned_values_per_device_and_command(model):
+    """Test samples are kept separately and capped."""
+    for seconds in [100, 10, 20, 30, 40, 50]:
+        model.record("101", "stop", seconds)
+    model.record("102", "stop", 999)
+
+    assert model.store.samples("101", "stop") == [10, 20, 30, 40, 50]
+    assert model.lead_time("101", "stop") == 30
+    assert model.store.keys() == [("101", "stop"), ("102", "stop")]
+
+
+def test_poll_strategy_sized_from_samples(model):
+    """Test polling is tightened around the measured latencies."""
+    for seconds in [20, 22, 24, 26, 28]:
+        model.record("101", "start", seconds)
+
+    strategy = model.poll_strategy("101", "start")
+
+    assert isinstance(strategy, AdaptivePoll)
+    assert 15 < strategy.first_probe < 22
+    assert strategy.timeout == pytest.approx(2 * percentile([20, 22, 24, 26, 28], 95))
@@ -0,0 +1,87 @@
+"""Tests for request and command metrics."""
+
+import urllib.request
+import pytest
+from unittest.mock import Mock
+from eddi_scheduler.client import EddiClient
+from eddi_scheduler.clock import VirtualClock
+from eddi_scheduler.control import FixedPoll, execute_command_with_retry
+from eddi_scheduler.fakeserver import FakeHub, FakeMyenergiServer
+from eddi_scheduler.metrics import FileExporter, MetricsRegistry, RequestEvent, endpoint_name, serve
+from eddi_scheduler.models import EddiStatus
+
+
+def test_endpoint_name_drops_serials_and_values():
+    """Test endpoint labels do not grow with serials, dates or modes."""
+    assert endpoint_name("cgi-eddi-mode-E10088888-0") == "cgi-eddi-mode-E"
+    assert endpoint_name("/cgi-jday-E10088888-2026-10-17") == "cgi-jday-E"
+    assert endpoint_name("cgi-jstatus-*") == "cgi-jstatus-*"
+
+
+def test_openmetrics_text():
+    """Test counters and histograms render in the OpenMetrics format."""
+    registry = MetricsRegistry()
+    registry.record_request(RequestEvent("cgi-jstatus-E1", 0.2, 200, 120, challenges=1))
+    registry.record_request(RequestEvent("cgi-jstatus-E1", 3.0, error="ConnectTimeout"))
+
+    text = registry.to_openmetrics()
+
+    assert '# TYPE eddi_request_duration_seconds histogram' in text
+    assert 'eddi_request_duration_seconds_bucket{endpoint="cgi-jstatus-E",le="0.25"} 1' in text
+    assert 'eddi_request_duration_seconds_bucket{endpoint="cgi-jstatus-E",le="+Inf"} 2' in text
+    assert 'eddi_responses_total{code="200",endpoint="cgi-jstatus-E"} 1' in text
+    assert 'eddi_request_errors_total{endpoint="cgi-jstatus-E",error="ConnectTimeout"} 1' in text
+    assert 'eddi_digest_challenges_total{endpoint="cgi-jstatus-E"} 1' in text
+    assert text.endswith("# EOF\n")
+
+
+def test_client_reports_requests_to_hooks():
+    """Test a real exchange reports status code, bytes and the digest challenge."""
+    registry = MetricsRegistry()
+    events = []
+    with FakeMyenergiServer([FakeHub("12345678", "secret")]) as server:
+        client = EddiClient("12345678", "secret", base_url=server.url, persist_digest=False,
+                            hooks=[registry.record_request, events.append])
+        client.get_status()
+        client.get_status()
+
+    assert [(e.status_code, e.challenges) for e in events] == [(200, 1), (200, 0)]
+    assert all(e.bytes > 0 for e in events)
+    snapshot = registry.snapshot()
+    assert snapshot["eddi_digest_challenges"] == [{"labels": {"endpoint": "cgi-jstatus-*"}, "value": 1}]
+    assert snapshot["eddi_request_duration_seconds"][0]["count"] == 2
+
+
+def test_command_retries_and_verify_durations():
+    """Test each attempt is counted with its verification time."""
+    registry = MetricsRegistry()
+    client = Mock()
+    client.get_eddi_statuses.side_effect = [[EddiStatus.from_dict({"sno": 101, "sta": sta})] for sta in (3, 6)]
+
+    execute_command_with_retry(
+        "stop", client, "101", max_retries=2, log=lambda message: None,
+        poll=lambda command: FixedPoll(40, 10, 1), retry_delay=30, clock=VirtualClock(), metrics=registry,
+    )
+
+    snapshot = registry.snapshot()
+    assert {(s["labels"]["result"], s["value"]) for s in snapshot["eddi_commands"]} == {("unverified", 1), ("verified", 1)}
+    assert snapshot["eddi_command_retries"][0]["value"] == 1
+    verified = next(s for s in snapshot["eddi_verify_duration_seconds"] if s["labels"]["result"] == "verified")
+    assert verified["sum"] == pytest.approx(40)
+
+
+def test_metrics_endpoint_and_file(tmp_path):
+    """Test the registry is served on /metrics and written on exporter stop."""
+    registry = MetricsRegistry()
+    registry.inc("eddi_command_retries", command="stop")
+    server = serve(0, registry=registry)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert "application/openmetrics-text" in response.headers["Content-Type"]
+            assert b'eddi_command_retries_total{command="stop"} 1' in response.read()
+    finally:
+        server.shutdown()
+
+    FileExporter(tmp_path / "metrics.prom", registry, interval=3600).start().stop()
+    assert "eddi_command_retries_total" in (tmp_path / "metrics.prom").read_text()
@@ -0,0 +1,61 @@
+"""Tests for the typed status models."""
+
+import copy
+import dataclasses
+import pickle
+import pytest
+from eddi_scheduler.models import EddiState, EddiStatus, STATUS_CODES, parse_eddi_statuses
+
+
+PAYLOAD = b'''[
+    {"eddi": [
+        {"sno": 10088888, "sta": 3, "div": 1200, "grd": -45, "gen": 3000,
+         "tp1": 61, "tp2": -1, "ht1": "Tank 1", "ht2": "Tank 2", "che": 2.4,
+         "frq": 50.01},
+        {"sno": 10099999, "sta": 2}
+    ]},
+    {"zappi": [{"sno": 1}]}
+]'''
+
+
+def test_parse_all_fields():
+    """Test every mapped field is parsed from raw bytes."""
+    first, second = parse_eddi_statuses(PAYLOAD)
+
+    assert first == EddiStatus(10088888, 3, 1200, -45, 3000, 61, -1, "Tank 1", "Tank 2", 2.4)
+    assert first.state is EddiState.DIVERTING
+    assert first.status_text == "Diverting"
+    assert second.state is None
+    assert second.status_text == "Unknown (2)"
+
+
+def test_status_survives_pickle_and_deepcopy():
+    """Test frozen slotted snapshots round-trip through pickle and copy."""
+    status, _ = parse_eddi_statuses(PAYLOAD)
+
+    assert pickle.loads(pickle.dumps(status)) == status
+    assert copy.deepcopy(status) == status
+    assert copy.copy(status) == status
+
+
+def test_status_is_compact_and_frozen():
+    """Test snapshots use slots and cannot be modified."""
+    status = EddiStatus.from_dict({"sno": 1, "sta": 6})
+
+    assert not hasattr(status, "__dict__")
+    assert status.is_stopped
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        status.sta = 3
+
+
+def test_status_codes_match_enum():
+    """Test the legacy lookup table is derived from the enum."""
+    assert STATUS_CODES == {1: "Paused", 3: "Diverting", 4: "Boosting", 5: "Max Temp Reached", 6: "Stopped"}
+
+
+def test_in_mode():
+    """Test stop needs sta=6 while normal accepts any other known state."""
+    assert EddiStatus.from_dict({"sno": 1, "sta": 6}).in_mode("stop")
+    assert not EddiStatus.from_dict({"sno": 1, "sta": 1}).in_mode("stop")
+    assert EddiStatus.from_dict({"sno": 1, "sta": 1}).in_mode("normal")
+    assert not EddiStatus.from_dict({"sno": 1}).in_mode("normal")
@@ -0,0 +1,119 @@
+"""Tests for the telemetry recorder."""
+
+import os
+from unittest.mock import Mock
+import pytest
+from eddi_scheduler.models import EddiStatus
+from eddi_scheduler.recorder import (
+    HEADER, RECORD, Recorder, Sample, TelemetryStore, read_header, segment_name
+)
+
+# 2026-10-17 00:00:00 UTC
+DAY = 1792195200
+
+
+def status(serial=101, sta=3, div=1500, grd=-200, tp1=55.5, tp2=None):
+    """Build a status snapshot."""
+    return EddiStatus.from_dict({"sno": serial, "sta": sta, "div": div, "grd": grd, "tp1": tp1, "tp2": tp2})
+
+
+def test_samples_round_trip(tmp_path):
+    """Test values, including missing ones, survive encoding."""
+    store = TelemetryStore(tmp_path)
+    store.append(DAY + 10, [status()])
+
+    assert list(store.samples(101)) == [Sample(DAY + 10, 3, 1500, -200, 55.5, None)]
+
+
+def test_segments_rotate_daily_with_header(tmp_path):
+    """Test each UTC day gets its own segment file with a header."""
+    store = TelemetryStore(tmp_path)
+    store.append(DAY + 86390, [status()])
+    store.append(DAY + 86400, [status()])
+
+    segments = store.segments(101)
+    assert [p.name for p in segments] == [segment_name(DAY), segment_name(DAY + 86400)]
+    assert read_header(segments[1]) == (101, DAY + 86400)
+    assert os.path.getsize(segments[0]) == HEADER.size + RECORD.size
+
+
+def test_append_skips_samples_not_newer(tmp_path):
+    """Test repeated or older timestamps are not written twice."""
+    store = TelemetryStore(tmp_path)
+
+    assert store.append(DAY + 10, [status()]) == 1
+    assert store.append(DAY + 10, [status()]) == 0
+    assert TelemetryStore(tmp_path).append(DAY + 5, [status()]) == 0
+
+
+def test_partial_record_is_ignored_and_repaired(tmp_path):
+    """Test a record cut short by a crash is dropped on read and on reopen."""
+    store = TelemetryStore(tmp_path)
+    store.append(DAY + 10, [status()])
+    (path,) = store.segments(101)
+    with open(path, "ab") as f:
+        f.write(b"\x01\x02\x03")
+
+    assert len(list(store.samples(101))) == 1
+    TelemetryStore(tmp_path).append(DAY + 20, [status(sta=6)])
+    assert [s.sta for s in store.samples(101)] == [3, 6]
+
+
+def test_load_memory_maps_time_range(tmp_path):
+    """Test the NumPy reader cuts a range across segments."""
+    np = pytest.importorskip("numpy")
+    store = TelemetryStore(tmp_path)
+    for offset in range(0, 2 * 86400, 3600):
+        store.append(DAY + offset, [status(div=offset // 3600)])
+
+    rows = store.load(101, DAY + 20 * 3600, DAY + 30 * 3600)
+
+    assert rows["ts"].tolist() == [DAY + h * 3600 for h in range(20, 30)]
+    assert rows["diversion"].tolist() == list(range(20, 30))
+    assert rows.dtype.names == ("ts", "diversion", "grid", "temp1", "temp2", "sta")
+    assert np.all(rows["temp1"] == 555)
+
+
+def test_recorder_writes_every_device(tmp_path):
+    """Test one poll records all eddis on the hub."""
+    client = Mock()
+    client.get_eddi_statuses.return_value = [status(101), status(102, sta=6)]
+    store = TelemetryStore(tmp_path)
+    recorder = Recorder(client, store, interval=10, clock=lambda: DAY + 30)
+
+    recorder.run(count=1)
+
+    assert store.devices() == ["101", "102"]
+    assert [s.sta for s in store.samples(102)] == [6]
+
+
+def test_corrupt_segment_is_set_aside(tmp_path):
+    """Test a segment with a bad header is renamed and recording continues in a new one."""
+    messages = []
+    TelemetryStore(tmp_path).append(DAY + 10, [status()])
+    (path,) = TelemetryStore(tmp_path).segments(101)
+    with open(path, "r+b") as f:
+        f.write(b"garbage!")
+
+    store = TelemetryStore(tmp_path, log=messages.append)
+    assert store.append(DAY + 20, [status(sta=6)]) == 1
+
+    assert [s.sta for s in store.samples(101)] == [6]
+    assert (path.parent / (path.name + ".corrupt")).exists()
+    assert len(messages) == 1
+
+
+def test_recorder_polls_every_hub(tmp_path):
+    """Test a fleet of clients is sampled together and a failing hub does not stop the others."""
+    messages = []
+    home, cabin, shed = Mock(serial_number="1"), Mock(serial_number="2"), Mock(serial_number="3")
+    home.get_eddi_statuses.return_value = [status(101)]
+    cabin.get_eddi_statuses.side_effect = ConnectionError("down")
+    shed.get_eddi_statuses.return_value = [status(301)]
+    store = TelemetryStore(tmp_path)
+    recorder = Recorder([home, cabin, shed], store, interval=10, log=messages.append, clock=lambda: DAY + 30)
+
+    assert recorder.sample() == 2
+
+    assert store.devices() == ["101", "301"]
+    assert messages == ["[2] Error polling status: down"]
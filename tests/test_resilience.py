@@ -0,0 +1,156 @@
+"""Tests for retry budgets, backoff and circuit breakers."""
+
+import pytest
+from unittest.mock import Mock
+from eddi_scheduler.client import EddiClient
+from eddi_scheduler.clock import VirtualClock
+from eddi_scheduler.control import FixedPoll, execute_command_with_retry
+from eddi_scheduler.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    Backoff,
+    CircuitBreaker,
+    CircuitOpenError,
+    Resilience,
+    RetryBudget,
+)
+from tests.test_client import mock_response
+
+
+def test_backoff_grows_with_bounded_jitter():
+    """Test delays double per retry, are capped, and jitter only shortens them."""
+    exact = Backoff(10, cap=50, jitter=0)
+    assert [exact.delay(n) for n in (1, 2, 3, 4)] == [10, 20, 40, 50]
+
+    jittered = Backoff(10, jitter=0.5, seed=1)
+    delays = [jittered.delay(1) for _ in range(100)]
+    assert all(5 <= d <= 10 for d in delays)
+    assert len(set(delays)) > 1
+
+
+def test_retry_budget_is_a_fraction_of_attempts():
+    """Test retries beyond the minimum need first attempts to pay for them."""
+    budget = RetryBudget(ratio=0.5, minimum=1)
+
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    budget.record_attempt(2)
+    assert budget.try_spend()
+
+
+def test_retry_budget_only_counts_the_window():
+    """Test a long healthy stretch does not bank retries for a later outage."""
+    clock = VirtualClock()
+    budget = RetryBudget(ratio=0.5, minimum=1, window=60, clock=clock)
+    for _ in range(100):
+        budget.record_attempt(10)
+        clock.advance(10)
+
+    assert budget.tokens == 1 + 0.5 * 50
+    clock.advance(60)
+    assert budget.tokens == 1
+    assert budget.try_spend()
+    assert not budget.try_spend()
+
+
+def test_breaker_opens_fails_fast_and_probes():
+    """Test the breaker opens after repeated failures and lets one probe through later."""
+    clock = VirtualClock()
+    breaker = CircuitBreaker("https://s18", failure_threshold=2, reset_timeout=30, clock=clock)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as raised:
+        breaker.before_request()
+    assert raised.value.retry_after == 30
+
+    clock.advance(30)
+    breaker.before_request()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()  # only one probe at a time
+
+    breaker.record_failure()
+    assert breaker.retry_after() == 60  # failed probe doubles the wait
+
+    clock.advance(60)
+    breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_client_retries_then_fails_fast_while_server_is_down():
+    """Test 5xx responses are retried, then the breaker stops requests reaching the server."""
+    clock = VirtualClock()
+    resilience = Resilience(RetryBudget(), request_retries=1, failure_threshold=4, clock=clock)
+    client = EddiClient("12345678", "key", base_url="https://s18.myenergi.net", resilience=resilience)
+    client.session = Mock()
+    client.session.get.return_value = mock_response({}, status_code=503)
+
+    for _ in range(2):
+        with pytest.raises(Exception):
+            client.get_status()
+    assert client.session.get.call_count == 4
+    assert clock.monotonic() > 0  # backed off between attempts
+
+    with pytest.raises(CircuitOpenError):
+        client.get_status()
+    assert client.session.get.call_count == 4
+
+
+def test_open_circuit_cuts_verification_short():
+    """Test verification stops at an open breaker and the retry waits only until the probe."""
+    client = Mock()
+    client.get_eddi_statuses.side_effect = CircuitOpenError("https://s18", 5)
+    clock = VirtualClock()
+
+    ok = execute_command_with_retry(
+        "stop", client, "101", max_retries=2, log=lambda message: None,
+        poll=lambda command: FixedPoll(10, 10, 20), backoff=Backoff(60, jitter=0), clock=clock,
+        budget=None,
+    )
+
+    assert ok is False
+    assert clock.monotonic() == 10 + 5 + 10
+    assert client.stop.call_count == 2
+
+
+def test_spent_budget_stops_retries():
+    """Test no further attempts are made once the run's budget is spent."""
+    client = Mock()
+    client.stop.side_effect = ConnectionError("down")
+
+    ok = execute_command_with_retry(
+        "stop", client, "101", max_retries=3, log=lambda message: None,
+        clock=VirtualClock(), budget=RetryBudget(ratio=0, minimum=0),
+    )
+
+    assert ok is False
+    assert client.stop.call_count == 1
+
+
+def test_probe_that_raises_unexpectedly_is_released():
+    """Test a probe failing with a non-requests error reopens the breaker instead of blocking it for good."""
+    clock = VirtualClock()
+    resilience = Resilience(RetryBudget(), request_retries=0, failure_threshold=1, reset_timeout=30, clock=clock)
+    client = EddiClient("12345678", "key", base_url="https://s18.myenergi.net", resilience=resilience)
+    client.session = Mock()
+    client.session.get.return_value = mock_response({}, status_code=503)
+    with pytest.raises(Exception):
+        client.get_status()
+
+    clock.advance(30)
+    client.session.get.side_effect = RuntimeError("decoder bug")
+    with pytest.raises(RuntimeError):
+        client.get_status()
+    breaker = resilience.breaker("https://s18.myenergi.net")
+    assert breaker.state == OPEN
+    assert breaker.retry_after() == 60
+
+    clock.advance(60)
+    client.session.get.side_effect = None
+    client.session.get.return_value = mock_response({"eddi": []})
+    assert client.get_status() == {"eddi": []}
+    assert breaker.state == CLOSED
@@ -0,0 +1,160 @@
+"""Tests for the weekly schedule."""
+
+from datetime import date, datetime, time, timedelta, timezone
+import pytest
+from eddi_scheduler.schedule import (
+    HOLIDAY, Rule, Schedule, ZoneInfo, default_schedule, load_schedule, localize, parse_days
+)
+
+NZ = ZoneInfo("Pacific/Auckland")
+
+
+def utc(*args):
+    """Build an aware UTC datetime."""
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_localize_regular_time():
+    """Test an ordinary local time maps to its UTC instant."""
+    assert localize(date(2026, 1, 14), time(11, 0), NZ) == utc(2026, 1, 13, 22, 0)
+
+
+def test_localize_spring_forward_gap():
+    """Test a skipped local time runs when the clocks jump."""
+    when = localize(date(2026, 9, 27), time(2, 30), NZ)
+
+    assert when.astimezone(NZ).replace(tzinfo=None) == datetime(2026, 9, 27, 3, 0)
+
+
+def test_localize_fall_back_overlap():
+    """Test a repeated local time runs at its first occurrence."""
+    when = localize(date(2026, 4, 5), time(2, 30), NZ)
+
+    assert when == utc(2026, 4, 4, 13, 30)
+
+
+def test_next_and_previous_transition():
+    """Test the default schedule around a weekday afternoon."""
+    # Friday 16 Oct 2026, 12:00 NZDT
+    now = utc(2026, 10, 15, 23, 0)
+
+    assert default_schedule().previous_transition(now).action == "start"
+    upcoming = default_schedule().next_transition(now)
+    assert upcoming.action == "stop"
+    assert upcoming.when.astimezone(NZ).hour == 17
+
+
+def test_transitions_follow_dst_change():
+    """Test the UTC instant of a daily rule shifts with DST."""
+    schedule = Schedule([Rule(frozenset(range(7)), time(11, 0), "start")])
+
+    transitions = list(schedule.transitions_between(utc(2026, 9, 25), utc(2026, 9, 29)))
+
+    assert [t.when.hour for t in transitions] == [23, 22, 22, 22]
+    assert all(t.when.astimezone(NZ).hour == 11 for t in transitions)
+
+
+SCHEDULE_TOML = """
+timezone = "Pacific/Auckland"
+holidays = ["2026-12-25"]
+
+[[rule]]
+days = "weekdays"
+time = "11:00"
+action = "start"
+
+[[rule]]
+days = ["mon", "tue", "wed", "thu", "fri"]
+time = "17:00"
+action = "stop"
+
+[[rule]]
+days = "holidays"
+time = "08:00"
+action = "start"
+
+[devices.10088888]
+timezone = "UTC"
+"""
+
+
+def test_parse_days():
+    """Test day names and aliases."""
+    assert parse_days("weekdays") == frozenset(range(5))
+    assert parse_days(["Sat", "sunday"]) == frozenset({5, 6})
+    assert parse_days("holidays") == frozenset({HOLIDAY})
+    with pytest.raises(ValueError):
+        parse_days("someday")
+
+
+def test_load_schedule(tmp_path):
+    """Test loading rules, time zone and holidays from TOML."""
+    path = tmp_path / "schedule.toml"
+    path.write_text(SCHEDULE_TOML)
+
+    schedule = load_schedule(path)
+
+    assert schedule.timezone == "Pacific/Auckland"
+    assert schedule.holidays == {date(2026, 12, 25)}
+    assert [rule.at for rule in schedule.rules] == [time(11, 0), time(17, 0), time(8, 0)]
+
+
+def test_load_schedule_device_override(tmp_path):
+    """Test per-device keys replace the top-level ones."""
+    path = tmp_path / "schedule.toml"
+    path.write_text(SCHEDULE_TOML)
+
+    assert load_schedule(path, device="10088888").timezone == "UTC"
+    assert load_schedule(path, device="999").timezone == "Pacific/Auckland"
+
+
+def test_load_schedule_invalid_rule(tmp_path):
+    """Test an invalid rule is reported with its position."""
+    path = tmp_path / "schedule.toml"
+    path.write_text('[[rule]]\ndays = "mon"\ntime = "25:00"\naction = "start"\n')
+
+    with pytest.raises(ValueError, match="Rule #1"):
+        load_schedule(path)
+
+
+def test_holiday_replaces_weekday_rules(tmp_path):
+    """Test only holiday rules apply on a holiday."""
+    path = tmp_path / "schedule.toml"
+    path.write_text(SCHEDULE_TOML)
+    schedule = load_schedule(path)
+
+    # Friday 25 Dec 2026 (NZDT, UTC+13)
+    day = list(schedule.transitions_between(utc(2026, 12, 24, 11, 0), utc(2026, 12, 25, 11, 0)))
+
+    assert [(t.when.astimezone(NZ).hour, t.action) for t in day] == [(8, "start")]
+
+
+def test_index_matches_rule_evaluation():
+    """Test the compiled index agrees with evaluating the rules directly."""
+    start = utc(2026, 9, 1)
+    index = default_schedule().compile(start, weeks=8)
+
+    expected = list(default_schedule().transitions_between(start, start + timedelta(weeks=8)))
+    assert index.transitions == expected
+    assert index.between(utc(2026, 9, 7), utc(2026, 9, 14)) == [
+        t for t in expected if utc(2026, 9, 7) <= t.when < utc(2026, 9, 14)
+    ]
+    assert index.initial.action == "start"  # Tuesday 12:00 NZST
+
+
+def test_desired_mode_at():
+    """Test the desired mode follows the last transition."""
+    # Friday 16 Oct 2026: 10:59, 11:00 and 17:30 NZDT
+    assert default_schedule().desired_mode_at(utc(2026, 10, 15, 21, 59)) == "stop"
+    assert default_schedule().desired_mode_at(utc(2026, 10, 15, 22, 0)) == "normal"
+    assert default_schedule().desired_mode_at(utc(2026, 10, 16, 4, 30)) == "stop"
+
+
+def test_lookups_outside_index_recompile():
+    """Test queries far from the cached index still return correct results."""
+    schedule = Schedule(default_schedule().rules)
+
+    assert schedule.desired_mode_at(utc(2026, 10, 15, 22, 0)) == "normal"
+    later = schedule.next_transition(utc(2027, 3, 1))
+
+    assert later == next(schedule.transitions_between(utc(2027, 3, 1, 0, 0, 1), utc(2027, 3, 9)))
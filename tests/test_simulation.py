@@ -0,0 +1,89 @@
+"""Tests for the virtual-time policy simulation."""
+
+import json
+import pytest
+from eddi_scheduler.control import STOP_POLL, AdaptivePoll, FixedPoll
+from eddi_scheduler.simulation import (
+    FIXED_GRIDS,
+    Policy,
+    Scenario,
+    evaluate,
+    load_scenarios,
+    policy_grid,
+    rank,
+    scenarios_from_latencies,
+    simulate,
+    sweep,
+    synthetic_scenarios,
+)
+
+
+def test_simulate_stop_through_paused():
+    """Test a stop is verified at the first probe after the device reaches sta=6."""
+    scenario = Scenario("stop", [((10, 1), (140, 6))])
+
+    outcome = simulate(scenario, Policy(initial_wait=30, interval=15, max_attempts=10))
+
+    assert outcome.ok is True
+    assert outcome.seconds == 150
+    assert outcome.probes == 9
+    assert outcome.commands == 1
+
+
+def test_lost_command_is_retried():
+    """Test a command without effect is sent again after the retry delay."""
+    scenario = Scenario("start", [None, ((20, 1),)])
+
+    outcome = simulate(scenario, Policy(initial_wait=10, interval=10, max_attempts=2, retry_delay=30, jitter=0))
+
+    assert outcome.ok is True
+    assert outcome.commands == 2
+    assert outcome.seconds == 10 + 10 + 30 + 10 + 10
+
+
+def test_evaluate_reports_success_rate_and_times():
+    """Test a policy too short for slow devices shows a lower success rate."""
+    scenarios = scenarios_from_latencies("stop", [100, 200, 300])
+    short = Policy(initial_wait=0, interval=50, max_attempts=5, max_retries=1)
+
+    result = evaluate(short, scenarios)
+
+    assert result.success_rate == pytest.approx(2 / 3)
+    assert result.median_seconds == 150
+    assert rank([result, evaluate(Policy(0, 50, 10, 1), scenarios)])[0].success_rate == 1.0
+
+
+def test_sweep_in_processes_matches_in_process():
+    """Test the process pool gives the same results as a serial run."""
+    scenarios = synthetic_scenarios("stop", 50, seed=3)
+    policies = policy_grid(initial_wait=(10, 30), interval=(5, 15), max_attempts=(10,))
+
+    assert sweep(scenarios, policies, processes=2) == sweep(scenarios, policies, processes=1)
+
+
+def test_load_scenarios(tmp_path):
+    """Test recorded scenarios load from JSON, with lost attempts as null."""
+    path = tmp_path / "traces.json"
+    path.write_text(json.dumps([{"command": "stop", "attempts": [None, [[12, 1], [164, 6]]]}]))
+
+    scenario, = load_scenarios(path)
+
+    assert scenario.attempts == [None, ((12.0, 1), (164.0, 6))]
+    assert scenario.initial_sta == 3
+
+    path.write_text(json.dumps([{"command": "stop"}]))
+    with pytest.raises(ValueError, match="scenario 0"):
+        load_scenarios(path)
+
+
+def test_default_policy_is_the_adaptive_schedule():
+    """Test the current policy polls like the client defaults and the fixed one stays available."""
+    policy = Policy.default("stop")
+    poll = policy.poll("stop")
+
+    assert policy.adaptive and isinstance(poll, AdaptivePoll)
+    assert repr(poll) == repr(STOP_POLL)
+    assert isinstance(Policy.fixed("stop").poll("stop"), FixedPoll)
+    assert "interval" in FIXED_GRIDS["stop"]
+    with pytest.raises(ValueError, match="missing"):
+        Policy(first_probe=5)
@@ -0,0 +1,89 @@
+"""Tests for status watching."""
+
+from unittest.mock import Mock
+import pytest
+from eddi_scheduler.watch import StatusWatcher, diff, project, resolve_fields
+
+
+def test_resolve_fields_accepts_names_and_keys():
+    """Test field names map to API keys, serial first and no duplicates."""
+    assert resolve_fields(["diversion", "sta", "div"]) == ["sno", "div", "sta"]
+    assert resolve_fields(None) is None
+
+
+def test_project_and_diff():
+    """Test projection drops other keys and diff reports changed, new and removed keys."""
+    device = {"sno": 101, "sta": 3, "div": 1500, "tp1": 55}
+    assert project(device, ["sno", "div", "missing"]) == {"sno": 101, "div": 1500}
+
+    previous = {"sno": 101, "sta": 3, "div": 1500, "tp1": 55}
+    current = {"sno": 101, "sta": 1, "div": 1500, "grd": -200}
+    assert diff(previous, current) == {"sta": 1, "grd": -200, "tp1": None}
+    assert diff(None, current) == current
+
+
+def test_watcher_emits_full_sample_then_deltas():
+    """Test the first sample is complete and later ones carry only changes."""
+    client = Mock()
+    client.get_eddi_devices.side_effect = [
+        [{"sno": 101, "sta": 3, "div": 1500, "grd": -200}],
+        [{"sno": 101, "sta": 3, "div": 1500, "grd": -150}],
+        [{"sno": 101, "sta": 3, "div": 1500, "grd": -150}],
+    ]
+    watcher = StatusWatcher(client, fields=["sta", "diversion"], interval=0, now=lambda: 100.0)
+
+    samples = list(watcher.run(count=3))
+
+    assert samples == [[{"ts": 100.0, "sno": 101, "sta": 3, "div": 1500}], [], []]
+    client.get_eddi_devices.assert_called_with(None)
+
+
+def test_watcher_reports_errors_and_keeps_polling():
+    """Test a failed sample is reported and the next is compared with the last good one."""
+    client = Mock()
+    client.get_eddi_devices.side_effect = [
+        [{"sno": 101, "sta": 3}],
+        ConnectionError("down"),
+        [{"sno": 101, "sta": 1}],
+    ]
+    errors = []
+    watcher = StatusWatcher(client, interval=0, now=lambda: 100.0)
+
+    samples = list(watcher.run(count=3, on_error=errors.append))
+
+    assert samples == [[{"ts": 100.0, "sno": 101, "sta": 3}], [{"ts": 100.0, "sno": 101, "sta": 1}]]
+    assert len(errors) == 1
+
+
+def test_watcher_stop_ends_iteration():
+    """Test stop() ends the loop after the current sample, and errors propagate without a handler."""
+    client = Mock()
+    client.get_eddi_devices.return_value = [{"sno": 101, "sta": 3}]
+    watcher = StatusWatcher(client, interval=0)
+
+    for _ in watcher:
+        watcher.stop()
+    assert client.get_eddi_devices.call_count == 1
+
+    client.get_eddi_devices.side_effect = ConnectionError("down")
+    with pytest.raises(ConnectionError):
+        list(StatusWatcher(client, interval=0).run(count=1))
+
+
+def test_fetch_leaves_state_to_update():
+    """Test fetch only reads upstream, and update records the entries and returns changes."""
+    client = Mock()
+    client.get_eddi_devices.return_value = [{"sno": 101, "sta": 3}]
+    watcher = StatusWatcher(client, interval=0, now=lambda: 100.0)
+
+    devices = watcher.fetch()
+
+    assert watcher.last == {}
+    assert watcher.update(devices) == [{"ts": 100.0, "sno": 101, "sta": 3}]
+    assert watcher.last == {"101": {"sno": 101, "sta": 3}}
+
+
+def test_resolve_fields_rejects_unknown_names():
+    """Test a misspelt field is an error instead of an empty column."""
+    with pytest.raises(ValueError, match="diversoin"):
+        resolve_fields(["sta", "diversoin"])